@@ -0,0 +1,34 @@
+# backend/app/config.py
+import os
+import re
+
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333").rstrip("/")
+QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
+QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
+
+# single source of truth for the collection name (was hard-coded per module)
+COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "fashion200k")
+
+# Optional sharding by a payload key, e.g. SHARD_KEY=category. Each value gets
+# its own collection "<COLLECTION_NAME>__<value>"; unset keeps one collection.
+SHARD_KEY = os.getenv("SHARD_KEY", "")
+SHARD_SEPARATOR = "__"
+SHARD_OTHER = "_other"
+
+# Reindexing builds "<name>-v<timestamp>" collections and repoints the alias
+# "<name>" (and one alias per shard) at them; queries only ever use aliases.
+# "-" never occurs in a shard slug, so versions can't be mistaken for shards.
+VERSION_SEPARATOR = "-v"
+
+
+def is_versioned(name: str) -> bool:
+    return VERSION_SEPARATOR in name
+
+
+def shard_slug(value) -> str:
+    s = re.sub(r"[^a-z0-9]+", "_", str(value).strip().lower()).strip("_")
+    return s or SHARD_OTHER
+
+
+def shard_collection(value, base: str = COLLECTION_NAME) -> str:
+    return f"{base}{SHARD_SEPARATOR}{shard_slug(value) if value is not None else SHARD_OTHER}"
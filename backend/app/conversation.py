@@ -0,0 +1,166 @@
+# backend/app/conversation.py
+from __future__ import annotations
+
+import os
+import re
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.session_store import TTLStore
+
+CONV_MAX_SESSIONS = int(os.getenv("CONV_MAX_SESSIONS", "512"))
+CONV_TTL_S = float(os.getenv("CONV_TTL_S", "1800"))
+CONV_MAX_TURNS = int(os.getenv("CONV_MAX_TURNS", "6"))
+CONV_CENTROID_N = int(os.getenv("CONV_CENTROID_N", "5"))
+
+# previous query / previous top-result centroid / new text
+REFINE_W_PREV = float(os.getenv("REFINE_W_PREV", "0.35"))
+REFINE_W_CENTROID = float(os.getenv("REFINE_W_CENTROID", "0.25"))
+REFINE_W_NEW = float(os.getenv("REFINE_W_NEW", "0.4"))
+
+# A follow-up only skips the planner when it is short and reads as an edit of
+# the previous search: an explicit reference to it ("same but", "like these",
+# "make it") or an attribute change ("in red", "without sleeves", "cheaper").
+# Anything else ("now show me sneakers") is a new search and goes to the planner.
+REFINE_MAX_WORDS = int(os.getenv("REFINE_MAX_WORDS", "8"))
+
+_ATTRIBUTES = (
+    r"black|white|grey|gray|red|blue|navy|green|olive|yellow|orange|pink|purple|brown|beige|cream|gold|silver"
+    r"|dark|light|pastel|neon|bright"
+    r"|leather|suede|denim|cotton|linen|silk|satin|wool|knit|lace|velvet|sequin|faux fur"
+    r"|floral|striped|stripes|plaid|checked|polka dots?|print|printed|plain|solid"
+    r"|(?:long|short|puff|no) sleeves?|sleeves|pockets?|a hood|hood|buttons|a belt|a zip|zip"
+    r"|(?:a )?(?:smaller|bigger|larger) size|size \w+|petite|plus size|mini|midi|maxi"
+)
+_COMPARATIVES = (
+    r"cheaper|pricier|darker|lighter|brighter|longer|shorter|looser|tighter|bigger|smaller|warmer|thinner"
+    r"|(?:more|less) (?:formal|casual|fitted|colou?rful|elegant|sporty|expensive)"
+)
+_ANAPHORA_RE = re.compile(
+    r"\b(?:same|similar|like (?:this|these|that|those)|more like|show me more|instead"
+    r"|make (?:it|them)|(?:this|these|that|those|it|them|one|ones) (?:but|in|with|without))\b",
+    re.IGNORECASE,
+)
+_DELTA_RE = re.compile(
+    rf"^\s*(?:(?:but|and|now|only|also)\s+)?(?:(?:in|with|without)\s+(?:{_ATTRIBUTES})\b|without\s+\w+|(?:{_COMPARATIVES})\b)",
+    re.IGNORECASE,
+)
+# words that describe the edit, not the item; dropped before embedding the delta
+_FILLER_RE = re.compile(
+    r"\b(?:same|similar|but|and|also|instead|now|make it|show me|more|like (?:this|these|that|those)|one|ones|please|in|with)\b",
+    re.IGNORECASE,
+)
+
+
+def is_refinement(message: str) -> bool:
+    msg = (message or "").strip()
+    if not msg or len(msg.split()) > REFINE_MAX_WORDS:
+        return False
+    return bool(_ANAPHORA_RE.search(msg) or _DELTA_RE.search(msg))
+
+
+def refinement_text(message: str) -> str:
+    """
+    Strips the conversational glue so only the requested change is embedded;
+    empty when there is no change ("show me more", "more like this").
+    """
+    s = _FILLER_RE.sub(" ", message or "")
+    return " ".join(s.split())
+
+
+def _unit(v: np.ndarray) -> np.ndarray:
+    n = float(np.linalg.norm(v))
+    return v / n if n > 0 else v
+
+
+class ConversationStore:
+    """
+    Per-conversation state for follow-up turns.
+
+    Each session keeps only the latest plan, query vector, top result ids and
+    (lazily) their centroid, plus a short turn history for the planner. Sessions
+    live in a bounded TTL store, so memory stays flat regardless of traffic.
+    """
+
+    def __init__(self, max_sessions: int = CONV_MAX_SESSIONS, ttl_s: float = CONV_TTL_S):
+        self._store = TTLStore(max_entries=max_sessions, ttl_s=ttl_s)
+        # serialises concurrent turns of one session; readers keep the dict they got
+        self._lock = threading.Lock()
+
+    def new_id(self) -> str:
+        return self._store.new_id()
+
+    def get(self, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not session_id:
+            return None
+        return self._store.get(session_id)
+
+    def record_turn(
+        self,
+        session_id: str,
+        message: str,
+        plan: Dict[str, Any],
+        query_used: str,
+        query_vec: Any,
+        hits: List[Any],
+    ) -> None:
+        # a new dict per turn: a request still reading the previous one never sees it change
+        with self._lock:
+            prev = self._store.get(session_id)
+            turns = deque(prev["turns"] if prev else (), maxlen=CONV_MAX_TURNS)
+            turns.append({"message": message, "query_used": query_used})
+            self._store.put(session_id, {
+                "turns": turns,
+                "lock": threading.Lock(),
+                "plan": plan,
+                "filters": plan.get("filters") or {},
+                "query_vec": np.asarray(query_vec, dtype=np.float32),
+                "top_ids": [h.id for h in hits[:CONV_CENTROID_N] if h.id is not None],
+                "centroid": None,
+            })
+
+    def chat_history(self, session: Optional[Dict[str, Any]]) -> List[Dict[str, str]]:
+        if not session:
+            return []
+        out: List[Dict[str, str]] = []
+        for t in session["turns"]:
+            out.append({"role": "user", "content": t["message"]})
+            out.append({"role": "assistant", "content": f"searched: {t['query_used']}"})
+        return out
+
+    def centroid(
+        self,
+        session: Dict[str, Any],
+        fetch_vectors: Callable[[List[Any]], List[Any]],
+    ) -> Optional[np.ndarray]:
+        """Mean of the previous top results' vectors, fetched once per turn."""
+        with session["lock"]:
+            if session.get("centroid") is None and session.get("top_ids"):
+                vecs = [v for v in fetch_vectors(session["top_ids"]) if v is not None and len(v)]
+                if vecs:
+                    session["centroid"] = _unit(np.asarray(vecs, dtype=np.float32).mean(axis=0))
+            return session.get("centroid")
+
+    def stats(self) -> Dict[str, Any]:
+        return self._store.stats()
+
+
+def refine_vector(
+    prev_query: np.ndarray,
+    centroid: Optional[np.ndarray],
+    new_text: Any,
+) -> np.ndarray:
+    """
+    Blends the previous query, the previous results' centroid and the new text
+    embedding. All inputs are unit vectors, so this is a cheap weighted sum.
+    """
+    new_vec = np.asarray(new_text, dtype=np.float32)
+    out = REFINE_W_PREV * prev_query + REFINE_W_NEW * new_vec
+    if centroid is not None:
+        out = out + REFINE_W_CENTROID * centroid
+    else:
+        out = out + REFINE_W_CENTROID * prev_query
+    return _unit(out.astype(np.float32))
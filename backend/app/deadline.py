@@ -0,0 +1,84 @@
+# backend/app/deadline.py
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# end-to-end latency budget for one /api/chat request
+CHAT_BUDGET_S = float(os.getenv("CHAT_BUDGET_S", "10"))
+# requests allowed in flight per worker before we shed with 503
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "32"))
+
+# Remaining budget a stage needs before it is attempted; below it the stage degrades.
+PLANNER_MIN_S = float(os.getenv("PLANNER_MIN_S", "3.0"))        # else: fallback plan
+IMAGE_MIN_S = float(os.getenv("IMAGE_MIN_S", "1.0"))            # else: skip image vector
+OVERFETCH_MIN_S = float(os.getenv("OVERFETCH_MIN_S", "1.0"))    # else: no cursor over-fetch
+FULL_TOPK_MIN_S = float(os.getenv("FULL_TOPK_MIN_S", "0.3"))    # else: cap top_k
+DEGRADED_TOP_K = int(os.getenv("DEGRADED_TOP_K", "10"))
+# budget held back from the planner for embedding + search
+SEARCH_RESERVE_S = float(os.getenv("SEARCH_RESERVE_S", "1.5"))
+
+
+class Deadline:
+    """Absolute per-request deadline, handed to every stage as a timeout."""
+
+    def __init__(self, budget_s: float = CHAT_BUDGET_S):
+        self.budget_s = float(budget_s)
+        self.t_end = time.monotonic() + self.budget_s
+
+    def remaining(self) -> float:
+        return max(0.0, self.t_end - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def allows(self, min_s: float) -> bool:
+        return self.remaining() >= min_s
+
+    def timeout(self, cap: Optional[float] = None, floor: float = 0.05, reserve: float = 0.0) -> float:
+        """
+        Timeout for the next blocking call: what is left (minus `reserve` kept
+        for later stages), never more than `cap`.
+        """
+        t = self.remaining() - reserve
+        if cap is not None:
+            t = min(t, cap)
+        return max(floor, t)
+
+
+class AdmissionController:
+    """
+    Concurrency-based admission: at most `max_in_flight` requests run; the rest
+    get an immediate rejection instead of queueing behind them.
+    """
+
+    def __init__(self, max_in_flight: int = CHAT_MAX_CONCURRENCY):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.shed += 1
+                return False
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+                "admitted": self.admitted,
+                "shed": self.shed,
+            }
@@ -0,0 +1,276 @@
+# backend/app/dedup.py
+"""
+Near-duplicate collapsing at index time.
+
+Two products are near-duplicates when their image vectors are within
+DEDUP_IMAGE_SIM (same shot, re-encoded or re-cropped) and their captions
+agree to DEDUP_TEXT_MIN; products without an image collapse on the caption
+alone at DEDUP_TEXT_SIM. Only one representative per group is indexed, so
+only products with equal DEDUP_KEYS payload fields (plus SHARD_KEY) are ever
+compared: a collapsed product still matches every filter its representative
+does, and lives in the same shard.
+
+Pairs come from a blocked X @ X.T within each such block and are merged
+closest first (union-find) into groups of at most DEDUP_MAX_GROUP; a member
+that is not itself a near-duplicate of its representative (reached only
+through a chain) is split off again, so groups can't drift.
+
+build_index_qdrant.py writes, next to the embedding snapshot:
+  groups.npz   "rep": int32 (N,) representative row of every snapshot row,
+               "snapshot": the fingerprint of the snapshot it was computed on
+scripts/load_snapshot.py ignores it unless the fingerprint matches, and writes
+each new collection's groups.json (representative product_id -> member
+products, only groups of 2+) into that collection's artifacts dir
+(app/live_index.py). The API expands a collapsed result on demand from the
+groups.json of the collections it currently serves, so groups switch with
+the alias, never before.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import COLLECTION_NAME, SHARD_KEY
+from app.embedding_store import EMBEDDINGS_DIR, EmbeddingSnapshot
+from app.live_index import LiveIndex, artifacts_dir, live_index
+
+DEDUP = os.getenv("DEDUP", "1") not in ("0", "false", "False", "")
+DEDUP_IMAGE_SIM = float(os.getenv("DEDUP_IMAGE_SIM", "0.97"))
+DEDUP_TEXT_MIN = float(os.getenv("DEDUP_TEXT_MIN", "0.90"))
+DEDUP_TEXT_SIM = float(os.getenv("DEDUP_TEXT_SIM", "0.99"))
+# payload fields a collapsed product must share with its representative (filters, facets)
+DEDUP_KEYS = [k.strip() for k in os.getenv("DEDUP_KEYS", "category,sub_category,color,brand").split(",") if k.strip()]
+DEDUP_MAX_GROUP = int(os.getenv("DEDUP_MAX_GROUP", "20"))
+# cap on the (block, N) similarity matrix held in memory at once
+DEDUP_BLOCK_BYTES = int(os.getenv("DEDUP_BLOCK_BYTES", str(256 * 1024 * 1024)))
+
+
+def dedup_keys() -> List[str]:
+    return DEDUP_KEYS + ([SHARD_KEY] if SHARD_KEY and SHARD_KEY not in DEDUP_KEYS else [])
+
+
+def block_of(payload: Dict[str, Any], keys: Sequence[str]) -> Tuple[str, ...]:
+    """Rows are only compared within equal blocks."""
+    return tuple(str(payload.get(k)) for k in keys)
+
+
+def _rowwise(X: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.einsum("ij,ij->i", X[a], X[b])
+
+
+def _pairs(X: np.ndarray, rows: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """(m, 2) row pairs i < j among `rows` with cosine >= threshold, and their cosines (X has unit rows)."""
+    if len(rows) < 2:
+        return np.empty((0, 2), dtype=np.int64), np.empty(0, dtype=np.float32)
+    Y = X[rows]
+    step = max(1, DEDUP_BLOCK_BYTES // (4 * len(rows)))
+    pairs, sims = [], []
+    for start in range(0, len(rows), step):
+        S = Y[start:start + step] @ Y.T
+        i, j = np.nonzero(S >= threshold)
+        keep = i + start < j  # upper triangle: each pair once, no self pairs
+        i, j = i[keep], j[keep]
+        pairs.append(np.stack([rows[i + start], rows[j]], axis=1))
+        sims.append(S[i, j])
+    return np.concatenate(pairs), np.concatenate(sims)
+
+
+def _union_find(n: int, pairs: np.ndarray, max_size: int) -> np.ndarray:
+    """Representative (smallest row) of each row's component; merges that would exceed max_size are skipped."""
+    parent = np.arange(n)
+    size = np.ones(n, dtype=np.int64)
+
+    def find(x: int) -> int:
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    for a, b in pairs:
+        ra, rb = find(int(a)), find(int(b))
+        if ra != rb and size[ra] + size[rb] <= max_size:
+            lo, hi = min(ra, rb), max(ra, rb)
+            parent[hi] = lo
+            size[lo] += size[hi]
+    return np.array([find(i) for i in range(n)], dtype=np.int32)
+
+
+def near_duplicate_groups(
+    text: np.ndarray,
+    image: Optional[np.ndarray] = None,
+    blocks: Optional[Sequence[Hashable]] = None,
+    max_group: int = DEDUP_MAX_GROUP,
+) -> np.ndarray:
+    """
+    text / image: (N, D) unit rows, zero row = no vector.
+    blocks: per-row key (see block_of); only rows with equal keys are paired.
+    Returns int32 (N,): representative row per row (itself when unique).
+    """
+    n = len(text)
+    has_text = text.any(axis=1)
+    has_image = image.any(axis=1) if image is not None else np.zeros(n, dtype=bool)
+
+    by_block: Dict[Hashable, List[int]] = {}
+    for i, b in enumerate(blocks if blocks is not None else [()] * n):
+        by_block.setdefault(b, []).append(i)
+
+    pairs, sims = [np.empty((0, 2), dtype=np.int64)], [np.empty(0, dtype=np.float32)]
+    for rows in by_block.values():
+        rows = np.asarray(rows)
+        if image is not None:
+            p, sim = _pairs(image, rows[has_image[rows]], DEDUP_IMAGE_SIM)
+            # same shot with a different caption is a different listing; keep it
+            agree = _rowwise(text, p[:, 0], p[:, 1]) >= DEDUP_TEXT_MIN
+            pairs.append(p[agree])
+            sims.append(sim[agree])
+        p, sim = _pairs(text, rows[has_text[rows] & ~has_image[rows]], DEDUP_TEXT_SIM)
+        pairs.append(p)
+        sims.append(sim)
+    pairs_all = np.concatenate(pairs)
+    # closest pairs first, so the size cap keeps the tightest groups
+    order = np.argsort(-np.concatenate(sims), kind="stable")
+    rep = _union_find(n, pairs_all[order], max(1, max_group))
+
+    # no drift: every member must be a near-duplicate of the representative itself
+    members = np.flatnonzero(rep != np.arange(n))
+    if len(members):
+        reps = rep[members]
+        both = has_image[members] & has_image[reps]
+        neither = ~has_image[members] & ~has_image[reps]
+        ok = np.zeros(len(members), dtype=bool)
+        t = _rowwise(text, members, reps)
+        if image is not None:
+            ok |= both & (_rowwise(image, members, reps) >= DEDUP_IMAGE_SIM) & (t >= DEDUP_TEXT_MIN)
+        ok |= neither & (t >= DEDUP_TEXT_SIM)
+        rep[members[~ok]] = members[~ok]
+    return rep
+
+
+def _members(rep: np.ndarray) -> Dict[int, List[int]]:
+    members: Dict[int, List[int]] = {}
+    for i, r in enumerate(rep.tolist()):
+        members.setdefault(r, []).append(i)
+    return members
+
+
+def group_entries(rows: List[Dict[str, Any]], rep: np.ndarray) -> Dict[str, List[Dict[str, Any]]]:
+    """Representative product_id -> member products, for groups of 2+ (the groups.json shape)."""
+    return {
+        rows[r]["product_id"]: [
+            {"id": rows[i]["id"], "product_id": rows[i]["product_id"],
+             "description": rows[i]["payload"].get("description"),
+             "image_path": rows[i]["payload"].get("image_path") or rows[i]["payload"].get("image_abs_path")}
+            for i in idx
+        ]
+        for r, idx in _members(rep).items() if len(idx) > 1
+    }
+
+
+def save_groups(root: Path, snapshot: str, rep: np.ndarray) -> Dict[str, Any]:
+    """Writes groups.npz for the snapshot with fingerprint `snapshot` and returns a size report."""
+    tmp = root / "groups.npz.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, rep=rep.astype(np.int32), snapshot=np.array(snapshot))
+    os.replace(tmp, root / "groups.npz")
+
+    members = _members(rep)
+    n, kept = len(rep), len(members)
+    return {
+        "rows": n,
+        "indexed": kept,
+        "collapsed": n - kept,
+        "reduction": (n - kept) / n if n else 0.0,
+        "groups": sum(1 for v in members.values() if len(v) > 1),
+        "largest_group": max((len(v) for v in members.values()), default=0),
+        "max_group": DEDUP_MAX_GROUP,
+    }
+
+
+def load_representatives(snap: EmbeddingSnapshot) -> Optional[np.ndarray]:
+    """groups.npz when it was computed on exactly this snapshot, else None (index everything)."""
+    try:
+        with np.load(snap.root / "groups.npz") as z:
+            rep, fingerprint = z["rep"], str(z["snapshot"])
+    except (OSError, KeyError, ValueError):
+        return None
+    if fingerprint != snap.fingerprint or len(rep) != len(snap):
+        print("⚠️ groups.npz is from another snapshot; loading without dedup")
+        return None
+    return rep
+
+
+def write_group_file(root: Path, groups: Dict[str, List[Dict[str, Any]]]) -> None:
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = root / "groups.json.tmp"
+    tmp.write_text(json.dumps(groups), encoding="utf-8")
+    os.replace(tmp, root / "groups.json")
+
+
+class DuplicateGroups:
+    """
+    Serving side: the groups.json of every collection behind `base` (and its
+    shards), re-read when the served collections or their files change.
+    """
+
+    def __init__(self, live: Optional[LiveIndex] = None, base: str = COLLECTION_NAME, root: Path = EMBEDDINGS_DIR):
+        self.live = live or live_index
+        self.base = base
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._loaded: Optional[tuple] = None
+        self._groups: Dict[str, List[Dict[str, Any]]] = {}
+        self._group_of: Dict[str, str] = {}
+
+    def _files(self) -> tuple:
+        out = []
+        for c in self.live.served(self.base):
+            path = artifacts_dir(c, self.root) / "groups.json"
+            try:
+                out.append((path, path.stat().st_mtime_ns))
+            except FileNotFoundError:
+                continue
+        return tuple(out)
+
+    def _maybe_load(self) -> None:
+        files = self._files()
+        if files == self._loaded:
+            return
+        with self._lock:
+            if files == self._loaded:
+                return
+            groups: Dict[str, List[Dict[str, Any]]] = {}
+            try:
+                for path, _ in files:
+                    groups.update(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError) as e:
+                # an old version dropped mid-read; the next call sees the new set
+                print("⚠️ Duplicate groups reload failed, keeping the previous ones:", repr(e))
+                return
+            self._group_of = {m["product_id"]: rep for rep, ms in groups.items() for m in ms}
+            self._groups = groups
+            self._loaded = files
+
+    def group_id(self, product_id: str) -> str:
+        """Representative product_id (the product itself when it isn't collapsed)."""
+        self._maybe_load()
+        return self._group_of.get(product_id, product_id)
+
+    def members(self, product_id: str) -> List[Dict[str, Any]]:
+        """All products in product_id's group; empty when it has no duplicates."""
+        self._maybe_load()
+        return self._groups.get(self.group_id(product_id), [])
+
+    def stats(self) -> Dict[str, Any]:
+        self._maybe_load()
+        return {
+            "groups": len(self._groups),
+            "collapsed": sum(len(ms) - 1 for ms in self._groups.values()),
+            "enabled": DEDUP,
+        }
@@ -0,0 +1,236 @@
+# backend/app/embed_service.py
+"""
+Embedding service mode.
+
+One small pool of inference processes owns the CLIP model; API workers talk to
+it over a Unix socket instead of each loading their own SentenceTransformer.
+
+    python -m app.embed_service --socket /tmp/fashion-embed.sock --workers 2 --threads 2
+    EMBED_SERVICE_SOCKET=/tmp/fashion-embed.sock uvicorn app.main:app --workers 8
+
+Wire format (both directions): 4-byte little-endian header length, a JSON
+header, then `nbytes` of raw body. Requests carry UTF-8 JSON texts or image
+bytes; responses carry a C-contiguous float32 matrix that the client receives
+straight into a numpy buffer.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import signal
+import socket
+import struct
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+EMBED_SERVICE_SOCKET = os.getenv("EMBED_SERVICE_SOCKET", "")
+EMBED_SERVICE_WORKERS = int(os.getenv("EMBED_SERVICE_WORKERS", "2"))
+EMBED_SERVICE_THREADS = int(os.getenv("EMBED_SERVICE_THREADS", "2"))
+
+_HDR = struct.Struct("<I")
+
+
+# ---------------------------------------------------------------------------
+# framing
+# ---------------------------------------------------------------------------
+
+def _recv_exact_into(sock: socket.socket, view: memoryview) -> None:
+    while len(view):
+        n = sock.recv_into(view)
+        if n == 0:
+            raise ConnectionError("embed service connection closed")
+        view = view[n:]
+
+
+def _recv_frame(sock: socket.socket) -> Tuple[Dict[str, Any], bytearray]:
+    raw_len = bytearray(_HDR.size)
+    _recv_exact_into(sock, memoryview(raw_len))
+    (hlen,) = _HDR.unpack(raw_len)
+
+    raw_hdr = bytearray(hlen)
+    _recv_exact_into(sock, memoryview(raw_hdr))
+    header = json.loads(raw_hdr)
+
+    body = bytearray(int(header.get("nbytes", 0)))
+    if body:
+        _recv_exact_into(sock, memoryview(body))
+    return header, body
+
+
+def _send_frame(sock: socket.socket, header: Dict[str, Any], body: Any = b"") -> None:
+    body = memoryview(body).cast("B")
+    header = dict(header, nbytes=body.nbytes)
+    raw_hdr = json.dumps(header).encode("utf-8")
+    sock.sendall(_HDR.pack(len(raw_hdr)) + raw_hdr)
+    if body.nbytes:
+        sock.sendall(body)
+
+
+# ---------------------------------------------------------------------------
+# server
+# ---------------------------------------------------------------------------
+
+def _handle_conn(conn: socket.socket, embedder: Any, lock: threading.Lock) -> None:
+    with conn:
+        while True:
+            try:
+                header, body = _recv_frame(conn)
+            except (ConnectionError, OSError):
+                return
+
+            try:
+                op = header.get("op")
+                with lock:
+                    if op == "texts":
+                        texts = json.loads(body.decode("utf-8"))
+                        out = embedder.embed_texts(texts)
+                    elif op == "image":
+                        out = np.asarray([embedder.embed_image(bytes(body))])
+                    else:
+                        raise ValueError(f"unknown op: {op!r}")
+                out = np.ascontiguousarray(out, dtype=np.float32)
+                _send_frame(conn, {"ok": True, "shape": list(out.shape)}, out)
+            except Exception as e:
+                try:
+                    _send_frame(conn, {"ok": False, "error": repr(e)})
+                except OSError:
+                    return
+
+
+def _worker_main(listener: socket.socket, threads: int, embedder: Any, model_name: Optional[str]) -> None:
+    import torch
+
+    torch.set_num_threads(max(1, threads))
+    if embedder is None:
+        # spawn start method: nothing was inherited, load our own copy
+        from app.embedder import CLIPEmbedder
+        embedder = CLIPEmbedder(model_name) if model_name else CLIPEmbedder()
+
+    # one inference at a time per process; torch already fans out over `threads`
+    lock = threading.Lock()
+    signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+    while True:
+        conn, _ = listener.accept()
+        threading.Thread(target=_handle_conn, args=(conn, embedder, lock), daemon=True).start()
+
+
+def serve(socket_path: str, workers: int = EMBED_SERVICE_WORKERS, threads: int = EMBED_SERVICE_THREADS,
+          model_name: Optional[str] = None) -> None:
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(128)
+
+    # With fork, load the model once in the parent and let workers share the
+    # weights copy-on-write. Otherwise every worker loads its own copy.
+    embedder = None
+    ctx_name = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+    if ctx_name == "fork":
+        from app.embedder import CLIPEmbedder
+        embedder = CLIPEmbedder(model_name) if model_name else CLIPEmbedder()
+    ctx = mp.get_context(ctx_name)
+
+    procs = []
+    for _ in range(max(1, workers)):
+        pr = ctx.Process(target=_worker_main, args=(listener, threads, embedder, model_name), daemon=True)
+        pr.start()
+        procs.append(pr)
+    print(f"✅ Embed service on {socket_path}: {len(procs)} workers x {threads} threads ({ctx_name})")
+
+    try:
+        for pr in procs:
+            pr.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pr in procs:
+            pr.terminate()
+        listener.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+# ---------------------------------------------------------------------------
+# client
+# ---------------------------------------------------------------------------
+
+class RemoteEmbedder:
+    """
+    Drop-in for CLIPEmbedder that forwards to the embedding service.
+    Keeps one persistent connection per calling thread; results are float32
+    numpy arrays backed directly by the receive buffer.
+    """
+
+    def __init__(self, socket_path: str = EMBED_SERVICE_SOCKET, timeout_s: float = 30.0):
+        if not socket_path:
+            raise ValueError("RemoteEmbedder needs a socket path (EMBED_SERVICE_SOCKET)")
+        self.socket_path = socket_path
+        self.timeout_s = timeout_s
+        self._local = threading.local()
+
+    def _conn(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout_s)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _drop_conn(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _call(self, op: str, body: bytes) -> np.ndarray:
+        # one retry covers a connection the service closed while idle
+        for attempt in (0, 1):
+            try:
+                sock = self._conn()
+                _send_frame(sock, {"op": op}, body)
+                header, buf = _recv_frame(sock)
+                break
+            except (ConnectionError, OSError):
+                self._drop_conn()
+                if attempt:
+                    raise
+        if not header.get("ok"):
+            raise RuntimeError(f"Embed service error: {header.get('error')}")
+        return np.frombuffer(buf, dtype=np.float32).reshape(header["shape"])
+
+    def embed_texts(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        texts = [t if isinstance(t, str) else str(t) for t in texts]
+        return self._call("texts", json.dumps(texts).encode("utf-8"))
+
+    def embed_text(self, text: str) -> np.ndarray:
+        return self.embed_texts([text])[0]
+
+    def embed_image(self, image: Any) -> np.ndarray:
+        if isinstance(image, str):
+            with open(image, "rb") as f:
+                image = f.read()
+        return self._call("image", bytes(image))[0]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the shared CLIP embedding service.")
+    ap.add_argument("--socket", default=EMBED_SERVICE_SOCKET or "/tmp/fashion-embed.sock")
+    ap.add_argument("--workers", type=int, default=EMBED_SERVICE_WORKERS)
+    ap.add_argument("--threads", type=int, default=EMBED_SERVICE_THREADS, help="torch intra-op threads per worker")
+    ap.add_argument("--model", default=None)
+    args = ap.parse_args()
+    serve(args.socket, workers=args.workers, threads=args.threads, model_name=args.model)
+
+
+if __name__ == "__main__":
+    main()
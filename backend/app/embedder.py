@@ -1,13 +1,84 @@
 # backend/app/embedder.py
-from typing import List
+import contextlib
+import os
+from typing import Any, List, Optional
+
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 
+from app.image_io import load_image
+
+# Inference runtime settings; pick them with scripts/bench_embedder.py.
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))              # torch intra-op threads, 0 = torch default
+EMBED_DTYPE = os.getenv("EMBED_DTYPE", "float32")                 # float32 | float16 | bfloat16
+EMBED_QUANTIZE = os.getenv("EMBED_QUANTIZE", "")                  # "" | int8 (dynamic, Linear layers)
+EMBED_INFERENCE_MODE = os.getenv("EMBED_INFERENCE_MODE", "1") not in ("0", "false", "False", "")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+DTYPES = {"float32": torch.float32, "float16": torch.float16, "bfloat16": torch.bfloat16}
+
+
 class CLIPEmbedder:
-    def __init__(self, model_name: str = "sentence-transformers/clip-ViT-B-32"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/clip-ViT-B-32",
+        threads: int = EMBED_THREADS,
+        dtype: str = EMBED_DTYPE,
+        quantize: str = EMBED_QUANTIZE,
+        inference_mode: bool = EMBED_INFERENCE_MODE,
+        batch_size: int = EMBED_BATCH_SIZE,
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown EMBED_DTYPE {dtype!r}; expected one of {sorted(DTYPES)}")
+        if quantize not in ("", "int8"):
+            raise ValueError(f"Unknown EMBED_QUANTIZE {quantize!r}; expected '' or 'int8'")
+        if threads > 0:
+            torch.set_num_threads(threads)
 
-    def embed_text(self, text: str) -> List[float]:
+        self.model_name = model_name
+        self.dtype = dtype
+        self.quantize = quantize
+        self.inference_mode = inference_mode
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.model.eval()
+        if quantize == "int8":
+            # dynamic quantization: int8 weights, activations quantized per batch
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif dtype != "float32":
+            self.model.to(DTYPES[dtype])
+
+    def _encode(self, items: List[Any], batch_size: Optional[int] = None) -> np.ndarray:
+        ctx = torch.inference_mode() if self.inference_mode else contextlib.nullcontext()
+        with ctx:
+            t = self.model.encode(
+                items,
+                batch_size=batch_size or self.batch_size,
+                normalize_embeddings=True,
+                convert_to_tensor=True,
+            )
+        # half-precision outputs are widened here; callers always get float32
+        return t.float().cpu().numpy()
+
+    def embed_text(self, text: str) -> np.ndarray:
         if not isinstance(text, str):
             text = str(text)
-        v = self.model.encode([text], normalize_embeddings=True)[0]
-        return v.tolist()
+        return self._encode([text])[0]
+
+    def embed_texts(self, texts: List[str], batch_size: Optional[int] = None):
+        """Batch text encoding; returns a float32 array of shape (len(texts), dim)."""
+        texts = [t if isinstance(t, str) else str(t) for t in texts]
+        return self._encode(texts, batch_size)
+
+    def embed_image(self, image: Any) -> np.ndarray:
+        """
+        image: PIL image, raw bytes, or a filesystem path.
+        CLIP in sentence-transformers encodes PIL images directly; JPEGs are
+        decoded at reduced size (see image_io.load_image).
+        """
+        return self._encode([load_image(image)])[0]
+
+    def embed_images(self, images: List[Any], batch_size: Optional[int] = None) -> np.ndarray:
+        """Batch image encoding; returns a float32 array of shape (len(images), dim)."""
+        return self._encode([load_image(im) for im in images], batch_size)
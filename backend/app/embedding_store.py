@@ -0,0 +1,137 @@
+# backend/app/embedding_store.py
+"""
+On-disk embedding snapshot, the source of truth between CLIP and any index.
+
+scripts/build_index_qdrant.py writes, under EMBEDDINGS_DIR:
+  {name}.npy   float32 (N, D)  one row per product ("text", "image"); zero row = no vector
+  rows.json    row -> {"id", "product_id", "payload", "versions", "keys"}
+  meta.json    {"model", "dim", "count", "vectors", "fingerprint"}, written last
+"versions" holds the model version each row's vectors were made with and
+"keys" a fingerprint of the input (text hash, image size+mtime), so a
+rebuild only re-embeds rows whose input or model version changed.
+"fingerprint" identifies the rows of one build; files derived from a
+snapshot (app/dedup.py) store it and are ignored once it no longer matches.
+scripts/load_snapshot.py bulk-loads an index straight from these files.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+EMBEDDINGS_DIR = Path(
+    os.getenv("EMBEDDINGS_DIR", str(Path(__file__).resolve().parents[2] / "data" / "embeddings"))
+)
+# bump when the weights or preprocessing change without a model name change
+EMBED_MODEL_VERSION = os.getenv("EMBED_MODEL_VERSION", "")
+
+VECTOR_NAMES = ("text", "image")
+
+
+def model_version(embedder: Any) -> str:
+    return EMBED_MODEL_VERSION or str(getattr(embedder, "model_name", "") or "clip")
+
+
+def text_key(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def file_key(path: str) -> Optional[str]:
+    """Cheap change fingerprint for an image file (no read); None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def snapshot_fingerprint(rows: List[Dict[str, Any]], model: str) -> str:
+    data = json.dumps([model, rows], sort_keys=True).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _atomic_save(path: Path, arr: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+def save_snapshot(root: Path, rows: List[Dict[str, Any]], vectors: Dict[str, np.ndarray], model: str) -> None:
+    """Writes arrays first and meta.json last, so a reader never sees a mixed set."""
+    root.mkdir(parents=True, exist_ok=True)
+    dim = 0
+    for name, X in vectors.items():
+        if X.shape[0] != len(rows):
+            raise ValueError(f"{name}: {X.shape[0]} vectors for {len(rows)} rows")
+        dim = int(X.shape[1])
+        _atomic_save(root / f"{name}.npy", np.ascontiguousarray(X, dtype=np.float32))
+    tmp = root / "rows.json.tmp"
+    tmp.write_text(json.dumps(rows), encoding="utf-8")
+    os.replace(tmp, root / "rows.json")
+    tmp = root / "meta.json.tmp"
+    meta = {
+        "model": model,
+        "dim": dim,
+        "count": len(rows),
+        "vectors": sorted(vectors),
+        "fingerprint": snapshot_fingerprint(rows, model),
+    }
+    tmp.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp, root / "meta.json")
+
+
+class EmbeddingSnapshot:
+    """Read side: memory-mapped vectors plus row metadata."""
+
+    def __init__(self, root: Path, meta: Dict[str, Any], rows: List[Dict[str, Any]], vectors: Dict[str, np.ndarray]):
+        self.root = root
+        self.meta = meta
+        self.rows = rows
+        self.vectors = vectors
+        self._row = {r["product_id"]: i for i, r in enumerate(rows)}
+
+    @classmethod
+    def load(cls, root: Path = EMBEDDINGS_DIR, mmap: bool = True) -> Optional["EmbeddingSnapshot"]:
+        root = Path(root)
+        try:
+            meta = json.loads((root / "meta.json").read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        rows = json.loads((root / "rows.json").read_text(encoding="utf-8"))
+        vectors = {
+            name: np.load(root / f"{name}.npy", mmap_mode="r" if mmap else None)
+            for name in meta.get("vectors", [])
+        }
+        return cls(root, meta, rows, vectors)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def dim(self) -> int:
+        return int(self.meta.get("dim") or 0)
+
+    @property
+    def fingerprint(self) -> str:
+        # snapshots written before the field existed: same digest, computed here
+        if not self.meta.get("fingerprint"):
+            self.meta["fingerprint"] = snapshot_fingerprint(self.rows, self.meta.get("model", ""))
+        return self.meta["fingerprint"]
+
+    def row_of(self, product_id: str) -> Optional[int]:
+        return self._row.get(product_id)
+
+    def vector(self, name: str, i: int) -> Optional[np.ndarray]:
+        """Row i's named vector, or None when that row has none."""
+        if name not in self.vectors or not self.rows[i]["versions"].get(name):
+            return None
+        return self.vectors[name][i]
+
+    def reusable(self, i: int, name: str, version: str, key: Optional[str]) -> bool:
+        r = self.rows[i]
+        return key is not None and r["versions"].get(name) == version and r["keys"].get(name) == key
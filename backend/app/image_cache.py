@@ -0,0 +1,115 @@
+# backend/app/image_cache.py
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.image_io import read_image_bytes
+
+IMAGE_CACHE_ENTRIES = int(os.getenv("IMAGE_CACHE_ENTRIES", "2048"))
+# optional second tier, survives restarts and is shared by workers / index builds
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "")
+
+
+class ImageEmbeddingCache:
+    """
+    Image embeddings keyed by the content hash of the image bytes (plus the
+    model name, so switching models never serves stale vectors).
+
+    Memory tier: LRU of at most `max_entries` float32 vectors (~2 KiB each
+    for CLIP ViT-B/32). Disk tier (when `disk_dir` is set): one .npy per
+    hash, written atomically. Wraps any embedder with embed_image().
+    """
+
+    def __init__(self, embedder: Any, max_entries: int = IMAGE_CACHE_ENTRIES,
+                 disk_dir: Optional[str] = IMAGE_CACHE_DIR or None):
+        self.embedder = embedder
+        self.max_entries = max(0, int(max_entries))
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._model = str(getattr(embedder, "model_name", "") or "clip")
+        self._mem: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, data: bytes) -> str:
+        h = hashlib.blake2b(data, digest_size=20)
+        h.update(self._model.encode("utf-8"))
+        return h.hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.npy"
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._mem[key] = vec
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    def _load_disk(self, key: str) -> Optional[np.ndarray]:
+        if self.disk_dir is None:
+            return None
+        try:
+            return np.load(self._disk_path(key))
+        except (OSError, ValueError):
+            return None
+
+    def _save_disk(self, key: str, vec: np.ndarray) -> None:
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, vec)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ Image cache write failed for {path}: {e!r}")
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def embed_image(self, image: Any) -> np.ndarray:
+        """Same contract as CLIPEmbedder.embed_image (bytes or a path)."""
+        data = read_image_bytes(image)
+        key = self.key(data)
+
+        with self._lock:
+            vec = self._mem.get(key)
+            if vec is not None:
+                self._mem.move_to_end(key)
+                self._stats["hits"] += 1
+                return vec
+
+        vec = self._load_disk(key)
+        if vec is not None:
+            self._count("disk_hits")
+        else:
+            self._count("misses")
+            vec = np.asarray(self.embedder.embed_image(data), dtype=np.float32)
+            self._save_disk(key, vec)
+        # shared between callers: nobody may mutate it in place
+        vec.setflags(write=False)
+        self._remember(key, vec)
+        return vec
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["entries"] = len(self._mem)
+        lookups = out["hits"] + out["disk_hits"] + out["misses"]
+        out["hit_rate"] = (out["hits"] + out["disk_hits"]) / lookups if lookups else 0.0
+        out["disk"] = str(self.disk_dir) if self.disk_dir is not None else None
+        return out
@@ -0,0 +1,45 @@
+# backend/app/image_io.py
+from __future__ import annotations
+
+import io
+import os
+from typing import Any
+
+# CLIP ViT-B/32 resizes the short side to 224 and center-crops; decoding more
+# pixels than that is wasted work.
+IMAGE_DECODE_SIZE = int(os.getenv("IMAGE_DECODE_SIZE", "224"))
+
+
+def read_image_bytes(image: Any) -> bytes:
+    """Raw bytes of an upload or a filesystem path."""
+    if isinstance(image, str):
+        with open(image, "rb") as f:
+            return f.read()
+    return bytes(image)
+
+
+def load_image(image: Any, size: int = IMAGE_DECODE_SIZE):
+    """
+    Decodes bytes / a path / a PIL image to RGB with the short side >= `size`.
+
+    JPEGs go through draft mode, so libjpeg does the downscale (1/2, 1/4, 1/8)
+    during IDCT and never materialises the full-resolution image. Other
+    formats are decoded fully and then shrunk with a cheap integer reduce()
+    before the model's own (bicubic) resize.
+    """
+    from PIL import Image
+
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        image = Image.open(io.BytesIO(bytes(image)))
+    elif isinstance(image, str):
+        image = Image.open(image)
+
+    if size > 0:
+        if image.format == "JPEG":
+            # draft keeps both sides >= the requested box
+            image.draft("RGB", (size, size))
+        else:
+            factor = min(image.size) // size
+            if factor >= 2:
+                image = image.reduce(factor)
+    return image.convert("RGB")
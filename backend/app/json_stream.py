@@ -0,0 +1,76 @@
+# backend/app/json_stream.py
+import json
+from typing import Any, Dict, Optional
+
+
+class JSONObjectScanner:
+    """
+    Incremental brace matcher for LLM output.
+
+    feed() text as it streams in; it returns the text of the first complete
+    top-level {...} object as soon as its closing brace arrives (strings and
+    escapes are respected). Call feed("") again to continue past an object
+    that turned out not to parse.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.start: Optional[int] = None
+        self.depth = 0
+        self.in_str = False
+        self.esc = False
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if chunk:
+            self.text += chunk
+        text = self.text
+        for i in range(self.pos, len(text)):
+            c = text[i]
+            if self.start is None:
+                if c == "{":
+                    self.start = i
+                    self.depth = 1
+                continue
+            if self.in_str:
+                if self.esc:
+                    self.esc = False
+                elif c == "\\":
+                    self.esc = True
+                elif c == '"':
+                    self.in_str = False
+                continue
+            if c == '"':
+                self.in_str = True
+            elif c == "{":
+                self.depth += 1
+            elif c == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    obj = text[self.start : i + 1]
+                    self.pos = i + 1
+                    self.start = None
+                    return obj
+        self.pos = len(text)
+        return None
+
+    def next_dict(self, chunk: str = "") -> Optional[Dict[str, Any]]:
+        """feed() until a complete object parses as a JSON dict (None if not yet)."""
+        obj = self.feed(chunk)
+        while obj is not None:
+            try:
+                value = json.loads(obj)
+                if isinstance(value, dict):
+                    return value
+            except ValueError:
+                pass
+            obj = self.feed("")
+        return None
+
+
+def extract_json_object(raw: str) -> Dict[str, Any]:
+    """First JSON object in `raw` (markdown fences and surrounding prose are skipped)."""
+    value = JSONObjectScanner().next_dict(raw or "")
+    if value is None:
+        raise ValueError("No JSON object found in planner output")
+    return value
@@ -0,0 +1,124 @@
+# backend/app/live_index.py
+"""
+What the API is actually serving: which physical collection each alias points
+at, and which named vectors each of those collections has.
+
+Per-build files that must match a collection's points (the PCA projections,
+the dedup groups) live in EMBEDDINGS_DIR/collections/<physical name>/ and are
+written by scripts.load_snapshot before the alias swap. Readers resolve the
+alias here and use that collection's files, and the Retriever queries the
+resolved collection directly, so files and points always switch together.
+
+Only the first read blocks (the API does it in lifespan); after that Qdrant
+is re-read in a thread every LIVE_INDEX_REFRESH_S, never on the request path,
+also while it is unreachable. A failed read keeps the previous state.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional
+
+import orjson
+import requests
+
+from app.config import COLLECTION_NAME, QDRANT_URL, SHARD_SEPARATOR, is_versioned
+from app.embedding_store import EMBEDDINGS_DIR
+
+LIVE_INDEX_REFRESH_S = float(os.getenv("LIVE_INDEX_REFRESH_S", "5"))
+
+
+def artifacts_dir(collection: str, root: Path = EMBEDDINGS_DIR) -> Path:
+    return Path(root) / "collections" / collection
+
+
+class LiveIndex:
+    def __init__(self, qdrant_url: str = QDRANT_URL, refresh_s: float = LIVE_INDEX_REFRESH_S):
+        self.qdrant_url = qdrant_url.rstrip("/")
+        self.refresh_s = refresh_s
+        self.http = requests.Session()
+        self._aliases: Optional[Dict[str, str]] = None  # None until the first good read
+        self._collections: List[str] = []
+        self._vectors: Dict[str, FrozenSet[str]] = {}
+        self._last_try: Optional[float] = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def _get(self, path: str) -> Dict:
+        r = self.http.get(f"{self.qdrant_url}{path}", timeout=2)
+        r.raise_for_status()
+        return orjson.loads(r.content)["result"]
+
+    def _vector_names(self, collection: str) -> FrozenSet[str]:
+        vectors = self._get(f"/collections/{collection}")["config"]["params"].get("vectors") or {}
+        # a single unnamed vector is {"size", "distance"}; named ones are {name: {...}}
+        return frozenset() if "size" in vectors else frozenset(vectors)
+
+    def refresh(self) -> bool:
+        """Re-reads aliases and collections; False (state unchanged) on any error."""
+        self._last_try = time.monotonic()
+        try:
+            aliases = {a["alias_name"]: a["collection_name"] for a in self._get("/aliases")["aliases"]}
+            collections = sorted(c["name"] for c in self._get("/collections")["collections"])
+            vectors = {}
+            for name in set(aliases.values()) | {c for c in collections if not is_versioned(c)}:
+                if is_versioned(name) and name in self._vectors:
+                    vectors[name] = self._vectors[name]  # a published version's layout never changes
+                else:
+                    vectors[name] = self._vector_names(name)
+        except Exception as e:
+            print("⚠️ Live index refresh failed, keeping the previous state:", repr(e))
+            return False
+        finally:
+            self._refreshing = False
+        with self._lock:
+            self._aliases, self._collections, self._vectors = aliases, collections, vectors
+        return True
+
+    def _ensure(self) -> None:
+        if self._last_try is None:
+            self.refresh()  # first use only; the API primes this at startup
+        elif time.monotonic() - self._last_try > self.refresh_s and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self.refresh, name="live-index", daemon=True).start()
+
+    @property
+    def ready(self) -> bool:
+        return self._aliases is not None
+
+    def aliases(self) -> Dict[str, str]:
+        self._ensure()
+        return dict(self._aliases or {})
+
+    def physical(self, name: str) -> str:
+        """Collection behind alias `name` (`name` itself when it isn't an alias)."""
+        self._ensure()
+        return (self._aliases or {}).get(name, name)
+
+    def vectors(self, collection: str) -> FrozenSet[str]:
+        """Named vectors of a served collection; empty when unknown."""
+        self._ensure()
+        return self._vectors.get(collection, frozenset())
+
+    def names(self, prefix: str) -> List[str]:
+        """Logical names starting with `prefix`: aliases plus unversioned collections."""
+        self._ensure()
+        out = {a for a in (self._aliases or {}) if a.startswith(prefix)}
+        out.update(c for c in self._collections if c.startswith(prefix) and not is_versioned(c))
+        return sorted(out)
+
+    def served(self, base: str = COLLECTION_NAME) -> List[str]:
+        """Physical collections behind `base` and its shards."""
+        self._ensure()
+
+        def ours(n: str) -> bool:
+            return n == base or n.startswith(f"{base}{SHARD_SEPARATOR}")
+
+        out = {c for a, c in (self._aliases or {}).items() if ours(a)}
+        out.update(c for c in self._collections if ours(c) and not is_versioned(c))
+        return sorted(out)
+
+
+live_index = LiveIndex()
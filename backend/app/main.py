@@ -1,21 +1,76 @@
 # backend/app/main.py
 from __future__ import annotations
 
+import asyncio
 import os
-import json
+import threading
+from collections import Counter
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query
+from fastapi import Depends, FastAPI, UploadFile, File, Form, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-
-from app.planner import plan
-from app.embedder import CLIPEmbedder as Embedder
-from app.retreiver import Retriever  # keep typo filename retreiver.py
-
-
-app = FastAPI(title="Fashion Agentic Search API")
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, PlainTextResponse
+import numpy as np
+
+from app.planner import plan, normalize_plan, fallback_plan
+from app.ollama_client import ollama_stats
+from app.embed_service import EMBED_SERVICE_SOCKET, RemoteEmbedder
+from app.retreiver import Retriever, fuse_hits  # keep typo filename retreiver.py
+from app.config import SHARD_KEY
+from app.shard_router import ShardRouter
+from app.image_cache import ImageEmbeddingCache
+from app.live_index import live_index
+from app.response_cache import RESPONSE_CACHE, IndexVersion, ResponseCache, message_key, plan_key
+from app.deadline import (
+    AdmissionController,
+    Deadline,
+    DEGRADED_TOP_K,
+    FULL_TOPK_MIN_S,
+    IMAGE_MIN_S,
+    OVERFETCH_MIN_S,
+    PLANNER_MIN_S,
+    SEARCH_RESERVE_S,
+)
+from app.session_store import TTLStore
+from app.neighbours import NeighbourTable
+from app.dedup import DuplicateGroups
+from app.conversation import ConversationStore, is_refinement, refinement_text, refine_vector
+from app.speculative import SPECULATIVE_SEARCH, SpeculativeSearch
+from app import profiling
+from app import warmup
+from app.profiling import run_in_threadpool  # tags worker threads for per-request profiles
+
+
+warmup_state = warmup.WarmupState()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    profiling.start_background()
+    # the alias map behind the retriever and the response cache's index version: the only
+    # blocking Qdrant read; later refreshes run in a background thread
+    await run_in_threadpool(live_index.refresh)
+    task = None
+    if warmup.WARMUP:
+        queries = warmup.load_queries(warmup.WARMUP_SOURCE, warmup.WARMUP_QUERIES, DATA_ROOT)
+        job = warmup.run(warmup_state, queries, embedder, retriever, plan if warmup.WARMUP_PLANNER else None)
+        if warmup.WARMUP_BACKGROUND:
+            task = asyncio.create_task(job)
+        else:
+            # uvicorn accepts no connections until this returns
+            await job
+    else:
+        warmup_state.status = "ready"
+    yield
+    if task is not None:
+        task.cancel()
+    profiling.stop_background()
+
+
+app = FastAPI(title="Fashion Agentic Search API", lifespan=lifespan)
+app.add_middleware(profiling.ProfilingMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -36,95 +91,103 @@ DATA_ROOT = (REPO_ROOT / "data").resolve()
 # If your images are under benchmark/data, use:
 # DATA_ROOT = (REPO_ROOT / "benchmark" / "data").resolve()
 
-embedder = Embedder()
-retriever = Retriever()
-
-
-def _extract_json_from_llm(raw: str) -> Dict[str, Any]:
-    if not raw:
-        raise ValueError("Empty planner output")
-
-    s = raw.strip()
-
-    # Remove ``` fences
-    if "```" in s:
-        parts = s.split("```")
-        if len(parts) >= 3:
-            s = parts[1].strip()
-            if s.lower().startswith("json"):
-                s = s[4:].strip()
+if EMBED_SERVICE_SOCKET:
+    # service mode: the model lives in app.embed_service, workers stay torch-free
+    embedder = RemoteEmbedder(EMBED_SERVICE_SOCKET)
+else:
+    from app.embedder import CLIPEmbedder as Embedder
+    embedder = Embedder()
+# uploads are often the same photo again; embed each distinct image once
+image_cache = ImageEmbeddingCache(embedder)
+# sharded index: route each query to the collections its filters imply
+retriever = ShardRouter() if SHARD_KEY else Retriever()
+
+# Result cursors: the first /api/chat call over-fetches and parks the plan,
+# query vector and candidates here so "show more" never re-plans or re-embeds.
+CURSOR_OVERFETCH = int(os.getenv("CURSOR_OVERFETCH", "5"))
+CURSOR_MAX_CANDIDATES = int(os.getenv("CURSOR_MAX_CANDIDATES", "200"))
+CURSOR_MAX_PAGE = int(os.getenv("CURSOR_MAX_PAGE", "50"))
+cursors = TTLStore()
+conversations = ConversationStore()
+neighbours = NeighbourTable()
+duplicate_groups = DuplicateGroups()
+speculation = SpeculativeSearch(embedder, retriever)
+
+admission = AdmissionController()
+# whole /api/chat answers, keyed by plan + index version
+response_cache = ResponseCache()
+index_version = IndexVersion()
+# background revalidations; referenced until done so they can't be garbage-collected mid-run
+_revalidations: set = set()
+degraded_counts: Counter = Counter()
+
+
+def _next_offset(cursor: Dict[str, Any], offset: int) -> Optional[int]:
+    if cursor["exhausted"] and offset >= len(cursor["candidates"]):
+        return None
+    return offset
 
-    # Extract first JSON object
-    if not s.lstrip().startswith("{"):
-        start = s.find("{")
-        end = s.rfind("}")
-        if start == -1 or end == -1 or end <= start:
-            raise ValueError(f"Planner output not JSON:\n{s}")
-        s = s[start : end + 1]
 
-    return json.loads(s)
-
-
-def _normalize_plan(p: Any) -> Dict[str, Any]:
-    if isinstance(p, str):
-        p = _extract_json_from_llm(p)
-    if not isinstance(p, dict):
-        raise ValueError("Plan must be a dict")
-
-    inter = p.get("intermediate_queries") or []
-    norm_inter: List[Dict[str, Any]] = []
-
-    for x in inter:
-        if isinstance(x, str):
-            norm_inter.append({"query": x, "weight": 1.0})
-        elif isinstance(x, dict):
-            q = x.get("query")
-            if not isinstance(q, str):
-                continue
-            w = x.get("weight", 1.0)
-            try:
-                w = float(w)
-            except Exception:
-                w = 1.0
-            norm_inter.append({"query": q, "weight": w})
-
-    if not norm_inter:
-        norm_inter = [{"query": "", "weight": 1.0}]
-
-    weights = p.get("weights") or {"text": 1.0, "image": 0.0}
-    if not isinstance(weights, dict):
-        weights = {"text": 1.0, "image": 0.0}
+@app.get("/health")
+def health():
+    return {"ok": True}
 
-    try:
-        w_text = float(weights.get("text", 1.0))
-    except Exception:
-        w_text = 1.0
-    try:
-        w_img = float(weights.get("image", 0.0))
-    except Exception:
-        w_img = 0.0
 
-    top_k = p.get("top_k", 20)
-    try:
-        top_k = int(top_k)
-    except Exception:
-        top_k = 20
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 until the startup warm-up has finished."""
+    if not warmup_state.ready:
+        return JSONResponse(status_code=503, content={"ready": False, "warmup": warmup_state.status})
+    return {"ready": True}
 
-    filters = p.get("filters") or {}
-    if not isinstance(filters, dict):
-        filters = {}
 
+@app.get("/api/metrics")
+def metrics():
     return {
-        "intermediate_queries": norm_inter,
-        "weights": {"text": w_text, "image": w_img},
-        "top_k": top_k,
-        "filters": filters,
+        "planner": ollama_stats(),
+        "cursors": cursors.stats(),
+        "sessions": conversations.stats(),
+        "admission": admission.stats(),
+        "degraded": dict(degraded_counts),
+        "speculative": speculation.stats(),
+        "shards": retriever.stats() if SHARD_KEY else None,
+        "image_cache": image_cache.stats(),
+        "warmup": warmup_state.stats(),
+        "response_cache": response_cache.stats(),
+        "dedup": duplicate_groups.stats(),
     }
 
 
-@app.get("/health")
-def health():
-    return {"ok": True}
+def _require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not profiling.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@app.get("/admin/profile", dependencies=[Depends(_require_admin)])
+def admin_profile(reset: bool = Query(False)):
+    """Aggregated hot stacks from the background sampler, in collapsed-stack format."""
+    sampler = profiling.background
+    if sampler is None:
+        raise HTTPException(status_code=404, detail="Background profiler is off (set PROFILE_SAMPLE_HZ)")
+    body = sampler.collapsed()
+    headers = {f"X-Profile-{k.title()}": str(v) for k, v in sampler.stats().items()}
+    if reset:
+        sampler.reset()
+    return PlainTextResponse(body, headers=headers)
+
+
+@app.get("/admin/profile/{profile_id}", dependencies=[Depends(_require_admin)])
+def admin_request_profile(profile_id: str):
+    """Collapsed stacks captured for one request sent with `X-Profile: 1`."""
+    prof = profiling.request_profiles.get(profile_id)
+    if prof is None:
+        raise HTTPException(status_code=404, detail="Profile expired or unknown")
+    headers = {
+        "X-Profile-Path": str(prof["path"]),
+        "X-Profile-Wall-Ms": f"{prof['wall_ms']:.1f}",
+        "X-Profile-Samples": str(prof["samples"]),
+    }
+    return PlainTextResponse(prof["collapsed"], headers=headers)
 
 
 @app.get("/api/image")
@@ -161,6 +224,7 @@ def get_image(path: str = Query(..., description="Relative under DATA_ROOT or ab
 async def chat(
     message: str = Form(""),
     image: Optional[UploadFile] = File(None),
+    session_id: Optional[str] = Form(None),
 ):
     msg = (message or "").strip()
     has_image = image is not None
@@ -168,50 +232,387 @@ async def chat(
     if not msg and not has_image:
         raise HTTPException(status_code=400, detail="Provide message or image")
 
-    # 1) Planner
-    raw_plan = plan(message=msg, has_image=has_image, chat_history=[])
-    try:
-        p = _normalize_plan(raw_plan)
-    except Exception as e:
+    # shed load up front instead of queueing into an unbounded tail
+    if not admission.try_acquire():
         return JSONResponse(
-            status_code=500,
-            content={"error": f"Planner parse failed: {str(e)}", "raw_plan": str(raw_plan)},
+            status_code=503,
+            content={"error": "Server busy, retry shortly"},
+            headers={"Retry-After": "1"},
+        )
+    try:
+        image_bytes = await image.read() if has_image else b""
+        return await _chat(msg, image_bytes, session_id, Deadline())
+    finally:
+        admission.release()
+
+
+def _stage_error(stage: str, e: Exception, deadline: Deadline, **extra: Any) -> JSONResponse:
+    status = 504 if deadline.expired() else 500
+    return JSONResponse(status_code=status, content={"error": f"{stage} failed: {str(e)}", **extra})
+
+
+def _open_cursor(entry: Dict[str, Any]) -> tuple:
+    """New cursor over a result set; the candidate list is copied because paging extends it."""
+    cursor_id = cursors.new_id()
+    cursor = {
+        "plan": entry["plan"],
+        "query_used": entry["query_used"],
+        "filters": entry["filters"],
+        "vectors": entry["vectors"],
+        # fused lists can't be continued with a single-vector offset search
+        "mode": entry["mode"],
+        "candidates": list(entry["candidates"]),
+        "exhausted": entry["exhausted"],
+        "lock": threading.Lock(),
+    }
+    cursors.put(cursor_id, cursor)
+    return cursor_id, cursor
+
+
+def _serve_cached(entry: Dict[str, Any], key: str, stale: bool, msg: str, session_id: str) -> ORJSONResponse:
+    if stale and response_cache.begin_revalidate(key):
+        # a revalidation is a search like any other: it needs an admission slot, else the next stale hit retries
+        if admission.try_acquire():
+            task = asyncio.create_task(_revalidate(key, entry))
+            _revalidations.add(task)
+            task.add_done_callback(_revalidations.discard)
+        else:
+            response_cache.end_revalidate(key)
+    cursor_id, cursor = _open_cursor(entry)
+    if "text" in entry["vectors"]:
+        conversations.record_turn(session_id, msg, entry["plan"], entry["query_used"], entry["vectors"]["text"],
+                                  entry["candidates"])
+    return ORJSONResponse({
+        "plan": entry["plan"],
+        "query_used": entry["query_used"],
+        "results": entry["candidates"][:entry["top_k"]],
+        "cursor": {"id": cursor_id, "next_offset": _next_offset(cursor, entry["top_k"])},
+        "session_id": session_id,
+        "refined": False,
+        "degraded": [],
+        "speculative": False,
+        "cache": "stale" if stale else "fresh",
+    })
+
+
+async def _search(vectors: Dict[str, Any], filters: Dict[str, Any], fetch_k: int, timeout_s: float,
+                  text_hits: Optional[List[Any]] = None) -> tuple:
+    """(text hits, image hits) for the query vectors, run side by side; text_hits given = already searched."""
+
+    async def search(mode: str) -> List[Any]:
+        if vectors.get(mode) is None:
+            return []
+        return await run_in_threadpool(
+            retriever.search, mode, vectors[mode], top_k=fetch_k, filters=filters, timeout_s=timeout_s,
         )
 
-    # 2) Best query
-    best = max(p["intermediate_queries"], key=lambda x: float(x.get("weight", 1.0)) or 0.0)
-    query_used = (best.get("query") or "").strip() or msg
-    top_k = int(p.get("top_k", 20))
-    filters = p.get("filters", {})
+    if text_hits is not None:
+        return text_hits, await search("image")
+    text_hits, img_hits = await asyncio.gather(search("text"), search("image"))
+    return text_hits, img_hits
+
 
-    # 3) Embed + Search
+def _merge(text_hits: List[Any], img_hits: List[Any], vectors: Dict[str, Any], weights: Dict[str, Any],
+           fetch_k: int) -> tuple:
+    """(candidates, cursor mode); mode None = a fused list that can't be extended by offset search."""
+    if "text" in vectors and "image" in vectors:
+        w_text = float(weights.get("text", 1.0))
+        w_img = float(weights.get("image", 0.0))
+        return fuse_hits(text_hits, img_hits, w_text, w_img)[:fetch_k], None
+    if "image" in vectors:
+        return img_hits, "image"
+    return text_hits[:fetch_k], "text"
+
+
+async def _revalidate(key: str, entry: Dict[str, Any]) -> None:
+    # Refreshes a stale entry in place: same plan, same query vectors, a new
+    # search. No planner (a session-less or re-sampled plan would land under
+    # another key) and no embedding (the stored vectors are what the cached
+    # ranking, and any cursor opened from it, was built with).
     try:
-        q_text_vec = embedder.embed_text(query_used)
+        fetch_k = entry["fetch_k"]
+        deadline = Deadline()
+        text_hits, img_hits = await _search(entry["vectors"], entry["filters"], fetch_k, deadline.timeout(cap=120))
+        candidates, mode = _merge(text_hits, img_hits, entry["vectors"], entry["plan"]["weights"], fetch_k)
+        response_cache.put(key, {
+            **entry,
+            "candidates": tuple(candidates),
+            "exhausted": mode is None or len(candidates) < fetch_k,
+        })
     except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={"error": f"Embed failed: {str(e)}", "query_used": query_used, "plan": p},
-        )
+        print("⚠️ Response cache revalidation failed:", repr(e))
+    finally:
+        admission.release()
+        response_cache.end_revalidate(key)
+
+
+async def _chat(msg: str, image_bytes: bytes, session_id: Optional[str], deadline: Deadline):
+    has_image = bool(image_bytes)
+    degraded: List[str] = []
+
+    session = conversations.get(session_id)
+    if session is None:
+        session_id = conversations.new_id()
+    refined = session is not None and not has_image and is_refinement(msg)
+
+    # Response cache: refinements depend on session state and are never cached.
+    # A first turn (no history for the planner) can be answered from the
+    # message alone; later turns are looked up once the plan is known.
+    cacheable = RESPONSE_CACHE and not refined
+    first_turn = session is None or not session["turns"]
+    version = image_key = msg_key = ""
+    if cacheable:
+        version = index_version.current()
+        response_cache.check_version(version)
+        image_key = image_cache.key(image_bytes) if has_image else ""
+        if first_turn:
+            msg_key = message_key(version, msg, image_key)
+            key = response_cache.plan_for(msg_key)
+            if key is not None:
+                # a miss here is counted by the plan-key lookup below
+                entry, stale = response_cache.get(key, count_miss=False)
+                if entry is not None:
+                    return _serve_cached(entry, key, stale, msg, session_id)
+
+    q_text_vec = None
+    text_hits = None
+    spec_task = None
+    if refined:
+        # Follow-up turn ("same but in red"): nudge the previous query towards the
+        # new text with vector arithmetic instead of another planner round-trip.
+        delta = refinement_text(msg)
+        prev_query = session["turns"][-1]["query_used"]
+        query_used = f"{prev_query} + {delta}" if delta else prev_query
+        p = dict(session["plan"])
+        p["intermediate_queries"] = [{"query": query_used, "weight": 1.0}]
+        filters = session["filters"]
+
+        if not delta:
+            # "show me more": nothing to blend in, search the previous query again
+            q_text_vec = session["query_vec"]
+        else:
+            try:
+                delta_vec = await run_in_threadpool(embedder.embed_text, delta)
+            except Exception as e:
+                return _stage_error("Embed", e, deadline, query_used=query_used, plan=p)
+            try:
+                centroid = await run_in_threadpool(
+                    conversations.centroid,
+                    session,
+                    lambda ids: retriever.fetch_vectors(ids, "text", timeout_s=deadline.timeout(cap=2.0)),
+                )
+            except Exception as e:
+                print("⚠️ Centroid lookup failed, refining from the previous query only:", repr(e))
+                centroid = None
+            q_text_vec = refine_vector(session["query_vec"], centroid, delta_vec)
+    else:
+        # 1) Planner (skipped for the fallback plan when the budget can't cover it)
+        if deadline.allows(PLANNER_MIN_S):
+            # embed + search the raw message while the planner thinks
+            if SPECULATIVE_SEARCH and msg:
+                spec_task = speculation.start(msg, timeout_s=deadline.timeout(cap=120))
+            # off the event loop, so concurrent identical queries can share one generation
+            try:
+                raw_plan = await run_in_threadpool(
+                    plan,
+                    message=msg,
+                    has_image=has_image,
+                    chat_history=conversations.chat_history(session),
+                    timeout_s=deadline.timeout(cap=600, reserve=SEARCH_RESERVE_S),
+                    strict=True,
+                )
+            except Exception as e:
+                # answered with the fallback plan: degraded, so never cached as a complete answer
+                print("❌ Planner failed, using fallback. Error:", repr(e))
+                raw_plan = fallback_plan(msg, has_image)
+                degraded.append("planner_failed")
+        else:
+            raw_plan = fallback_plan(msg, has_image)
+            degraded.append("planner_skipped")
+        try:
+            p = normalize_plan(raw_plan, msg, has_image)
+        except Exception as e:
+            if spec_task is not None:
+                spec_task.cancel()
+            return JSONResponse(
+                status_code=500,
+                content={"error": f"Planner parse failed: {str(e)}", "raw_plan": str(raw_plan)},
+            )
+
+        # 2) Best query
+        best = max(p["intermediate_queries"], key=lambda x: float(x.get("weight", 1.0)) or 0.0)
+        query_used = (best.get("query") or "").strip() or msg
+        filters = p.get("filters", {})
 
+    top_k = int(p.get("top_k", 20))
+    if not deadline.allows(FULL_TOPK_MIN_S) and top_k > DEGRADED_TOP_K:
+        top_k = DEGRADED_TOP_K
+        degraded.append("top_k_reduced")
+    if deadline.allows(OVERFETCH_MIN_S):
+        fetch_k = max(top_k, min(top_k * CURSOR_OVERFETCH, CURSOR_MAX_CANDIDATES))
+    else:
+        fetch_k = top_k
+        degraded.append("overfetch_skipped")
+
+    key = None
+    if cacheable and not degraded:
+        key = plan_key(version, p, query_used, image_key, fetch_k)
+        if msg_key:
+            response_cache.remember_plan(msg_key, key)
+        entry, stale = response_cache.get(key)
+        if entry is not None:
+            if spec_task is not None:
+                spec_task.cancel()
+            return _serve_cached(entry, key, stale, msg, session_id)
+
+    # 3) Embed (the speculative run may already have done it, and the search too)
+    if spec_task is not None:
+        try:
+            # a fused text+image list can't be extended later, so it needs all fetch_k now
+            q_text_vec, text_hits = await speculation.resolve(
+                spec_task, msg, query_used, filters, fetch_k if has_image else top_k,
+                embed=lambda q: run_in_threadpool(embedder.embed_text, q),
+            )
+        except Exception as e:
+            return _stage_error("Embed", e, deadline, query_used=query_used, plan=p)
+    if q_text_vec is None and query_used:
+        try:
+            q_text_vec = await run_in_threadpool(embedder.embed_text, query_used)
+        except Exception as e:
+            return _stage_error("Embed", e, deadline, query_used=query_used, plan=p)
+
+    # image vector: optional when there is text to search with
+    q_img_vec = None
+    w_img = float(p["weights"].get("image", 0.0))
+    if has_image and (w_img > 0 or q_text_vec is None):
+        if q_text_vec is not None and not deadline.allows(IMAGE_MIN_S):
+            degraded.append("image_skipped")
+        else:
+            try:
+                q_img_vec = await run_in_threadpool(image_cache.embed_image, image_bytes)
+            except Exception as e:
+                return _stage_error("Image embed", e, deadline, query_used=query_used, plan=p)
+
+    # 4) Search (text and image side by side, sharing the remaining budget)
+    speculative = text_hits is not None
+    vectors = {}
+    if q_text_vec is not None:
+        vectors["text"] = np.asarray(q_text_vec, dtype=np.float32)
+    if q_img_vec is not None:
+        vectors["image"] = np.asarray(q_img_vec, dtype=np.float32)
     try:
-        # ✅ FIX: use q_text_vec (not q_text)
-        text_hits = retriever.search("text", q_text_vec, top_k=top_k, filters=filters)
+        text_hits, img_hits = await _search(vectors, filters, fetch_k, deadline.timeout(cap=120), text_hits)
     except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={"error": f"Search failed: {str(e)}", "query_used": query_used, "plan": p},
-        )
-
-    # 4) Normalize hits
-    hits = retriever.search("text", q_text_vec, top_k=top_k, filters=p.get("filters"))
-
-    results = []
-    for h in hits:
-        payload = (h.get("payload") or {})
-        results.append({
-            "product_id": payload.get("product_id") or str(h.get("id")),
-            "score": float(h.get("score", 0.0)),
-            "description": payload.get("description"),
-            "image_path": payload.get("image_path") or payload.get("image_abs_path"),
-        })
-    return {"plan": p, "query_used": query_used, "results": results}
+        return _stage_error("Search", e, deadline, query_used=query_used, plan=p)
+    candidates, mode = _merge(text_hits, img_hits, vectors, p["weights"], fetch_k)
+    # what the search behind the candidates asked for (speculation fetches its own k)
+    searched_k = min(fetch_k, speculation.fetch_k) if speculative and mode == "text" else fetch_k
+
+    # 5) Park the over-fetched candidates behind a cursor
+    entry = {
+        "plan": p,
+        "query_used": query_used,
+        "filters": filters,
+        "vectors": vectors,
+        "mode": mode,
+        "candidates": tuple(candidates),
+        "exhausted": mode is None or len(candidates) < searched_k,
+        "top_k": top_k,
+        "fetch_k": fetch_k,
+    }
+    # cached results are only complete answers: nothing degraded by the deadline
+    if key is not None and not degraded:
+        response_cache.put(key, entry)
+    cursor_id, cursor = _open_cursor(entry)
+    if q_text_vec is not None:
+        conversations.record_turn(session_id, msg, p, query_used, q_text_vec, candidates)
+
+    degraded_counts.update(degraded)
+
+    # Hit is a slotted dataclass: ORJSONResponse writes it directly, skipping
+    # FastAPI's jsonable_encoder pass over every result
+    return ORJSONResponse({
+        "plan": p,
+        "query_used": query_used,
+        "results": candidates[:top_k],
+        "cursor": {"id": cursor_id, "next_offset": _next_offset(cursor, top_k)},
+        "session_id": session_id,
+        "refined": refined,
+        "degraded": degraded,
+        "speculative": speculative,
+        "cache": "miss" if key is not None else None,
+    })
+
+
+@app.get("/api/results/{cursor_id}")
+def results_page(
+    cursor_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1),
+):
+    """
+    Pages through a previous /api/chat result set.
+    Served from the cached candidates when possible; past their end we run an
+    offset search with the cached query vector. No planner, no embedding.
+    """
+    cursor = cursors.get(cursor_id)
+    if cursor is None:
+        raise HTTPException(status_code=404, detail="Cursor expired or unknown")
+
+    limit = min(limit, CURSOR_MAX_PAGE)
+    candidates = cursor["candidates"]
+    end = offset + limit
+
+    with cursor["lock"]:
+        if end > len(candidates) and not cursor["exhausted"]:
+            # only extend contiguously so the cached list stays a prefix of the ranking
+            start = len(candidates)
+            want = end - start
+            try:
+                more = retriever.search(
+                    cursor["mode"],
+                    cursor["vectors"][cursor["mode"]],
+                    top_k=want,
+                    filters=cursor["filters"],
+                    offset=start,
+                )
+            except Exception as e:
+                return JSONResponse(status_code=500, content={"error": f"Search failed: {str(e)}"})
+            candidates.extend(more)
+            cursor["exhausted"] = len(more) < want
+            cursors.put(cursor_id, cursor)
+
+    page = candidates[offset:end]
+    return ORJSONResponse({
+        "cursor": {"id": cursor_id, "next_offset": _next_offset(cursor, end)},
+        "query_used": cursor["query_used"],
+        "offset": offset,
+        "results": page,
+    })
+
+
+@app.get("/api/similar/{product_id}")
+def similar(
+    product_id: str,
+    vector: str = Query("text", description="text or image"),
+    k: int = Query(10, ge=1, le=100),
+):
+    """More-like-this from the precomputed table (scripts/build_neighbours.py)."""
+    if vector not in neighbours.available():
+        raise HTTPException(status_code=404, detail=f"No '{vector}' neighbour table; run scripts.build_neighbours")
+    hits = neighbours.similar(product_id, vector=vector, k=k)
+    if hits is None:
+        raise HTTPException(status_code=404, detail=f"Unknown product_id: {product_id}")
+    return ORJSONResponse({"product_id": product_id, "vector": vector, "results": hits})
+
+
+@app.get("/api/group/{product_id}")
+def group(product_id: str):
+    """Near-duplicates collapsed into (or together with) product_id at index time."""
+    members = duplicate_groups.members(product_id)
+    return ORJSONResponse({
+        "product_id": product_id,
+        "group_id": duplicate_groups.group_id(product_id),
+        "size": max(len(members), 1),
+        "members": members,
+    })
@@ -0,0 +1,203 @@
+# backend/app/neighbours.py
+"""
+Precomputed "more like this" table.
+
+scripts/build_neighbours.py writes, per named vector ("text", "image"):
+  {name}_ids.npy     int32   (N, K)  row indices of the K nearest products, -1 padded
+  {name}_scores.npy  float16 (N, K)  cosine similarities
+  {name}_vectors.npy float32 (N, D)  unit vectors (zero row = product has no such vector)
+plus products.json (row -> product) and meta.json. The API memory-maps the
+ids/scores arrays, so a lookup is a dict hit plus one row slice.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.retreiver import Hit
+
+NEIGHBOURS_DIR = Path(
+    os.getenv("NEIGHBOURS_DIR", str(Path(__file__).resolve().parents[2] / "data" / "neighbours"))
+)
+NEIGHBOURS_K = int(os.getenv("NEIGHBOURS_K", "20"))
+# cap on the (block, N) similarity matrix held in memory at once
+NEIGHBOURS_BLOCK_BYTES = int(os.getenv("NEIGHBOURS_BLOCK_BYTES", str(256 * 1024 * 1024)))
+
+
+# ---------------------------------------------------------------------------
+# offline computation (used by scripts/build_neighbours.py)
+# ---------------------------------------------------------------------------
+
+def _block_rows(n: int) -> int:
+    return max(1, NEIGHBOURS_BLOCK_BYTES // (4 * max(1, n)))
+
+
+def topk_neighbours(X: np.ndarray, k: int, rows: Optional[np.ndarray] = None):
+    """
+    Exact top-k cosine neighbours for `rows` of X (unit rows; zero rows are
+    treated as missing) computed in blocked matrix products.
+    Returns (ids int32 (m, k), scores float16 (m, k)); self is excluded.
+    """
+    n = X.shape[0]
+    valid = np.einsum("ij,ij->i", X, X) > 0
+    rows = np.arange(n) if rows is None else np.asarray(rows, dtype=np.int64)
+    ids = np.full((len(rows), k), -1, dtype=np.int32)
+    scores = np.full((len(rows), k), -np.inf, dtype=np.float16)
+    kk = min(k, n - 1)
+    if kk <= 0:
+        return ids, scores
+
+    step = _block_rows(n)
+    for start in range(0, len(rows), step):
+        r = rows[start : start + step]
+        S = X[r] @ X.T
+        S[:, ~valid] = -np.inf
+        S[np.arange(len(r)), r] = -np.inf
+        part = np.argpartition(-S, kk - 1, axis=1)[:, :kk]
+        ps = np.take_along_axis(S, part, axis=1)
+        order = np.argsort(-ps, axis=1)
+        top = np.take_along_axis(part, order, axis=1).astype(np.int32)
+        tops = np.take_along_axis(ps, order, axis=1)
+        top[~np.isfinite(tops)] = -1
+        top[~valid[r]] = -1
+        tops[~valid[r]] = -np.inf
+        ids[start : start + len(r), :kk] = top
+        scores[start : start + len(r), :kk] = tops
+    return ids, scores
+
+
+def update_neighbours(X: np.ndarray, ids: np.ndarray, scores: np.ndarray, changed: np.ndarray, k: int):
+    """
+    Incremental refresh after the vectors of `changed` rows were replaced or
+    appended (X already holds the new vectors; ids/scores may be shorter).
+
+    - changed rows, and rows whose list referenced a changed row, are
+      recomputed exactly (a stale entry may have dropped below their k-th)
+    - every other row only merges the changed rows' new scores into its list
+    """
+    n = X.shape[0]
+    changed = np.unique(np.asarray(changed, dtype=np.int64))
+    if len(ids) < n:
+        pad = n - len(ids)
+        ids = np.vstack([ids, np.full((pad, k), -1, dtype=np.int32)])
+        scores = np.vstack([scores, np.full((pad, k), -np.inf, dtype=np.float16)])
+    else:
+        ids = np.array(ids)
+        scores = np.array(scores)
+    if not len(changed):
+        return ids, scores
+
+    stale = np.isin(ids, changed).any(axis=1)
+    redo = np.union1d(changed, np.nonzero(stale)[0])
+    others = np.setdiff1d(np.arange(n), redo)
+
+    valid = np.einsum("ij,ij->i", X, X) > 0
+    cand_valid = valid[changed]
+    step = _block_rows(len(changed) + k)
+    for start in range(0, len(others), step):
+        r = others[start : start + step]
+        C = (X[r] @ X[changed].T).astype(np.float32)
+        C[:, ~cand_valid] = -np.inf
+        C[~valid[r]] = -np.inf
+        all_ids = np.hstack([ids[r], np.broadcast_to(changed.astype(np.int32), C.shape)])
+        all_sc = np.hstack([scores[r].astype(np.float32), C])
+        order = np.argsort(-all_sc, axis=1)[:, :k]
+        new_sc = np.take_along_axis(all_sc, order, axis=1)
+        new_ids = np.take_along_axis(all_ids, order, axis=1)
+        new_ids[~np.isfinite(new_sc)] = -1
+        ids[r] = new_ids
+        scores[r] = new_sc
+
+    ids[redo], scores[redo] = topk_neighbours(X, k, rows=redo)
+    return ids, scores
+
+
+def _atomic_save(path: Path, arr: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp.npy")
+    np.save(tmp, arr)
+    os.replace(tmp, path)
+
+
+def save_table(
+    root: Path,
+    products: List[Dict[str, Any]],
+    tables: Dict[str, Dict[str, np.ndarray]],
+    k: int,
+) -> None:
+    """Writes arrays first and meta.json last, so readers reload a complete set."""
+    root.mkdir(parents=True, exist_ok=True)
+    for name, t in tables.items():
+        for part in ("ids", "scores", "vectors"):
+            _atomic_save(root / f"{name}_{part}.npy", t[part])
+    tmp = root / "products.json.tmp"
+    tmp.write_text(json.dumps(products), encoding="utf-8")
+    os.replace(tmp, root / "products.json")
+    tmp = root / "meta.json.tmp"
+    tmp.write_text(json.dumps({"k": k, "count": len(products), "vectors": sorted(tables)}), encoding="utf-8")
+    os.replace(tmp, root / "meta.json")
+
+
+# ---------------------------------------------------------------------------
+# serving
+# ---------------------------------------------------------------------------
+
+class NeighbourTable:
+    """Memory-mapped lookup; picks up rebuilt or updated tables via meta.json mtime."""
+
+    def __init__(self, root: Path = NEIGHBOURS_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._mtime: Optional[int] = None
+        self._products: List[Dict[str, Any]] = []
+        self._row: Dict[str, int] = {}
+        self._ids: Dict[str, np.ndarray] = {}
+        self._scores: Dict[str, np.ndarray] = {}
+
+    def _maybe_load(self) -> bool:
+        try:
+            mtime = (self.root / "meta.json").stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._mtime:
+            return True
+        with self._lock:
+            if mtime != self._mtime:
+                meta = json.loads((self.root / "meta.json").read_text(encoding="utf-8"))
+                products = json.loads((self.root / "products.json").read_text(encoding="utf-8"))
+                ids, scores = {}, {}
+                for name in meta.get("vectors", []):
+                    ids[name] = np.load(self.root / f"{name}_ids.npy", mmap_mode="r")
+                    scores[name] = np.load(self.root / f"{name}_scores.npy", mmap_mode="r")
+                self._products = products
+                self._row = {p["product_id"]: i for i, p in enumerate(products)}
+                self._ids, self._scores = ids, scores
+                self._mtime = mtime
+        return True
+
+    def available(self) -> List[str]:
+        return sorted(self._ids) if self._maybe_load() else []
+
+    def similar(self, product_id: str, vector: str = "text", k: int = 10) -> Optional[List[Hit]]:
+        """None if the table or product is unknown; KeyError for an unknown vector name."""
+        if not self._maybe_load():
+            return None
+        row = self._row.get(product_id)
+        if row is None:
+            return None
+        ids = self._ids[vector][row, :k]
+        scores = self._scores[vector][row, :k]
+        out: List[Hit] = []
+        for j, s in zip(ids.tolist(), scores.tolist()):
+            if j < 0:
+                break
+            p = self._products[j]
+            out.append(Hit(
+                p.get("id"), p["product_id"], float(s), p.get("description"), p.get("image_path"),
+                p.get("group_size", 1),
+            ))
+        return out
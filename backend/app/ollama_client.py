@@ -1,23 +1,184 @@
 # backend/app/ollama_client.py
+import hashlib
+import json
 import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from app.json_stream import JSONObjectScanner
 
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
+# keep the model resident between planner calls (Ollama unloads after 5m by default)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# cap on concurrent generations hitting the local Ollama host
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2"))
+
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=max(4, OLLAMA_MAX_CONCURRENCY * 2)))
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max(4, OLLAMA_MAX_CONCURRENCY * 2)))
+
+_generation_slots = threading.BoundedSemaphore(max(1, OLLAMA_MAX_CONCURRENCY))
+
+_inflight: Dict[str, "_Call"] = {}
+_lock = threading.Lock()
+_stats = {
+    "requests": 0,
+    "generations": 0,
+    "deduplicated": 0,
+    "errors": 0,
+    "in_flight": 0,
+    "tokens": 0,
+    "early_stops": 0,
+    "generation_ms": 0.0,
+}
+
+
+class _Call:
+    """One in-flight generation; identical concurrent prompts wait on it."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
 
-def ollama_generate(system: str, user: str, model: str = "llama3.2:1b", timeout_s: int = 600) -> str:
+
+def _post(payload: Dict[str, Any], timeout_s: float) -> str:
+    # (connect timeout, read timeout)
+    r = _session.post(OLLAMA_URL, json=payload, timeout=(min(10, timeout_s), timeout_s))
+    r.raise_for_status()
+    data = r.json()
+    _count(tokens=int(data.get("eval_count") or 0))
+    return (data.get("response") or "").strip()
+
+
+def _post_until_json(payload: Dict[str, Any], timeout_s: float) -> str:
     """
-    Uses Ollama /api/generate (non-stream) and returns plain text response.
+    Streams the generation and hangs up as soon as a complete JSON object has
+    been parsed; closing the connection makes Ollama stop generating.
+    timeout_s bounds the whole stream, not just the gap between chunks.
     """
-    payload = {
+    t_end = time.monotonic() + timeout_s
+    scanner = JSONObjectScanner()
+    parts = []
+    tokens = 0
+    early = False
+    with _session.post(OLLAMA_URL, json=payload, timeout=(min(10, timeout_s), timeout_s), stream=True) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if time.monotonic() > t_end:
+                raise TimeoutError(f"Ollama generation exceeded {timeout_s:.1f}s")
+            if not line:
+                continue
+            chunk = json.loads(line)
+            piece = chunk.get("response") or ""
+            if chunk.get("done"):
+                tokens = int(chunk.get("eval_count") or tokens)
+                parts.append(piece)
+                break
+            tokens += 1
+            parts.append(piece)
+            if scanner.next_dict(piece) is not None:
+                early = True
+                break
+    _count(tokens=tokens, early_stops=int(early))
+    return "".join(parts).strip()
+
+
+def _count(**deltas: Any) -> None:
+    with _lock:
+        for k, v in deltas.items():
+            _stats[k] += v
+
+
+def ollama_generate(
+    system: str,
+    user: str,
+    model: str = "llama3.2:1b",
+    timeout_s: float = 600,
+    format: Optional[Any] = None,
+    num_predict: Optional[int] = None,
+    stop_after_json: bool = False,
+) -> str:
+    """
+    Uses Ollama /api/generate and returns plain text response.
+
+    - format: "json" or a JSON schema dict for grammar-constrained output
+    - num_predict: hard cap on generated tokens
+    - stop_after_json: stream and stop at the first complete JSON object
+
+    Concurrent calls with an identical payload share a single generation
+    (single-flight); distinct generations are capped at OLLAMA_MAX_CONCURRENCY.
+    """
+    options: Dict[str, Any] = {"temperature": 0.2}
+    if num_predict:
+        options["num_predict"] = int(num_predict)
+    payload: Dict[str, Any] = {
         "model": model,
         "prompt": f"{system}\n\nUSER:\n{user}\n",
-        "stream": False,
-        "options": {
-            "temperature": 0.2,
-        },
+        "stream": bool(stop_after_json),
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": options,
     }
-    # (connect timeout, read timeout)
-    r = requests.post(OLLAMA_URL, json=payload, timeout=(10, timeout_s))
-    r.raise_for_status()
-    data = r.json()
-    return (data.get("response") or "").strip()
+    if format:
+        payload["format"] = format
+    key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    with _lock:
+        _stats["requests"] += 1
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _Call()
+            _inflight[key] = call
+        else:
+            _stats["deduplicated"] += 1
+
+    if not leader:
+        if not call.done.wait(timeout_s):
+            raise TimeoutError("Timed out waiting for shared Ollama generation")
+        if call.error is not None:
+            raise call.error
+        return call.result or ""
+
+    try:
+        # timeout_s covers the slot wait and the generation together
+        t_end = time.monotonic() + timeout_s
+        if not _generation_slots.acquire(timeout=timeout_s):
+            raise TimeoutError("No free Ollama generation slot")
+        t0 = time.perf_counter()
+        try:
+            _count(generations=1, in_flight=1)
+            remaining = t_end - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("No time left for the Ollama generation after the slot wait")
+            post = _post_until_json if stop_after_json else _post
+            call.result = post(payload, remaining)
+        finally:
+            _generation_slots.release()
+            _count(in_flight=-1, generation_ms=(time.perf_counter() - t0) * 1000.0)
+        return call.result
+    except BaseException as e:
+        call.error = e
+        _count(errors=1)
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+        call.done.set()
+
+
+def ollama_stats() -> Dict[str, Any]:
+    with _lock:
+        out = dict(_stats)
+    gens = max(1, out["generations"])
+    out["avg_tokens"] = out["tokens"] / gens
+    out["avg_generation_ms"] = out["generation_ms"] / gens
+    out["max_concurrency"] = OLLAMA_MAX_CONCURRENCY
+    out["keep_alive"] = OLLAMA_KEEP_ALIVE
+    return out
@@ -1,9 +1,19 @@
 # backend/app/planner.py
-import json
+import os
+import time
 from typing import Any, Dict, List
 
+from app.json_stream import extract_json_object
 from app.ollama_client import ollama_generate
 
+PLANNER_MODEL = os.getenv("PLANNER_MODEL", "llama3.2:1b")
+# a full plan is ~60-120 tokens; anything beyond this is the model rambling
+PLANNER_NUM_PREDICT = int(os.getenv("PLANNER_NUM_PREDICT", "256"))
+# "schema" (Ollama >= 0.5 structured outputs), "json" (older Ollama) or "" to disable;
+# "schema" drops to "json" for good the first time the server rejects it
+PLANNER_FORMAT = os.getenv("PLANNER_FORMAT", "schema")
+_format = PLANNER_FORMAT
+
 PLANNER_SYSTEM = """You are a planner for a fashion search system.
 Return ONLY a valid JSON object. No markdown. No backticks. No explanations.
 
@@ -21,24 +31,52 @@ Rules:
 - filters must be an object (can be empty)
 """
 
-def _extract_json_object(raw: str) -> Dict[str, Any]:
-    """
-    Robust extraction:
-    - strips ```json ``` wrappers
-    - finds first '{' and last '}' and parses that slice
-    - if multiple JSON blocks exist, this still works (takes outermost)
-    """
-    s = (raw or "").strip()
-    s = s.replace("```json", "").replace("```", "").strip()
+# Same shape as PLANNER_SYSTEM, handed to Ollama as a grammar constraint.
+PLAN_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "intermediate_queries": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"query": {"type": "string"}, "weight": {"type": "number"}},
+                "required": ["query", "weight"],
+            },
+        },
+        "weights": {
+            "type": "object",
+            "properties": {"text": {"type": "number"}, "image": {"type": "number"}},
+            "required": ["text", "image"],
+        },
+        "top_k": {"type": "integer", "minimum": 1, "maximum": 50},
+        "filters": {"type": "object"},
+    },
+    "required": ["intermediate_queries", "weights", "top_k", "filters"],
+}
+
+
+def _planner_format() -> Any:
+    if _format == "schema":
+        return PLAN_SCHEMA
+    return _format or None
+
+
+def _schema_rejected(e: Exception) -> bool:
+    """Ollama < 0.5 answers a schema `format` with 400 (it only takes a string there)."""
+    r = getattr(e, "response", None)
+    return _format == "schema" and r is not None and r.status_code == 400 and "format" in (r.text or "")
 
-    i = s.find("{")
-    j = s.rfind("}")
-    if i == -1 or j == -1 or j <= i:
-        raise ValueError("No JSON object found in planner output")
 
-    return json.loads(s[i : j + 1])
+def normalize_plan(p: Any, message: str = "", has_image: bool = False) -> Dict[str, Any]:
+    """
+    The single plan validator: accepts raw planner text or a dict and always
+    returns a well-formed plan. Idempotent on its own output.
+    """
+    if isinstance(p, str):
+        p = extract_json_object(p)
+    if not isinstance(p, dict):
+        raise ValueError("Plan must be a dict")
 
-def _normalize_plan(p: Dict[str, Any], message: str, has_image: bool) -> Dict[str, Any]:
     # Ensure keys exist + types are correct
     iq = p.get("intermediate_queries")
     if not isinstance(iq, list) or len(iq) == 0:
@@ -93,7 +131,26 @@ def _normalize_plan(p: Dict[str, Any], message: str, has_image: bool) -> Dict[st
         "filters": filters,
     }
 
-def plan(message: str, has_image: bool, chat_history: List[Dict[str, str]] | None = None) -> Dict[str, Any]:
+def fallback_plan(message: str, has_image: bool) -> Dict[str, Any]:
+    """Plan used when the LLM fails or there is no time budget left for it."""
+    return {
+        "intermediate_queries": [{"query": message, "weight": 1.0}],
+        "weights": {"text": 1.0, "image": 0.0 if not has_image else 0.2},
+        "top_k": 10,
+        "filters": {},
+    }
+
+def plan(
+    message: str,
+    has_image: bool,
+    chat_history: List[Dict[str, str]] | None = None,
+    timeout_s: float = 600,
+    strict: bool = False,
+) -> Dict[str, Any]:
+    """
+    LLM plan for one message. On any failure (Ollama down, timeout, bad JSON)
+    returns fallback_plan, or re-raises when `strict` so the caller can tell.
+    """
     user_prompt = f"""
 User message: {message}
 Has image: {has_image}
@@ -102,16 +159,32 @@ Chat history: {chat_history or []}
 Return the JSON plan.
 """.strip()
 
+    def generate(timeout_s: float) -> str:
+        return ollama_generate(
+            system=PLANNER_SYSTEM,
+            user=user_prompt,
+            model=PLANNER_MODEL,
+            timeout_s=timeout_s,
+            format=_planner_format(),
+            num_predict=PLANNER_NUM_PREDICT,
+            stop_after_json=True,
+        )
+
+    global _format
+    t_end = time.monotonic() + timeout_s
     try:
-        raw = ollama_generate(system=PLANNER_SYSTEM, user=user_prompt, model="llama3.2:1b", timeout_s=600)
-        p = _extract_json_object(raw)
-        return _normalize_plan(p, message, has_image)
+        try:
+            raw = generate(timeout_s)
+        except Exception as e:
+            if not _schema_rejected(e):
+                raise
+            print("⚠️ Ollama rejected the JSON-schema format (needs >= 0.5); planning with format=json from now on")
+            _format = "json"
+            raw = generate(max(0.0, t_end - time.monotonic()))
+        return normalize_plan(raw, message, has_image)
     except Exception as e:
+        if strict:
+            raise
         # IMPORTANT: never crash; return fallback dict plan
         print("❌ Planner failed, using fallback. Error:", repr(e))
-        return {
-            "intermediate_queries": [{"query": message, "weight": 1.0}],
-            "weights": {"text": 1.0, "image": 0.0 if not has_image else 0.2},
-            "top_k": 10,
-            "filters": {},
-        }
+        return fallback_plan(message, has_image)
@@ -0,0 +1,237 @@
+# backend/app/profiling.py
+"""
+Opt-in sampling profiler for the backend hot path.
+
+- Per request: send `X-Profile: 1` together with `X-Admin-Token: $ADMIN_TOKEN`.
+  The response carries `X-Profile-Id`; fetch the collapsed stacks (flamegraph.pl /
+  speedscope format) from GET /admin/profile/{id}.
+- Background: PROFILE_SAMPLE_HZ > 0 starts a low-rate sampler aggregating hot
+  stacks across all traffic; GET /admin/profile returns them.
+
+Only stacks that pass through this package are kept, so idle threadpool and
+event-loop threads don't drown the signal. Per-request profiles sample only
+the event-loop thread and the threadpool threads running work for that
+request (handed off through this module's run_in_threadpool); the event loop
+is shared, so coroutines of concurrent requests can still show up there.
+With no ADMIN_TOKEN configured, nothing here can be switched on.
+"""
+from __future__ import annotations
+
+import functools
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set
+
+from starlette.concurrency import run_in_threadpool as _run_in_threadpool
+
+from app.session_store import TTLStore
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_SAMPLE_HZ = float(os.getenv("PROFILE_SAMPLE_HZ", "0"))
+PROFILE_REQUEST_HZ = float(os.getenv("PROFILE_REQUEST_HZ", "250"))
+PROFILE_MAX_STACKS = int(os.getenv("PROFILE_MAX_STACKS", "5000"))
+
+_BACKEND_DIR = str(Path(__file__).resolve().parents[1])
+_APP_DIR = str(Path(__file__).resolve().parent)
+
+_labels: Dict[Any, str] = {}
+# the sampler profiling the current request, if any
+_active: ContextVar[Optional["StackSampler"]] = ContextVar("profile_sampler", default=None)
+
+
+def is_admin(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def _label(code: Any) -> str:
+    label = _labels.get(code)
+    if label is None:
+        path = code.co_filename
+        if path.startswith(_BACKEND_DIR):
+            path = path[len(_BACKEND_DIR) + 1:]
+        else:
+            path = "/".join(Path(path).parts[-2:])
+        label = f"{code.co_name} ({path}:{code.co_firstlineno})"
+        _labels[code] = label
+    return label
+
+
+def _collapse(frame: Any) -> Optional[str]:
+    """root;...;leaf, or None when no frame belongs to this package."""
+    parts = []
+    ours = False
+    while frame is not None:
+        code = frame.f_code
+        ours = ours or code.co_filename.startswith(_APP_DIR)
+        parts.append(_label(code))
+        frame = frame.f_back
+    if not ours:
+        return None
+    parts.reverse()
+    return ";".join(parts)
+
+
+class StackSampler:
+    """
+    Samples thread stacks at `hz` into a bounded Counter of collapsed stacks:
+    every thread, or only the idents in `threads` when given.
+    """
+
+    def __init__(self, hz: float, max_stacks: int = PROFILE_MAX_STACKS, threads: Optional[Set[int]] = None):
+        self.interval = 1.0 / max(hz, 0.1)
+        self.max_stacks = max_stacks
+        self.threads = threads
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample_once(self) -> None:
+        me = threading.get_ident()
+        frames = sys._current_frames()
+        with self._lock:
+            if self.threads is not None:
+                frames = {tid: f for tid, f in frames.items() if tid in self.threads}
+            self.samples += 1
+            for tid, frame in frames.items():
+                if tid == me:
+                    continue
+                key = _collapse(frame)
+                if key is None:
+                    continue
+                if key in self.stacks or len(self.stacks) < self.max_stacks:
+                    self.stacks[key] += 1
+                else:
+                    self.dropped += 1
+
+    def add_thread(self, tid: int) -> None:
+        with self._lock:
+            if self.threads is not None:
+                self.threads.add(tid)
+
+    def discard_thread(self, tid: int) -> None:
+        with self._lock:
+            if self.threads is not None:
+                self.threads.discard(tid)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample_once()
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._loop, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        with self._lock:
+            return "".join(f"{k} {v}\n" for k, v in self.stacks.most_common())
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+            self.dropped = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hz": 1.0 / self.interval, "samples": self.samples, "stacks": len(self.stacks), "dropped": self.dropped}
+
+
+def tagged(fn: Callable) -> Callable:
+    """fn, with the worker thread it runs on sampled by the current request's profiler."""
+    sampler = _active.get()
+    if sampler is None:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args: Any, **kwargs: Any) -> Any:
+        tid = threading.get_ident()
+        sampler.add_thread(tid)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            sampler.discard_thread(tid)
+
+    return run
+
+
+async def run_in_threadpool(fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    """starlette's run_in_threadpool, visible to per-request profiles."""
+    return await _run_in_threadpool(tagged(fn), *args, **kwargs)
+
+
+request_profiles = TTLStore(max_entries=64, ttl_s=3600)
+background: Optional[StackSampler] = None
+
+
+def start_background() -> None:
+    global background
+    if PROFILE_SAMPLE_HZ > 0 and ADMIN_TOKEN and background is None:
+        background = StackSampler(PROFILE_SAMPLE_HZ).start()
+        print(f"🔬 Background profiler sampling at {PROFILE_SAMPLE_HZ:g} Hz")
+
+
+def stop_background() -> None:
+    global background
+    if background is not None:
+        background.stop()
+        background = None
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware. When disabled (no ADMIN_TOKEN) it is a single
+    attribute check; otherwise one scan of the request headers.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if not ADMIN_TOKEN or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile") != b"1" or not is_admin(headers.get(b"x-admin-token", b"").decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = request_profiles.new_id()
+        # the event loop's own thread, plus worker threads as tagged() hands work to them
+        sampler = StackSampler(PROFILE_REQUEST_HZ, threads={threading.get_ident()}).start()
+        token = _active.set(sampler)
+        t0 = time.perf_counter()
+
+        async def send_with_id(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", profile_id.encode("ascii"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _active.reset(token)
+            # stop() joins the sampler thread; don't hold the event loop for it
+            await _run_in_threadpool(sampler.stop)
+            request_profiles.put(profile_id, {
+                "path": scope.get("path"),
+                "wall_ms": (time.perf_counter() - t0) * 1000.0,
+                "collapsed": sampler.collapsed(),
+                **sampler.stats(),
+            })
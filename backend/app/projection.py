@@ -0,0 +1,101 @@
+# backend/app/projection.py
+"""
+Low-dimensional PCA projections of the CLIP vectors, for two-stage search.
+
+build_index_qdrant.py fits one projection per named vector on the catalogue
+embeddings and writes it next to the embedding snapshot as
+pca_{name}.npz (mean, components). scripts.load_snapshot stores the projected
+vectors as "{name}_pca" and copies the projection into the new collection's
+artifacts dir (app/live_index.py), which is the only copy the API reads: a
+refit never touches the collection being served. The Retriever prefetches
+candidates on the small vector and rescores them with the full one.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.embedding_store import EMBEDDINGS_DIR
+from app.live_index import artifacts_dir
+
+PCA_DIM = int(os.getenv("PCA_DIM", "96"))  # 0 disables the low-dim vectors
+PCA_SUFFIX = "_pca"
+
+
+def fit_pca(X: np.ndarray, dim: int) -> "Projection":
+    """Top-`dim` principal components of the rows of X (via the D x D covariance)."""
+    X = np.asarray(X, dtype=np.float32)
+    mean = X.mean(axis=0)
+    # accumulate X^T X in float64 blocks: no centred copy of X, no precision loss
+    cov = np.zeros((X.shape[1], X.shape[1]), dtype=np.float64)
+    for i in range(0, len(X), 8192):
+        B = X[i:i + 8192].astype(np.float64) - mean
+        cov += B.T @ B
+    evals, evecs = np.linalg.eigh(cov)
+    order = np.argsort(evals)[::-1][:dim]
+    explained = float(evals[order].sum() / max(evals.sum(), 1e-12))
+    return Projection(mean, evecs[:, order].T.astype(np.float32), explained)
+
+
+class Projection:
+    def __init__(self, mean: np.ndarray, components: np.ndarray, explained: float = 0.0):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)  # (dim, D)
+        self.explained = explained
+
+    @property
+    def dim(self) -> int:
+        return int(self.components.shape[0])
+
+    def project(self, X: np.ndarray) -> np.ndarray:
+        """(D,) or (n, D) -> unit-norm float32 (dim,) / (n, dim); zero rows stay zero."""
+        X = np.asarray(X, dtype=np.float32)
+        Y = (X - self.mean) @ self.components.T
+        norms = np.linalg.norm(Y, axis=-1, keepdims=True)
+        Y /= np.where(norms == 0, 1.0, norms)
+        if Y.ndim == 2:
+            Y[~X.any(axis=1)] = 0.0
+        return Y.astype(np.float32, copy=False)
+
+    def save(self, path: Path) -> None:
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp, mean=self.mean, components=self.components, explained=np.float32(self.explained))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "Projection":
+        with np.load(path) as z:
+            return cls(z["mean"], z["components"], float(z["explained"]))
+
+
+def projection_path(name: str, root: Path = EMBEDDINGS_DIR) -> Path:
+    return Path(root) / f"pca_{name}.npz"
+
+
+class Projections:
+    """Serving side: per-collection, per-vector projections, reloaded when a rebuild rewrites them."""
+
+    def __init__(self, root: Path = EMBEDDINGS_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._loaded: Dict[tuple, tuple] = {}  # (collection, name) -> (mtime_ns, Projection)
+
+    def get(self, name: str, collection: str) -> Optional[Projection]:
+        path = projection_path(name, artifacts_dir(collection, self.root))
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        key = (collection, name)
+        cur = self._loaded.get(key)
+        if cur is not None and cur[0] == mtime:
+            return cur[1]
+        with self._lock:
+            cur = self._loaded.get(key)
+            if cur is None or cur[0] != mtime:
+                cur = self._loaded[key] = (mtime, Projection.load(path))
+        return cur[1]
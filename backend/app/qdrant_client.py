@@ -1,7 +1,7 @@
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import VectorParams, Distance, PointStruct
 
-COLLECTION_NAME = "fashion200k"
+from app.config import COLLECTION_NAME
 
 class QdrantService:
     def __init__(self, host="localhost", port=6333):
@@ -1,100 +1,257 @@
 # backend/app/qdrant_store.py
+import os
+import time
 from typing import Any, Dict, List, Optional
 
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qm
 
-COLLECTION_NAME = "fashion200k"
+from app.config import COLLECTION_NAME, QDRANT_HOST, QDRANT_PORT, is_versioned
+# optional override of the detected API, e.g. QDRANT_SEARCH_MODE=search
+QDRANT_SEARCH_MODE = os.getenv("QDRANT_SEARCH_MODE", "")
+
+SEARCH_MODES = ("query_points", "search")
+# Query API (query_points) on the server side
+QUERY_API_SINCE = (1, 10)
+
+
+def server_version(client: Any) -> Optional[tuple]:
+    """(major, minor) reported by the server, or None when it can't be read."""
+    try:
+        version = client.info().version
+        return tuple(int(x) for x in str(version).split(".")[:2])
+    except Exception:
+        return None
+
+
+def detect_search_mode(client: Any) -> str:
+    """
+    Picks the search API both this qdrant-client and the server support, with
+    one info() round-trip:
+    - query_points(query=, using=, query_filter=)   (server >= 1.10)
+    - search(query_vector=(name, vector), query_filter=)
+    When the version can't be read, query_points is assumed and QdrantStore
+    falls back to search on the first server-side rejection.
+    """
+    has_query = getattr(client, "query_points", None) is not None
+    has_search = getattr(client, "search", None) is not None
+    if not has_query and not has_search:
+        raise RuntimeError("qdrant-client exposes neither query_points nor search")
+    if not has_query:
+        return "search"
+    version = server_version(client)
+    if version is not None and version < QUERY_API_SINCE and has_search:
+        return "search"
+    return "query_points"
+
+
+def _rejected(e: Exception) -> bool:
+    """The server doesn't know the endpoint (as opposed to a timeout or a bad query)."""
+    return getattr(e, "status_code", None) in (404, 405)
+
 
 class QdrantStore:
-    def __init__(self, host: str = "localhost", port: int = 6333):
+    def __init__(
+        self,
+        host: str = QDRANT_HOST,
+        port: int = QDRANT_PORT,
+        client: Optional[Any] = None,
+        search_mode: Optional[str] = None,
+        collection: str = COLLECTION_NAME,
+    ):
+        self.collection = collection
         # If versions mismatch, don't hard fail
-        self.client = QdrantClient(host=host, port=port, check_compatibility=False)
+        self.client = client if client is not None else QdrantClient(host=host, port=port, check_compatibility=False)
+        # detected once; every search() goes straight to the bound call
+        self.pinned = bool(search_mode or QDRANT_SEARCH_MODE)
+        self.search_mode = search_mode or QDRANT_SEARCH_MODE or detect_search_mode(self.client)
+        if self.search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {self.search_mode!r}; expected one of {SEARCH_MODES}")
+        self._search = getattr(self, f"_search_{self.search_mode}")
+
+    def for_collection(self, collection: str) -> "QdrantStore":
+        """Same client and search mode, another collection (e.g. a shard)."""
+        store = QdrantStore(client=self.client, search_mode=self.search_mode, collection=collection)
+        store.pinned = self.pinned
+        return store
+
+    def physical_collections(self, prefix: str = "") -> List[str]:
+        names = [c.name for c in self.client.get_collections().collections]
+        return sorted(n for n in names if n.startswith(prefix))
+
+    def aliases(self, prefix: str = "") -> Dict[str, str]:
+        """alias -> collection it points at."""
+        return {
+            a.alias_name: a.collection_name
+            for a in self.client.get_aliases().aliases
+            if a.alias_name.startswith(prefix)
+        }
 
-    def ensure_collection(self, vector_size: int = 512):
-        # named vectors: "text" and "image"
+    def list_collections(self, prefix: str = "") -> List[str]:
+        """Logical names to query: aliases, plus pre-alias (unversioned) collections."""
+        names = set(self.aliases(prefix))
+        names.update(n for n in self.physical_collections(prefix) if not is_versioned(n))
+        return sorted(names)
+
+    def ensure_collection(
+        self,
+        vector_size: int = 512,
+        extra_vectors: Optional[Dict[str, int]] = None,
+        bulk_load: bool = False,
+    ):
+        """
+        bulk_load: create with HNSW construction deferred (m=0, no indexing
+        threshold), so the upload is plain appends; call finish_bulk_load()
+        afterwards to build the graph once.
+        """
+        hnsw_config = qm.HnswConfigDiff(m=0) if bulk_load else None
+        optimizers_config = qm.OptimizersConfigDiff(indexing_threshold=0) if bulk_load else None
+        # named vectors: "text" and "image", plus optional low-dim ones (e.g. "text_pca": 96)
+        vectors_config = {
+            "text": qm.VectorParams(size=vector_size, distance=qm.Distance.COSINE),
+            "image": qm.VectorParams(size=vector_size, distance=qm.Distance.COSINE),
+        }
+        for name, size in (extra_vectors or {}).items():
+            vectors_config[name] = qm.VectorParams(size=size, distance=qm.Distance.COSINE)
         try:
             self.client.recreate_collection(
-                collection_name=COLLECTION_NAME,
-                vectors_config={
-                    "text": qm.VectorParams(size=vector_size, distance=qm.Distance.COSINE),
-                    "image": qm.VectorParams(size=vector_size, distance=qm.Distance.COSINE),
-                },
+                collection_name=self.collection,
+                vectors_config=vectors_config,
+                hnsw_config=hnsw_config,
+                optimizers_config=optimizers_config,
             )
         except Exception:
             # if recreate not supported / already exists, try create
             try:
                 self.client.create_collection(
-                    collection_name=COLLECTION_NAME,
-                    vectors_config={
-                        "text": qm.VectorParams(size=vector_size, distance=qm.Distance.COSINE),
-                        "image": qm.VectorParams(size=vector_size, distance=qm.Distance.COSINE),
-                    },
+                    collection_name=self.collection,
+                    vectors_config=vectors_config,
+                    hnsw_config=hnsw_config,
+                    optimizers_config=optimizers_config,
                 )
             except Exception:
                 pass
 
-    def upsert_points(self, points: List[qm.PointStruct]):
-        self.client.upsert(collection_name=COLLECTION_NAME, points=points)
+    def finish_bulk_load(self, m: int = 16, indexing_threshold: int = 20000, max_indexing_threads: int = 0):
+        """Turns HNSW back on; Qdrant then builds the graph in the background."""
+        self.client.update_collection(
+            collection_name=self.collection,
+            hnsw_config=qm.HnswConfigDiff(m=m, max_indexing_threads=max_indexing_threads),
+            optimizers_config=qm.OptimizersConfigDiff(indexing_threshold=indexing_threshold),
+        )
 
-    def search(self, namespace: str, vector: List[float], top_k: int = 10, flt: Optional[qm.Filter] = None):
+    @staticmethod
+    def _below_indexing_threshold(info: Any, points: int) -> bool:
         """
-        Supports multiple qdrant-client versions:
-        - new: query_points
-        - old: search_points / search
-        We always pass `vector` as plain list[float] (NOT NamedVector) to avoid fastembed query errors.
+        True when `points` vectors fit under the collection's indexing_threshold
+        (KB of vectors per segment), i.e. Qdrant will never build HNSW for them.
+        False when the config can't be read.
         """
-        # 1) Newer API: query_points
         try:
-            res = self.client.query_points(
-                collection_name=COLLECTION_NAME,
-                query=vector,            # plain floats
-                using=namespace,         # selects named vector "text"/"image"
-                limit=top_k,
-                with_payload=True,
-                query_filter=flt,
-            )
-            return res.points
-        except TypeError:
-            pass
-        except Exception:
-            # try other signatures
-            pass
+            threshold_kb = info.config.optimizer_config.indexing_threshold
+            vectors = info.config.params.vectors
+            sizes = [v.size for v in vectors.values()] if isinstance(vectors, dict) else [vectors.size]
+        except AttributeError:
+            return False
+        if threshold_kb is None:
+            return False
+        return points * sum(sizes) * 4 < threshold_kb * 1024
 
-        # 2) Alternate signature for some versions
-        try:
-            res = self.client.query_points(
-                collection_name=COLLECTION_NAME,
-                query_vector=vector,
-                using=namespace,
-                limit=top_k,
-                with_payload=True,
-                filter=flt,
-            )
-            return res.points
-        except TypeError:
-            pass
-        except Exception:
-            pass
+    def wait_indexed(self, expected: int, timeout_s: float = 3600, poll_s: float = 2.0, settle_s: float = 10.0) -> bool:
+        """
+        Blocks until the HNSW graph requested by finish_bulk_load() is built;
+        False on timeout. Right after update_collection the status can still be
+        green because the optimizer hasn't picked the change up, so green alone
+        proves nothing. Done means green with `expected` vectors indexed, or
+        green again after having been busy (segments below the indexing
+        threshold are never indexed). Only a collection too small to be
+        indexed at all may finish on being green for settle_s.
+        """
+        t_end = time.monotonic() + timeout_s
+        busy = False
+        green_since: Optional[float] = None
+        while time.monotonic() < t_end:
+            info = self.client.get_collection(self.collection)
+            if info.status != qm.CollectionStatus.GREEN:
+                busy, green_since = True, None
+            elif (info.indexed_vectors_count or 0) >= expected or busy:
+                return True
+            elif self._below_indexing_threshold(info, expected):
+                green_since = green_since or time.monotonic()
+                if time.monotonic() - green_since >= settle_s:
+                    return True
+            time.sleep(poll_s)
+        return False
+
+    def count(self) -> int:
+        return self.client.count(collection_name=self.collection, exact=True).count
+
+    def swap_aliases(self, targets: Dict[str, str], remove: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
+        """
+        Points each alias at its new collection, and drops the `remove`
+        aliases (e.g. shards that no longer exist), in one atomic update: all
+        shards switch together. Returns alias -> previous collection.
+        A pre-alias collection still using an alias name is dropped first;
+        that one-time migration is the only moment the name is unavailable.
+        """
+        current = self.aliases()
+        legacy = set(self.physical_collections()) & set(targets)
+        for name in sorted(legacy):
+            print(f"⚠️ Dropping unversioned collection '{name}' so it can become an alias")
+            self.client.delete_collection(collection_name=name)
+
+        ops: List[Any] = [
+            qm.DeleteAliasOperation(delete_alias=qm.DeleteAlias(alias_name=alias))
+            for alias in sorted(remove or []) if alias in current
+        ]
+        for alias, collection in sorted(targets.items()):
+            if alias in current:
+                ops.append(qm.DeleteAliasOperation(delete_alias=qm.DeleteAlias(alias_name=alias)))
+            ops.append(qm.CreateAliasOperation(create_alias=qm.CreateAlias(collection_name=collection, alias_name=alias)))
+        self.client.update_collection_aliases(change_aliases_operations=ops)
+        return {alias: current.get(alias) for alias in targets}
+
+    def drop_collection(self, name: str) -> None:
+        self.client.delete_collection(collection_name=name)
+
+    def upsert_points(self, points: List[qm.PointStruct]):
+        self.client.upsert(collection_name=self.collection, points=points)
 
-        # 3) Older API: search
+    def search(self, namespace: str, vector: List[float], top_k: int = 10, flt: Optional[qm.Filter] = None):
+        """
+        Named-vector search through the API detected at construction (see
+        `search_mode`). We always pass `vector` as plain list[float] (NOT
+        NamedVector) to avoid fastembed query errors. Errors propagate, except
+        a server rejecting query_points when the mode was detected rather than
+        pinned: that switches this store to search for good.
+        """
         try:
-            res = self.client.search(
-                collection_name=COLLECTION_NAME,
-                query_vector=(namespace, vector),  # sometimes supports tuple
-                limit=top_k,
-                with_payload=True,
-                query_filter=flt,
-            )
-            return res
-        except Exception:
-            pass
+            return self._search(namespace, vector, top_k, flt)
+        except Exception as e:
+            if self.pinned or self.search_mode != "query_points" or not _rejected(e):
+                raise
+            if getattr(self.client, "search", None) is None:
+                raise
+            print("⚠️ Qdrant server rejected query_points; using search from now on:", repr(e))
+            self.search_mode, self._search = "search", self._search_search
+            return self._search(namespace, vector, top_k, flt)
+
+    def _search_query_points(self, namespace, vector, top_k, flt):
+        res = self.client.query_points(
+            collection_name=self.collection,
+            query=vector,            # plain floats
+            using=namespace,         # selects named vector "text"/"image"
+            limit=top_k,
+            with_payload=True,
+            query_filter=flt,
+        )
+        return res.points
 
-        # 4) Oldest: search without namespace
-        res = self.client.search(
-            collection_name=COLLECTION_NAME,
-            query_vector=vector,
+    def _search_search(self, namespace, vector, top_k, flt):
+        return self.client.search(
+            collection_name=self.collection,
+            query_vector=(namespace, vector),
             limit=top_k,
             with_payload=True,
+            query_filter=flt,
         )
-        return res
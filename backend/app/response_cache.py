@@ -0,0 +1,146 @@
+# backend/app/response_cache.py
+"""
+Full-response cache for /api/chat.
+
+Entries are keyed by the normalized plan (queries, weights, filters, top_k),
+the query image hash and the index version, and hold everything needed to
+answer again: the result candidates, query vectors and plan. A second map
+remembers which plan a first-turn message produced, so a repeated message is
+answered without waiting for the planner at all.
+
+- fresh for RESPONSE_CACHE_TTL_S, then served stale for up to
+  RESPONSE_CACHE_SWR_S more while one background request recomputes it
+- the index version is what the Qdrant aliases point at plus the embedding
+  snapshot's mtime, so a rebuild changes every key and clears the cache;
+  a failed Qdrant read keeps the last known aliases
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+from app.embedding_store import EMBEDDINGS_DIR
+from app.live_index import LiveIndex, live_index
+from app.session_store import TTLStore
+
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "1") not in ("0", "false", "False", "")
+RESPONSE_CACHE_ENTRIES = int(os.getenv("RESPONSE_CACHE_ENTRIES", "2048"))
+RESPONSE_CACHE_TTL_S = float(os.getenv("RESPONSE_CACHE_TTL_S", "300"))
+RESPONSE_CACHE_SWR_S = float(os.getenv("RESPONSE_CACHE_SWR_S", "600"))
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.blake2b(orjson.dumps(parts, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+
+
+def plan_key(version: str, plan: Dict[str, Any], query_used: str, image_key: str, fetch_k: int) -> str:
+    return _digest(version, plan, query_used, image_key, fetch_k)
+
+
+def message_key(version: str, message: str, image_key: str) -> str:
+    return _digest(version, " ".join(message.lower().split()), image_key)
+
+
+class IndexVersion:
+    """
+    Fingerprint of the serving index: what the aliases point at (app/live_index.py,
+    refreshed off the request path and kept as-is when Qdrant can't be read, so
+    a hiccup never looks like a rebuild) plus the embedding snapshot's mtime.
+    """
+
+    def __init__(self, live: Optional[LiveIndex] = None):
+        self.live = live or live_index
+
+    def current(self) -> str:
+        try:
+            snapshot = (EMBEDDINGS_DIR / "meta.json").stat().st_mtime_ns
+        except OSError:
+            snapshot = 0
+        return _digest(sorted(self.live.aliases().items()), snapshot)[:12]
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_ENTRIES,
+        ttl_s: float = RESPONSE_CACHE_TTL_S,
+        swr_s: float = RESPONSE_CACHE_SWR_S,
+    ):
+        self.ttl_s = ttl_s
+        # entries live ttl + swr; the fresh/stale split is stored alongside
+        self._entries = TTLStore(max_entries=max_entries, ttl_s=ttl_s + swr_s)
+        self._plans = TTLStore(max_entries=max_entries, ttl_s=ttl_s + swr_s)
+        self._revalidating: set = set()
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._stats = {"fresh_hits": 0, "stale_hits": 0, "misses": 0, "revalidations": 0, "invalidations": 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def check_version(self, version: str) -> None:
+        """Drops everything when the index version moves (keys include it anyway)."""
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            if self._version is not None:
+                self._stats["invalidations"] += 1
+            self._version = version
+            self._entries = TTLStore(max_entries=self._entries.max_entries, ttl_s=self._entries.ttl_s)
+            self._plans = TTLStore(max_entries=self._plans.max_entries, ttl_s=self._plans.ttl_s)
+
+    def get(self, key: str, count_miss: bool = True) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        (entry, stale) or (None, False). count_miss=False for a lookup that is
+        followed by another one in the same request, so a request counts one miss.
+        """
+        item = self._entries.get(key)
+        if item is None:
+            if count_miss:
+                self._count("misses")
+            return None, False
+        fresh_until, entry = item
+        stale = time.monotonic() >= fresh_until
+        self._count("stale_hits" if stale else "fresh_hits")
+        return entry, stale
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        self._entries.put(key, (time.monotonic() + self.ttl_s, entry))
+
+    def plan_for(self, msg_key: str) -> Optional[str]:
+        return self._plans.get(msg_key)
+
+    def remember_plan(self, msg_key: str, key: str) -> None:
+        self._plans.put(msg_key, key)
+
+    def begin_revalidate(self, key: str) -> bool:
+        """True for the one caller that should recompute a stale entry."""
+        with self._lock:
+            if key in self._revalidating:
+                return False
+            self._revalidating.add(key)
+            self._stats["revalidations"] += 1
+            return True
+
+    def end_revalidate(self, key: str) -> None:
+        with self._lock:
+            self._revalidating.discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+        lookups = out["fresh_hits"] + out["stale_hits"] + out["misses"]
+        out["hit_ratio"] = (out["fresh_hits"] + out["stale_hits"]) / lookups if lookups else 0.0
+        out["fresh_hit_ratio"] = out["fresh_hits"] / lookups if lookups else 0.0
+        out["entries"] = len(self._entries)
+        out["version"] = self._version
+        out["enabled"] = RESPONSE_CACHE
+        return out
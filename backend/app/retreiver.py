@@ -2,23 +2,75 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, List, Optional, Literal, Union
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Literal, Tuple, Union
 
+import numpy as np
+import orjson
 import requests
 
-QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333").rstrip("/")
-COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "fashion200k")
+from app.config import COLLECTION_NAME, QDRANT_URL
+from app.live_index import LiveIndex, live_index
+from app.projection import PCA_SUFFIX, Projection, Projections
 
+# Two-stage search: prefetch on the low-dim "{name}_pca" vector, rescore with the
+# full one. Used when the served collection has that vector and its projection.
+TWO_STAGE_SEARCH = os.getenv("TWO_STAGE_SEARCH", "1") not in ("0", "false", "False", "")
+PREFETCH_FACTOR = int(os.getenv("PREFETCH_FACTOR", "8"))   # candidates per returned hit
+PREFETCH_MIN = int(os.getenv("PREFETCH_MIN", "100"))
 
-def _to_list(vec: Any) -> List[float]:
-    """Accepts numpy / torch / list and returns python list[float]."""
+_projections = Projections()
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def _as_f32(vec: Any) -> np.ndarray:
+    """Accepts numpy / torch / list and returns a flat float32 array (no copy if already one)."""
     if vec is None:
-        return []
-    if hasattr(vec, "tolist"):
-        vec = vec.tolist()
-    if isinstance(vec, (list, tuple)):
-        return [float(x) for x in vec]
-    raise TypeError(f"Vector must be list-like. Got {type(vec)}")
+        return np.empty(0, dtype=np.float32)
+    if hasattr(vec, "detach"):
+        vec = vec.detach().cpu().numpy()
+    return np.ascontiguousarray(vec, dtype=np.float32).reshape(-1)
+
+
+@dataclass(slots=True)
+class Hit:
+    """
+    One search result, in the exact shape the API returns.
+    orjson serializes slotted dataclasses natively, so hits go straight
+    from the Qdrant response into the HTTP body without dict copies.
+    """
+
+    id: Any
+    product_id: Optional[str]
+    score: float
+    description: Optional[str]
+    image_path: Optional[str]
+    # near-duplicates collapsed into this product at index time (app/dedup.py)
+    group_size: int = 1
+
+    @classmethod
+    def from_point(cls, h: Dict[str, Any]) -> "Hit":
+        payload = h.get("payload") or {}
+        pid = h.get("id")
+        return cls(
+            pid,
+            payload.get("product_id") or str(pid),
+            float(h.get("score", 0.0)),
+            payload.get("description"),
+            payload.get("image_path") or payload.get("image_abs_path"),
+            payload.get("group_size", 1),
+        )
+
+
+def qdrant_filter(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """`filters` when already in Qdrant's must/should/must_not form, else None (never sent)."""
+    if isinstance(filters, dict) and filters:
+        # Only pass if it already looks like Qdrant filter
+        # e.g. {"must":[{"key":"color","match":{"any":["black"]}}]}
+        if any(k in filters for k in ("must", "should", "must_not")):
+            return filters
+    return None
 
 
 class Retriever:
@@ -30,52 +82,118 @@ class Retriever:
       - image
 
     So we MUST use vector: {name: "...", vector: [...]}
+
+    Query vectors stay float32 numpy arrays and are written into the request
+    body by orjson directly; responses are parsed by orjson too.
+
+    With a fitted projection (app/projection.py) searches go through the
+    Query API in two stages: a prefetch of PREFETCH_FACTOR x k candidates on
+    the low-dim vector, then an exact rescore of those with the full vector.
+    Searches go to the physical collection behind the alias (app/live_index.py)
+    and use that collection's projection, so a rebuild switches both at once;
+    a collection without "{name}_pca" is searched exactly.
     """
 
-    def __init__(self, qdrant_url: str = QDRANT_URL, collection: str = COLLECTION_NAME):
+    def __init__(
+        self,
+        qdrant_url: str = QDRANT_URL,
+        collection: str = COLLECTION_NAME,
+        two_stage: bool = TWO_STAGE_SEARCH,
+        projections: Optional[Projections] = None,
+        live: Optional[LiveIndex] = None,
+    ):
         self.qdrant_url = qdrant_url.rstrip("/")
+        # an alias once scripts.load_snapshot has published a versioned build
         self.collection = collection
+        self.http = requests.Session()
+        self.two_stage = two_stage
+        self.projections = projections or _projections
+        self.live = live or live_index
 
-    def _search_rest(
+    def _post(self, path: str, body: Dict[str, Any], what: str, timeout_s: float = 120) -> Any:
+        data = orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY)
+        r = self.http.post(f"{self.qdrant_url}{path}", data=data, headers=_JSON_HEADERS, timeout=timeout_s)
+        if not r.ok:
+            raise RuntimeError(f"Qdrant {what} failed {r.status_code}: {r.text}")
+        return orjson.loads(r.content).get("result") or []
+
+    def target(self, vector_name: str) -> Tuple[str, Optional[Projection]]:
+        """(collection to query, projection for two-stage search or None)."""
+        collection = self.live.physical(self.collection)
+        if not self.two_stage or f"{vector_name}{PCA_SUFFIX}" not in self.live.vectors(collection):
+            return collection, None
+        return collection, self.projections.get(vector_name, collection)
+
+    def _search_body(
         self,
         vector_name: str,
-        vector: List[float],
+        vector: np.ndarray,
         top_k: int,
         filters: Optional[Dict[str, Any]] = None,
-    ) -> List[Dict[str, Any]]:
-        url = f"{self.qdrant_url}/collections/{self.collection}/points/search"
+        offset: int = 0,
+        proj: Optional[Projection] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """("search" | "query", request body) for one named-vector search."""
+        flt = qdrant_filter(filters)
+        if proj is not None and proj.dim and len(vector) == len(proj.mean):
+            prefetch: Dict[str, Any] = {
+                "query": proj.project(vector),
+                "using": f"{vector_name}{PCA_SUFFIX}",
+                "limit": max(PREFETCH_MIN, (offset + top_k) * PREFETCH_FACTOR),
+            }
+            if flt is not None:
+                prefetch["filter"] = flt
+            body: Dict[str, Any] = {
+                "prefetch": prefetch,
+                "query": vector,
+                "using": vector_name,
+                "limit": int(top_k),
+                "with_payload": True,
+                "with_vector": False,
+            }
+            if offset > 0:
+                body["offset"] = int(offset)
+            return "query", body
 
-        body: Dict[str, Any] = {
+        body = {
             "limit": int(top_k),
             "with_payload": True,
             "with_vector": False,
             "vector": {"name": vector_name, "vector": vector},
         }
+        if offset > 0:
+            body["offset"] = int(offset)
+        if flt is not None:
+            body["filter"] = flt
+        return "search", body
 
-        # (Optional) If later you implement proper Qdrant filter schema, put it here
-        # For now: ignore filters if they are not already in Qdrant format
-        # to prevent 400s from invalid filter structure.
-        if isinstance(filters, dict) and filters:
-            # Only pass if it already looks like Qdrant filter
-            # e.g. {"must":[{"key":"color","match":{"any":["black"]}}]}
-            if any(k in filters for k in ("must", "should", "must_not")):
-                body["filter"] = filters
-
-        r = requests.post(url, json=body, timeout=120)
-        if not r.ok:
-            raise RuntimeError(f"Qdrant search failed {r.status_code}: {r.text}")
-
-        return r.json().get("result", []) or []
+    def _search_rest(
+        self,
+        vector_name: str,
+        vector: np.ndarray,
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        offset: int = 0,
+        timeout_s: float = 120,
+    ) -> List[Dict[str, Any]]:
+        collection, proj = self.target(vector_name)
+        kind, body = self._search_body(vector_name, vector, top_k, filters, offset, proj)
+        res = self._post(f"/collections/{collection}/points/{kind}", body, kind, timeout_s)
+        if kind == "query":
+            return res.get("points", []) if isinstance(res, dict) else []
+        return res
 
     def search(
         self,
         mode: Literal["text", "image"],
-        query_vector: Union[List[float], Any],
+        query_vector: Union[np.ndarray, List[float], Any],
         top_k: int = 10,
         filters: Optional[Dict[str, Any]] = None,
-    ) -> List[Dict[str, Any]]:
-        vec = _to_list(query_vector)
-        if not vec:
+        offset: int = 0,
+        timeout_s: float = 120,
+    ) -> List[Hit]:
+        vec = _as_f32(query_vector)
+        if not vec.size:
             return []
 
         if mode not in ("text", "image"):
@@ -84,21 +202,69 @@ class Retriever:
         # ✅ vector names must match your collection config exactly
         vector_name = "text" if mode == "text" else "image"
 
-        hits = self._search_rest(vector_name=vector_name, vector=vec, top_k=top_k, filters=filters)
+        hits = self._search_rest(
+            vector_name=vector_name, vector=vec, top_k=top_k, filters=filters, offset=offset, timeout_s=timeout_s
+        )
+        return [Hit.from_point(h) for h in hits]
+
+    def search_batch(
+        self,
+        mode: Literal["text", "image"],
+        query_vectors: Any,
+        top_k: int = 10,
+        filters: Optional[List[Optional[Dict[str, Any]]]] = None,
+        timeout_s: float = 120,
+    ) -> List[List[Hit]]:
+        """
+        Many searches in one round-trip (POST .../points/{search|query}/batch).
+        query_vectors: (n, dim) matrix or list of vectors; filters: per-query, optional.
+        """
+        if mode not in ("text", "image"):
+            raise ValueError("mode must be 'text' or 'image'")
+        collection, proj = self.target(mode)
+        bodies = [
+            self._search_body(mode, _as_f32(v), top_k, filters[i] if filters else None, proj=proj)
+            for i, v in enumerate(query_vectors)
+        ]
+        if not bodies:
+            return []
+        # all bodies are the same kind: the projection choice doesn't depend on the query
+        kind = bodies[0][0]
+        res = self._post(
+            f"/collections/{collection}/points/{kind}/batch",
+            {"searches": [b for _, b in bodies]},
+            f"batch {kind}",
+            timeout_s,
+        )
+        if kind == "query":
+            res = [r.get("points", []) if isinstance(r, dict) else [] for r in res]
+        return [[Hit.from_point(h) for h in hits] for hits in res]
+
+    def fetch_vectors(
+        self, ids: List[Any], vector_name: str = "text", timeout_s: float = 120
+    ) -> List[Optional[List[float]]]:
+        """Point lookup by id; returns the named vector for each id (None if missing), in order."""
+        if not ids:
+            return []
+        body = {"ids": list(ids), "with_payload": False, "with_vector": [vector_name]}
+
+        by_id: Dict[Any, Any] = {}
+        for pt in self._post(f"/collections/{self.collection}/points", body, "retrieve", timeout_s):
+            vec = pt.get("vector")
+            if isinstance(vec, dict):
+                vec = vec.get(vector_name)
+            by_id[pt.get("id")] = vec
+        return [by_id.get(i) for i in ids]
+
 
-        # Normalize to a simple dict list that your main.py can handle
-        out: List[Dict[str, Any]] = []
+def fuse_hits(text_hits: List[Hit], image_hits: List[Hit], w_text: float, w_img: float) -> List[Hit]:
+    """Weighted score sum per product (same scheme as scripts/evaluate.py), best first."""
+    fused: Dict[Any, Hit] = {}
+    for hits, w in ((text_hits, w_text), (image_hits, w_img)):
         for h in hits:
-            payload = h.get("payload") or {}
-            out.append(
-                {
-                    "id": h.get("id"),
-                    "score": float(h.get("score", 0.0)),
-                    "payload": payload,
-                    # convenience mirrors (so you don't lose them)
-                    "product_id": payload.get("product_id"),
-                    "description": payload.get("description"),
-                    "image_path": payload.get("image_path") or payload.get("image_abs_path"),
-                }
-            )
-        return out
+            cur = fused.get(h.product_id)
+            if cur is None:
+                fused[h.product_id] = Hit(h.id, h.product_id, w * h.score, h.description, h.image_path, h.group_size)
+            else:
+                cur.score += w * h.score
+    return sorted(fused.values(), key=lambda h: h.score, reverse=True)
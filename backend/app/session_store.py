@@ -0,0 +1,86 @@
+# backend/app/session_store.py
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+SESSION_TTL_S = float(os.getenv("SESSION_TTL_S", "900"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "1024"))
+
+
+class TTLStore:
+    """
+    Small thread-safe LRU store with per-entry expiry.
+
+    - at most `max_entries` live entries (least recently used is evicted first)
+    - entries older than `ttl_s` since their last write are dropped on access
+    """
+
+    def __init__(self, max_entries: int = SESSION_MAX_ENTRIES, ttl_s: float = SESSION_TTL_S):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = float(ttl_s)
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def put(self, key: str, value: Any) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (now + self.ttl_s, value)
+            self._data.move_to_end(key)
+            self._purge(now)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def pop(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.pop(key, None)
+        return None if item is None else item[1]
+
+    def _purge(self, now: float) -> None:
+        # least recently used sits at the front; stop at the first live entry,
+        # anything expired behind it is dropped lazily on access
+        while self._data:
+            key, (expires_at, _) = next(iter(self._data.items()))
+            if expires_at > now:
+                break
+            del self._data[key]
+            self.expirations += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
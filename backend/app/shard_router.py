@@ -0,0 +1,178 @@
+# backend/app/shard_router.py
+from __future__ import annotations
+
+import heapq
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.config import COLLECTION_NAME, QDRANT_URL, SHARD_KEY, SHARD_SEPARATOR, shard_slug
+from app.live_index import LiveIndex, live_index
+from app.retreiver import Hit, Retriever
+
+SHARD_FANOUT_WORKERS = int(os.getenv("SHARD_FANOUT_WORKERS", "8"))
+
+
+def shard_values(filters: Optional[Dict[str, Any]], key: str) -> List[Any]:
+    """
+    Values of `key` a plan's filters pin the query to. Understands the simple
+    planner form {"category": "dresses"} / {"category": ["dresses", "skirts"]}
+    and Qdrant's {"must": [{"key": "category", "match": {"value"|"any": ...}}]}.
+    """
+    if not isinstance(filters, dict) or not key:
+        return []
+    v = filters.get(key)
+    if isinstance(v, (str, int)):
+        return [v]
+    if isinstance(v, list):
+        return [x for x in v if isinstance(x, (str, int))]
+
+    for cond in filters.get("must") or []:
+        if not isinstance(cond, dict) or cond.get("key") != key:
+            continue
+        match = cond.get("match") or {}
+        if "value" in match:
+            return [match["value"]]
+        if isinstance(match.get("any"), list):
+            return list(match["any"])
+    return []
+
+
+class ShardRouter:
+    """
+    Retriever over collections sharded by a payload key (see config.SHARD_KEY).
+
+    A query goes only to the shards its filters name; when the plan doesn't
+    pin the key (or names no known shard) it fans out to every shard in
+    parallel and the per-shard top-k lists are merged by score.
+    Same interface as Retriever, so main.py doesn't care which one it has.
+    """
+
+    def __init__(
+        self,
+        qdrant_url: str = QDRANT_URL,
+        base: str = COLLECTION_NAME,
+        key: str = SHARD_KEY,
+        live: Optional[LiveIndex] = None,
+    ):
+        self.qdrant_url = qdrant_url.rstrip("/")
+        self.base = base
+        self.key = key
+        self.prefix = f"{base}{SHARD_SEPARATOR}"
+        self.live = live or live_index
+        self._retrievers: Dict[str, Retriever] = {}
+        self._shards: Dict[str, str] = {}
+        self._pool = ThreadPoolExecutor(max_workers=SHARD_FANOUT_WORKERS, thread_name_prefix="shard")
+        self._stats = {"routed": 0, "fanout": 0, "shard_queries": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def shards(self) -> Dict[str, str]:
+        """
+        slug -> alias (or pre-alias collection) name, from the live index
+        (app/live_index.py), which re-reads Qdrant off the request path and
+        keeps its last good state while Qdrant is unreachable. Versioned
+        physical collections are never listed; a reindex only swaps what the
+        aliases point at.
+        """
+        names = self.live.names(self.prefix)
+        if names or self.live.ready:
+            self._shards = {n[len(self.prefix):]: n for n in names}
+        return self._shards
+
+    def _retriever(self, collection: str) -> Retriever:
+        r = self._retrievers.get(collection)
+        if r is None:
+            r = self._retrievers.setdefault(collection, Retriever(self.qdrant_url, collection, live=self.live))
+        return r
+
+    def route(self, filters: Optional[Dict[str, Any]]) -> List[str]:
+        shards = self.shards()
+        wanted = [shards[s] for s in {shard_slug(v) for v in shard_values(filters, self.key)} if s in shards]
+        if wanted:
+            self._count("routed")
+            return sorted(wanted)
+        self._count("fanout")
+        return sorted(shards.values())
+
+    def search(
+        self,
+        mode: str,
+        query_vector: Any,
+        top_k: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        offset: int = 0,
+        timeout_s: float = 120,
+    ) -> List[Hit]:
+        targets = self.route(filters)
+        self._count("shard_queries", len(targets))
+        if not targets:
+            return []
+        if len(targets) == 1:
+            return self._retriever(targets[0]).search(
+                mode, query_vector, top_k=top_k, filters=filters, offset=offset, timeout_s=timeout_s
+            )
+
+        # each shard must return offset+top_k for the merged slice to be exact
+        vec = np.ascontiguousarray(query_vector, dtype=np.float32)
+        futures = [
+            self._pool.submit(
+                self._retriever(c).search, mode, vec, top_k=offset + top_k, filters=filters, timeout_s=timeout_s
+            )
+            for c in targets
+        ]
+        lists = [f.result() for f in futures]
+        merged = heapq.nlargest(offset + top_k, (h for hits in lists for h in hits), key=lambda h: h.score)
+        return merged[offset:]
+
+    def search_batch(
+        self,
+        mode: str,
+        query_vectors: Any,
+        top_k: int = 10,
+        filters: Optional[List[Optional[Dict[str, Any]]]] = None,
+        timeout_s: float = 120,
+    ) -> List[List[Hit]]:
+        """Groups queries by target shard set, one batch call per shard, merged per query."""
+        n = len(query_vectors)
+        per_shard: Dict[str, List[int]] = {}
+        for i in range(n):
+            for c in self.route(filters[i] if filters else None):
+                per_shard.setdefault(c, []).append(i)
+        self._count("shard_queries", sum(len(v) for v in per_shard.values()))
+
+        futures = {
+            c: self._pool.submit(
+                self._retriever(c).search_batch, mode, [query_vectors[i] for i in idx], top_k=top_k,
+                filters=[filters[i] for i in idx] if filters else None, timeout_s=timeout_s,
+            )
+            for c, idx in per_shard.items()
+        }
+        merged: List[List[Hit]] = [[] for _ in range(n)]
+        for c, f in futures.items():
+            for i, hits in zip(per_shard[c], f.result()):
+                merged[i].extend(hits)
+        return [heapq.nlargest(top_k, hits, key=lambda h: h.score) for hits in merged]
+
+    def fetch_vectors(self, ids: List[Any], vector_name: str = "text", timeout_s: float = 120):
+        # ids are global across shards; ask every shard and keep what each one has
+        out: List[Any] = [None] * len(ids)
+        futures = [
+            self._pool.submit(self._retriever(c).fetch_vectors, ids, vector_name, timeout_s)
+            for c in sorted(self.shards().values())
+        ]
+        for f in futures:
+            for i, v in enumerate(f.result()):
+                if v is not None:
+                    out[i] = v
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {"key": self.key, "shards": len(self._shards), **self._stats}
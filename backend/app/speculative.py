@@ -0,0 +1,111 @@
+# backend/app/speculative.py
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import SHARD_KEY
+from app.profiling import run_in_threadpool
+from app.retreiver import Hit, qdrant_filter
+from app.shard_router import shard_values
+
+SPECULATIVE_SEARCH = os.getenv("SPECULATIVE_SEARCH", "1") not in ("0", "false", "False", "")
+# candidates fetched speculatively; covers the fallback plan (top_k=10) with over-fetch
+SPECULATIVE_FETCH_K = int(os.getenv("SPECULATIVE_FETCH_K", "50"))
+# planner query this close to the raw message (cosine) still reuses the speculative hits
+SPECULATIVE_MIN_SIM = float(os.getenv("SPECULATIVE_MIN_SIM", "0.95"))
+
+
+def _norm_query(q: str) -> str:
+    return " ".join((q or "").lower().split())
+
+
+class SpeculativeSearch:
+    """
+    Embeds and searches the raw user message while the planner is still
+    running. Once the plan arrives, the speculative result is reused when the
+    chosen query is the message itself (or embeds within SPECULATIVE_MIN_SIM
+    of it) and the plan adds no effective filter; otherwise it is dropped.
+    """
+
+    def __init__(self, embedder: Any, retriever: Any, fetch_k: int = SPECULATIVE_FETCH_K,
+                 min_sim: float = SPECULATIVE_MIN_SIM):
+        self.embedder = embedder
+        self.retriever = retriever
+        self.fetch_k = fetch_k
+        self.min_sim = min_sim
+        self._lock = threading.Lock()
+        self._stats = {"started": 0, "reused_exact": 0, "reused_close": 0, "rejected": 0, "cancelled": 0, "failed": 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    async def _run(self, message: str, timeout_s: float) -> Tuple[np.ndarray, List[Hit]]:
+        vec = await run_in_threadpool(self.embedder.embed_text, message)
+        hits = await run_in_threadpool(self.retriever.search, "text", vec, top_k=self.fetch_k, timeout_s=timeout_s)
+        return vec, hits
+
+    def start(self, message: str, timeout_s: float) -> asyncio.Task:
+        self._count("started")
+        task = asyncio.create_task(self._run(message, timeout_s))
+        # a task nobody awaits (request failed, or cancelled) must not log "never retrieved"
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def resolve(
+        self,
+        task: asyncio.Task,
+        message: str,
+        query_used: str,
+        filters: Optional[Dict[str, Any]],
+        need_k: int,
+        embed: Callable[[str], Awaitable[np.ndarray]],
+    ) -> Tuple[Optional[np.ndarray], Optional[List[Hit]]]:
+        """
+        Returns (query vector, hits). need_k is what must be on hand now (the
+        first page); a longer over-fetch is left to the cursor, which extends
+        the speculative list with offset searches. When hits are reused the
+        vector is the one that produced them, so later pages continue the same
+        ranking; hits are None when they can't stand in for the planned search.
+        """
+        exact = _norm_query(query_used) == _norm_query(message)
+        if not exact and not task.done():
+            # planner rewrote the query and speculation is still running: drop it
+            task.cancel()
+            self._count("cancelled")
+            return None, None
+
+        try:
+            spec_vec, spec_hits = await task
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("⚠️ Speculative search failed:", repr(e))
+            self._count("failed")
+            return None, None
+
+        q_vec = spec_vec if exact else await embed(query_used)
+        close = exact or float(np.dot(spec_vec, q_vec)) >= self.min_sim
+        # an exhausted speculative list is complete even when shorter than need_k
+        enough = len(spec_hits) >= need_k or len(spec_hits) < self.fetch_k
+        # a plan that pins the shard key searches fewer shards than speculation did
+        narrowed = qdrant_filter(filters) is not None or bool(shard_values(filters, SHARD_KEY))
+        if close and enough and not narrowed:
+            self._count("reused_exact" if exact else "reused_close")
+            return spec_vec, spec_hits
+
+        self._count("rejected")
+        return q_vec, None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+        reused = out["reused_exact"] + out["reused_close"]
+        out["hit_rate"] = reused / out["started"] if out["started"] else 0.0
+        out["enabled"] = SPECULATIVE_SEARCH
+        return out
@@ -0,0 +1,154 @@
+# backend/app/warmup.py
+"""
+Startup warm-up: replays a few representative queries through the planner,
+embedder and retriever before the API reports ready, so the first real
+request doesn't pay for lazy torch kernels, tokenizer caches, the Ollama
+model load or cold Qdrant pages.
+
+Queries come from WARMUP_SOURCE (JSON list or JSONL; the query is read from
+"query", "message" or "text", an optional "image_path" is embedded too),
+defaulting to benchmark/benchmark.json. GET /ready returns 503 until the
+warm-up has finished; per-stage timings are in /api/metrics under "warmup".
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+WARMUP = os.getenv("WARMUP", "1") not in ("0", "false", "False", "")
+WARMUP_SOURCE = os.getenv("WARMUP_SOURCE", str(REPO_ROOT / "benchmark" / "benchmark.json"))
+WARMUP_QUERIES = int(os.getenv("WARMUP_QUERIES", "8"))
+WARMUP_PLANNER = os.getenv("WARMUP_PLANNER", "1") not in ("0", "false", "False", "")
+# total time allowed; stages still running past it are skipped
+WARMUP_BUDGET_S = float(os.getenv("WARMUP_BUDGET_S", "180"))
+# 1: serve (and fail /ready) while warming up instead of holding startup
+WARMUP_BACKGROUND = os.getenv("WARMUP_BACKGROUND", "0") not in ("0", "false", "False", "")
+
+QUERY_FIELDS = ("query", "message", "text")
+# used when the source file is missing or empty
+DEFAULT_QUERIES = ["black evening dress", "white sneakers for men", "red floral summer skirt", "denim jacket"]
+
+
+def load_queries(path: str, n: int, data_root: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """Up to n {"query", "image_path"} items from a JSON list or JSONL file."""
+    items: List[Dict[str, Any]] = []
+    try:
+        raw = Path(path).read_text(encoding="utf-8").strip()
+    except OSError:
+        raw = ""
+    if raw:
+        try:
+            records = json.loads(raw)
+            if isinstance(records, dict):
+                records = [records]
+        except json.JSONDecodeError:
+            records = []
+            for line in raw.splitlines():
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # a bad line in a query log must not stop startup
+        for rec in records:
+            if not isinstance(rec, dict):
+                continue
+            q = next((str(rec[k]) for k in QUERY_FIELDS if rec.get(k)), "")
+            img = rec.get("image_path")
+            if img and data_root is not None and not os.path.isabs(img):
+                img = str(data_root / img)
+            if img and not os.path.isfile(img):
+                img = None
+            if q or img:
+                items.append({"query": q, "image_path": img})
+            if len(items) >= n:
+                break
+    if not items:
+        items = [{"query": q, "image_path": None} for q in DEFAULT_QUERIES[:n]]
+    return items
+
+
+class WarmupState:
+    def __init__(self):
+        self.status = "pending"  # pending | running | ready
+        self.started_at: Optional[float] = None
+        self.total_ms = 0.0
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.errors: List[str] = []
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def record(self, stage: str, ms: float) -> None:
+        s = self.stages.setdefault(stage, {"n": 0, "first_ms": ms, "last_ms": ms, "total_ms": 0.0})
+        s["n"] += 1
+        s["last_ms"] = ms
+        s["total_ms"] += ms
+
+    def stats(self) -> Dict[str, Any]:
+        return {"status": self.status, "total_ms": self.total_ms, "stages": self.stages, "errors": self.errors[-10:]}
+
+
+async def run(
+    state: WarmupState,
+    queries: List[Dict[str, Any]],
+    embedder: Any,
+    retriever: Any,
+    planner: Optional[Callable[..., Any]] = None,
+    budget_s: float = WARMUP_BUDGET_S,
+) -> None:
+    """
+    Replays `queries` stage by stage. Failures (e.g. Ollama down) are logged
+    and recorded but never keep the API from becoming ready. `planner` is
+    app.planner.plan (called with strict=True); it is dropped after its
+    first failure.
+    """
+    state.status = "running"
+    state.started_at = time.monotonic()
+    t_end = state.started_at + budget_s
+
+    async def stage(name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        if time.monotonic() >= t_end:
+            return None
+        t0 = time.perf_counter()
+        try:
+            return await run_in_threadpool(fn, *args, **kwargs)
+        except Exception as e:
+            state.errors.append(f"{name}: {e!r}")
+            return None
+        finally:
+            state.record(name, (time.perf_counter() - t0) * 1000.0)
+
+    for item in queries:
+        q, img = item["query"], item["image_path"]
+        if planner is not None and q:
+            n_errors = len(state.errors)
+            # strict: a failed call raises instead of quietly returning the fallback plan
+            await stage("planner", planner, q, bool(img),
+                        timeout_s=max(1.0, t_end - time.monotonic()), strict=True)
+            if len(state.errors) > n_errors:
+                planner = None  # unreachable LLM: don't spend the budget retrying it
+                print(f"⚠️ Warm-up planner failed, skipping it for the remaining queries: {state.errors[-1]}")
+        if q:
+            vec = await stage("embed_text", embedder.embed_text, q)
+            if vec is not None:
+                await stage("search_text", retriever.search, "text", vec, top_k=10, timeout_s=10)
+        if img:
+            vec = await stage("embed_image", embedder.embed_image, img)
+            if vec is not None:
+                await stage("search_image", retriever.search, "image", vec, top_k=10, timeout_s=10)
+
+    state.total_ms = (time.monotonic() - state.started_at) * 1000.0
+    state.status = "ready"
+    summary = ", ".join(
+        f"{k} {v['first_ms']:.0f}→{v['last_ms']:.0f}ms" for k, v in state.stages.items()
+    )
+    print(f"🔥 Warm-up done in {state.total_ms / 1000.0:.1f}s over {len(queries)} queries: {summary or 'nothing to do'}")
+    if state.errors:
+        print(f"⚠️ Warm-up errors ({len(state.errors)}): {state.errors[0]}")
@@ -0,0 +1,214 @@
+# backend/scripts/bench_embedder.py
+"""
+Throughput / latency benchmark for CLIPEmbedder inference settings.
+
+Each model variant (float32, float16, bfloat16, int8 dynamic quantization)
+runs in its own subprocess so peak RSS is per variant. Inside a variant we
+sweep torch threads x batch size x inference_mode for text and image
+encoding, and report per-batch latency percentiles and items/s. Drift is
+the cosine similarity of each variant's embeddings to the float32 ones on
+the same inputs (min and mean); anything under ~0.99 changes rankings.
+
+    python -m scripts.bench_embedder
+    python -m scripts.bench_embedder --variants float32,int8 --threads 2,4 --batch-sizes 1,32
+
+Results go to benchmark/embedder_bench.json. Apply the winner through
+EMBED_DTYPE / EMBED_QUANTIZE / EMBED_THREADS / EMBED_BATCH_SIZE /
+EMBED_INFERENCE_MODE (see app/embedder.py).
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+SAMPLED_JSON = ROOT / "data" / "sampled_products.json"
+OUT = Path("benchmark") / "embedder_bench.json"
+
+VARIANTS = {
+    "float32": {"dtype": "float32", "quantize": ""},
+    "float16": {"dtype": "float16", "quantize": ""},
+    "bfloat16": {"dtype": "bfloat16", "quantize": ""},
+    "int8": {"dtype": "float32", "quantize": "int8"},
+}
+DRIFT_TEXTS = 64
+DRIFT_IMAGES = 32
+
+
+def _csv(s: str, cast=str) -> List[Any]:
+    return [cast(x) for x in s.split(",") if x.strip()]
+
+
+def _rss_mib() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _inputs(n_texts: int, n_images: int):
+    """Catalogue descriptions and decoded images when available, synthetic otherwise."""
+    from PIL import Image
+
+    from app.image_io import load_image
+
+    texts: List[str] = []
+    images: List[Any] = []
+    if SAMPLED_JSON.exists():
+        data = json.loads(SAMPLED_JSON.read_text(encoding="utf-8"))
+        if isinstance(data, dict):
+            data = data.get("products", [])
+        for p in data:
+            if len(texts) < n_texts and p.get("description"):
+                texts.append(str(p["description"]))
+            path = p.get("image_path")
+            if path and len(images) < n_images:
+                path = path if os.path.isabs(path) else str(ROOT / "data" / path)
+                if os.path.isfile(path):
+                    images.append(load_image(path))
+    while len(texts) < n_texts:
+        texts.append(f"black evening dress with lace sleeves size {len(texts)}")
+    rng = np.random.default_rng(0)
+    while len(images) < n_images:
+        images.append(Image.fromarray(rng.integers(0, 255, (256, 256, 3), dtype=np.uint8)))
+    # pre-decoded: the sweep measures the model, not JPEG decoding
+    return texts, images
+
+
+def _percentiles(lat_ms: List[float]) -> Dict[str, float]:
+    a = np.asarray(lat_ms)
+    return {f"p{q}": float(np.percentile(a, q)) for q in (50, 90, 99)}
+
+
+def worker(variant: str, args) -> Dict[str, Any]:
+    import torch
+
+    from app.embedder import CLIPEmbedder
+
+    rss_before = _rss_mib()
+    t0 = time.perf_counter()
+    emb = CLIPEmbedder(**VARIANTS[variant])
+    load_s = time.perf_counter() - t0
+    rss_model = _rss_mib()
+
+    max_bs = max(args.batch_sizes)
+    texts, images = _inputs(max(max_bs, DRIFT_TEXTS), max(max_bs, DRIFT_IMAGES))
+    encode = {
+        "text": lambda items, bs: emb.embed_texts(items, batch_size=bs),
+        "image": lambda items, bs: emb.embed_images(items, batch_size=bs),
+    }
+    inputs = {"text": texts, "image": images}
+
+    runs = []
+    for threads in args.threads:
+        torch.set_num_threads(threads)
+        for im in args.inference_mode:
+            emb.inference_mode = bool(im)
+            for modality in args.modalities:
+                for bs in args.batch_sizes:
+                    items = inputs[modality][:bs]
+                    encode[modality](items, bs)  # warm-up
+                    lat = []
+                    for _ in range(args.iters):
+                        t = time.perf_counter()
+                        encode[modality](items, bs)
+                        lat.append((time.perf_counter() - t) * 1000.0)
+                    run = {
+                        "modality": modality, "threads": threads, "inference_mode": bool(im), "batch_size": bs,
+                        **_percentiles(lat),
+                        "items_per_s": bs * len(lat) / (sum(lat) / 1000.0),
+                    }
+                    runs.append(run)
+                    print(f"  {variant:8s} {modality:5s} t={threads} im={im} bs={bs:<3d} "
+                          f"p50={run['p50']:.1f}ms p99={run['p99']:.1f}ms {run['items_per_s']:.1f}/s",
+                          file=sys.stderr)
+
+    # drift against the float32 reference (written by the float32 worker)
+    emb.inference_mode = True
+    drift_vecs = {"text": emb.embed_texts(texts[:DRIFT_TEXTS]), "image": emb.embed_images(images[:DRIFT_IMAGES])}
+    drift: Dict[str, Any] = {}
+    ref_dir = Path(args.drift_dir)
+    for modality, X in drift_vecs.items():
+        ref = ref_dir / f"{modality}.npy"
+        if variant == "float32":
+            np.save(ref, X)
+            continue
+        if ref.exists():
+            cos = np.sum(np.load(ref) * X, axis=1)  # both unit-normalized
+            drift[modality] = {"min_cos": float(cos.min()), "mean_cos": float(cos.mean())}
+
+    return {
+        "variant": variant, **VARIANTS[variant],
+        "load_s": load_s,
+        "rss_model_mib": rss_model - rss_before,
+        "peak_rss_mib": _rss_mib(),
+        "drift": drift,
+        "runs": runs,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Sweep CLIPEmbedder inference settings.")
+    ap.add_argument("--variants", default="float32,bfloat16,int8", help=f"subset of {','.join(VARIANTS)}")
+    ap.add_argument("--modalities", default="text,image")
+    ap.add_argument("--batch-sizes", default="1,8,32,64")
+    ap.add_argument("--threads", default=",".join(str(t) for t in sorted({1, 2, 4, os.cpu_count() or 1})))
+    ap.add_argument("--inference-mode", default="1,0", help="1 = torch.inference_mode, 0 = no_grad only")
+    ap.add_argument("--iters", type=int, default=10)
+    ap.add_argument("--out", default=str(OUT))
+    ap.add_argument("--worker", default="", help=argparse.SUPPRESS)
+    ap.add_argument("--drift-dir", default="", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    args.batch_sizes = _csv(args.batch_sizes, int)
+    args.threads = _csv(args.threads, int)
+    args.inference_mode = _csv(args.inference_mode, int)
+    args.modalities = _csv(args.modalities)
+
+    if args.worker:
+        print(json.dumps(worker(args.worker, args)))
+        return
+
+    variants = _csv(args.variants)
+    unknown = [v for v in variants if v not in VARIANTS]
+    if unknown:
+        raise SystemExit(f"❌ Unknown variants {unknown}; expected {list(VARIANTS)}")
+    # float32 runs first: it is the drift reference
+    variants = ["float32"] + [v for v in variants if v != "float32"]
+
+    results = []
+    with tempfile.TemporaryDirectory() as drift_dir:
+        for v in variants:
+            print(f"📦 {v}", file=sys.stderr)
+            cmd = [sys.executable, "-m", "scripts.bench_embedder", *sys.argv[1:], "--worker", v, "--drift-dir", drift_dir]
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, text=True)
+            if proc.returncode != 0:
+                print(f"⚠️ {v} failed (exit {proc.returncode}), skipping", file=sys.stderr)
+                continue
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{'variant':9s} {'mod':5s} {'thr':>3s} {'im':>2s} {'bs':>3s} {'p50 ms':>8s} {'p99 ms':>8s} {'items/s':>8s}")
+    for r in results:
+        best: Dict[str, Any] = {}
+        for run in r["runs"]:
+            print(f"{r['variant']:9s} {run['modality']:5s} {run['threads']:3d} {int(run['inference_mode']):2d} "
+                  f"{run['batch_size']:3d} {run['p50']:8.1f} {run['p99']:8.1f} {run['items_per_s']:8.1f}")
+            if run["items_per_s"] > best.get(run["modality"], {}).get("items_per_s", 0):
+                best[run["modality"]] = run
+        r["best"] = best
+        print(f"  ↳ peak RSS {r['peak_rss_mib']:.0f} MiB (model +{r['rss_model_mib']:.0f} MiB), "
+              f"load {r['load_s']:.1f}s, drift {r['drift'] or '-'}")
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"✅ Wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
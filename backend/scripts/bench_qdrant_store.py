@@ -0,0 +1,88 @@
+# backend/scripts/bench_qdrant_store.py
+"""
+Microbenchmark: per-call dispatch overhead of QdrantStore.search.
+
+Compares the old per-call try/except chain against the capability detected
+once at construction, using an in-process fake client whose server (1.9)
+only supports the old `search(query_vector=(name, vec))` API. Every rejected
+signature costs a simulated failed round-trip (BENCH_FAIL_MS), like a 4xx
+from a mismatched server.
+
+    python -m scripts.bench_qdrant_store
+"""
+import os
+import time
+from types import SimpleNamespace
+from typing import Any, List
+
+from app.qdrant_store import QdrantStore
+
+N = int(os.getenv("BENCH_N", "2000"))
+FAIL_MS = float(os.getenv("BENCH_FAIL_MS", "0.5"))
+
+
+class _NotFound(Exception):
+    status_code = 404
+
+
+class _OldClient:
+    """Pretends to be a new qdrant-client against a server that only speaks `search`."""
+
+    def info(self):
+        return SimpleNamespace(version="1.9.2")
+
+    def query_points(self, collection_name: str, query: Any = None, using: Any = None, **kw):
+        time.sleep(FAIL_MS / 1000.0)
+        raise _NotFound("404 Not Found: /points/query")
+
+    def search(self, collection_name: str, query_vector: Any, limit: int = 10, **kw):
+        return []
+
+
+def legacy_search(client: Any, namespace: str, vector: List[float], top_k: int = 10, flt: Any = None):
+    # the pre-detection chain, kept verbatim for comparison
+    try:
+        return client.query_points(collection_name="c", query=vector, using=namespace,
+                                   limit=top_k, with_payload=True, query_filter=flt).points
+    except Exception:
+        pass
+    try:
+        return client.query_points(collection_name="c", query_vector=vector, using=namespace,
+                                   limit=top_k, with_payload=True, filter=flt).points
+    except Exception:
+        pass
+    try:
+        return client.search(collection_name="c", query_vector=(namespace, vector),
+                             limit=top_k, with_payload=True, query_filter=flt)
+    except Exception:
+        pass
+    return client.search(collection_name="c", query_vector=vector, limit=top_k, with_payload=True)
+
+
+def _bench(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main():
+    vec = [0.0] * 512
+    client = _OldClient()
+
+    # the client has query_points but the server is too old for it: the
+    # version probe at construction picks search
+    store = QdrantStore(client=client)
+    assert store.search_mode == "search", store.search_mode
+
+    legacy_us = _bench(lambda: legacy_search(client, "text", vec), N)
+    bound_us = _bench(lambda: store.search("text", vec), N)
+
+    print(f"calls={N} simulated failed round-trip={FAIL_MS}ms")
+    print(f"legacy try/except chain : {legacy_us:10.1f} us/call")
+    print(f"bound '{store.search_mode}' path     : {bound_us:10.1f} us/call")
+    print(f"overhead removed        : {legacy_us - bound_us:10.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# backend/scripts/bench_search_path.py
+"""
+Allocation benchmark for the search hot path (no network).
+
+Replays one request worth of work against a synthetic Qdrant response:
+  legacy : vector -> list[float] -> json body, r.json(), payload + mirrored
+           dicts in Retriever, another list of dicts in main, json response
+  current: float32 array -> orjson body, orjson.loads, Hit dataclasses,
+           orjson response
+
+    python -m scripts.bench_search_path
+"""
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import orjson
+
+from app.retreiver import Hit
+
+TOP_K = int(os.getenv("BENCH_TOPK", "100"))
+DIM = int(os.getenv("BENCH_DIM", "512"))
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "200"))
+
+
+def _fake_response(n: int) -> bytes:
+    result = [
+        {
+            "id": i,
+            "version": 0,
+            "score": 1.0 - i / n,
+            "payload": {
+                "product_id": f"p{i:06d}",
+                "description": "black evening dress with lace sleeves",
+                "image_path": f"women/dresses/{i}.jpg",
+                "image_abs_path": f"/data/women/dresses/{i}.jpg",
+                "category": None,
+                "color": None,
+            },
+        }
+        for i in range(n)
+    ]
+    return json.dumps({"result": result, "status": "ok", "time": 0.001}).encode("utf-8")
+
+
+def legacy(vec: np.ndarray, raw: bytes) -> bytes:
+    v = [float(x) for x in vec.tolist()]
+    json.dumps({"limit": TOP_K, "with_payload": True, "vector": {"name": "text", "vector": v}}).encode("utf-8")
+    hits = json.loads(raw).get("result", [])
+    out = []
+    for h in hits:
+        payload = h.get("payload") or {}
+        out.append({
+            "id": h.get("id"),
+            "score": float(h.get("score", 0.0)),
+            "payload": payload,
+            "product_id": payload.get("product_id"),
+            "description": payload.get("description"),
+            "image_path": payload.get("image_path") or payload.get("image_abs_path"),
+        })
+    results = []
+    for h in out:
+        payload = h.get("payload") or {}
+        results.append({
+            "product_id": payload.get("product_id") or str(h.get("id")),
+            "score": float(h.get("score", 0.0)),
+            "description": payload.get("description"),
+            "image_path": payload.get("image_path") or payload.get("image_abs_path"),
+        })
+    return json.dumps({"results": results}).encode("utf-8")
+
+
+def current(vec: np.ndarray, raw: bytes) -> bytes:
+    orjson.dumps(
+        {"limit": TOP_K, "with_payload": True, "vector": {"name": "text", "vector": vec}},
+        option=orjson.OPT_SERIALIZE_NUMPY,
+    )
+    hits = [Hit.from_point(h) for h in (orjson.loads(raw).get("result") or [])]
+    return orjson.dumps({"results": hits}, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _measure(fn, vec, raw):
+    fn(vec, raw)  # warm
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    fn(vec, raw)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(s.count_diff for s in after.compare_to(before, "filename") if s.count_diff > 0)
+
+    t0 = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn(vec, raw)
+    us = (time.perf_counter() - t0) / ROUNDS * 1e6
+    return peak, blocks, us
+
+
+def main():
+    vec = np.random.default_rng(0).standard_normal(DIM).astype(np.float32)
+    raw = _fake_response(TOP_K)
+    print(f"top_k={TOP_K} dim={DIM} rounds={ROUNDS}")
+    for name, fn in (("legacy", legacy), ("current", current)):
+        peak, blocks, us = _measure(fn, vec, raw)
+        print(f"{name:8s} peak={peak / 1024:8.1f} KiB  retained_blocks={blocks:6d}  {us:8.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,23 @@ import json
 import os
 from typing import Any, Dict, List, Optional
 
-from qdrant_client.http import models as qm
+import numpy as np
 
+from app.dedup import DEDUP, block_of, dedup_keys, near_duplicate_groups, save_groups
 from app.embedder import CLIPEmbedder
-from app.qdrant_store import QdrantStore, COLLECTION_NAME
+from app.embedding_store import (
+    EMBEDDINGS_DIR,
+    EmbeddingSnapshot,
+    file_key,
+    model_version,
+    save_snapshot,
+    snapshot_fingerprint,
+    text_key,
+)
+from app.image_cache import IMAGE_CACHE_DIR, ImageEmbeddingCache
+from app.projection import PCA_DIM, fit_pca, projection_path
+from app.qdrant_store import QdrantStore
+from scripts.load_snapshot import load_into_qdrant
 
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -64,17 +77,24 @@ def resolve_image_path(p: Dict[str, Any]) -> Optional[str]:
 def main():
     print(f"📦 Reading products from: {SAMPLED_JSON}")
     products = load_products(SAMPLED_JSON)
+    if not products:
+        raise SystemExit(f"❌ No products in {SAMPLED_JSON}; nothing to index.")
     print(f"✅ Loaded {len(products)} sampled products")
 
-    embedder = CLIPEmbedder()  # text embeddings (and can be extended later)
-    qs = QdrantStore(host="localhost", port=6333)
+    embedder = CLIPEmbedder()  # text + image embeddings
+    version = model_version(embedder)
+    # re-runs only embed images whose bytes changed when IMAGE_CACHE_DIR is set;
+    # the memory tier also dedupes identical images within one run
+    image_cache = ImageEmbeddingCache(embedder, disk_dir=IMAGE_CACHE_DIR or None)
 
-    # text embedding dim for clip-ViT-B-32 is 512
-    qs.ensure_collection(vector_size=512)
-    print(f"✅ Qdrant collection ensured: {COLLECTION_NAME}")
-
-    points: List[qm.PointStruct] = []
+    # previous snapshot: rows with the same input and model version are reused as-is
+    old = EmbeddingSnapshot.load(EMBEDDINGS_DIR)
+    if old is not None:
+        print(f"📦 Previous snapshot: {len(old)} rows, model={old.meta.get('model')}")
 
+    rows: List[Dict[str, Any]] = []
+    texts: List[str] = []
+    image_paths: List[Optional[str]] = []
     for idx, p in enumerate(products):
         product_id = _safe_str(p.get("product_id") or p.get("id") or p.get("pid") or idx)
         desc = _safe_str(p.get("description") or p.get("caption") or p.get("title") or "")
@@ -83,9 +103,6 @@ def main():
         img_abs = resolve_image_path(p)
         img_rel = _safe_str(p.get("image_path"))  # keep original too if you want
 
-        # create text embedding
-        vec_text = embedder.embed_text(desc if desc else product_id)
-
         payload = {
             "product_id": product_id,
             "description": desc,
@@ -98,25 +115,106 @@ def main():
             "color": p.get("color"),
             "brand": p.get("brand"),
         }
-
-        # named vector format: vectors={"text":[...], "image":[...]}
-        # For now only text (image can be added later)
-        point = qm.PointStruct(
-            id=idx,
-            vector={"text": vec_text},
-            payload=payload,
+        text = desc if desc else product_id
+        img_key = file_key(img_abs) if img_abs else None
+        rows.append({
+            "id": idx,
+            "product_id": product_id,
+            "payload": payload,
+            "versions": {"text": version, "image": None},
+            "keys": {"text": text_key(text), "image": img_key},
+        })
+        texts.append(text)
+        image_paths.append(img_abs if img_key is not None else None)
+
+    dim = old.dim if old is not None and old.meta.get("model") == version else 0
+    text_vecs: Dict[int, np.ndarray] = {}
+    image_vecs: Dict[int, np.ndarray] = {}
+    to_embed: List[int] = []
+    reused = {"text": 0, "image": 0}
+
+    for i, r in enumerate(rows):
+        j = old.row_of(r["product_id"]) if old is not None else None
+        if j is not None and old.reusable(j, "text", version, r["keys"]["text"]):
+            text_vecs[i] = old.vectors["text"][j]
+            reused["text"] += 1
+        else:
+            to_embed.append(i)
+
+    # text embeddings in batches
+    for b in range(0, len(to_embed), 64):
+        chunk = to_embed[b:b + 64]
+        for i, v in zip(chunk, embedder.embed_texts([texts[i] for i in chunk])):
+            text_vecs[i] = v
+        print(f"🧠 Embedded text {min(b + 64, len(to_embed))}/{len(to_embed)}")
+
+    # image embedding when the file is on disk (named vectors may be partial)
+    for i, r in enumerate(rows):
+        path = image_paths[i]
+        if path is None:
+            continue
+        j = old.row_of(r["product_id"]) if old is not None else None
+        if j is not None and old.reusable(j, "image", version, r["keys"]["image"]):
+            image_vecs[i] = old.vectors["image"][j]
+            reused["image"] += 1
+        else:
+            try:
+                image_vecs[i] = image_cache.embed_image(path)
+            except Exception as e:
+                print(f"⚠️ Image embed failed for {path}: {e!r}")
+                continue
+        r["versions"]["image"] = version
+
+    if not dim:
+        # no reusable snapshot: the width of any vector we just embedded, else ask the model
+        produced = next(iter(text_vecs.values()), None)
+        dim = len(produced) if produced is not None else len(embedder.embed_text("dimension probe"))
+    vectors = {"text": np.zeros((len(rows), dim), dtype=np.float32)}
+    for i, v in text_vecs.items():
+        vectors["text"][i] = v
+    if image_vecs:
+        vectors["image"] = np.zeros((len(rows), dim), dtype=np.float32)
+        for i, v in image_vecs.items():
+            vectors["image"][i] = v
+
+    save_snapshot(EMBEDDINGS_DIR, rows, vectors, version)
+    print(
+        f"✅ Snapshot written to {EMBEDDINGS_DIR}: {len(rows)} rows "
+        f"(reused text={reused['text']}, image={reused['image']}; embedded text={len(to_embed)})"
+    )
+    print(f"📦 Image cache: {image_cache.stats()}")
+
+    # low-dim vectors for two-stage search, fitted on this catalogue
+    for name, X in vectors.items():
+        present = X[X.any(axis=1)]
+        if PCA_DIM <= 0 or len(present) <= PCA_DIM:
+            # no projection: make sure a stale one isn't loaded with this index
+            projection_path(name, EMBEDDINGS_DIR).unlink(missing_ok=True)
+        else:
+            proj = fit_pca(present, PCA_DIM)
+            proj.save(projection_path(name, EMBEDDINGS_DIR))
+            print(f"✅ PCA {name}: {dim} -> {PCA_DIM} dims, {proj.explained:.1%} of variance")
+
+    # near-duplicate groups: the loader indexes one representative per group
+    if DEDUP:
+        # only products that agree on every filterable field (and the shard key) can collapse
+        keys = dedup_keys()
+        rep = near_duplicate_groups(
+            vectors["text"], vectors.get("image"), blocks=[block_of(r["payload"], keys) for r in rows]
         )
-        points.append(point)
-
-        if (idx + 1) % 200 == 0:
-            qs.upsert_points(points)
-            print(f"⬆️ Upserted {idx+1} points...")
-            points = []
-
-    if points:
-        qs.upsert_points(points)
-        print(f"⬆️ Upserted final batch. Total={len(products)}")
+        report = save_groups(EMBEDDINGS_DIR, snapshot_fingerprint(rows, version), rep)
+        saved_mb = report["collapsed"] * dim * 4 * len(vectors) / 1e6
+        print(
+            f"🧬 Dedup on {', '.join(keys) or 'vectors only'}: {report['rows']} -> {report['indexed']} products "
+            f"({report['reduction']:.1%} smaller, ~{saved_mb:.1f} MB of vectors), "
+            f"{report['groups']} groups, largest {report['largest_group']} (cap {report['max_group']})"
+        )
+    else:
+        (EMBEDDINGS_DIR / "groups.npz").unlink(missing_ok=True)
 
+    snap = EmbeddingSnapshot.load(EMBEDDINGS_DIR)
+    n = load_into_qdrant(snap, QdrantStore())
+    print(f"⬆️ Loaded {len(snap)} snapshot rows into {n} collection(s)")
     print("🎉 Done. Now /api/chat results should include description + image_path.")
 
 
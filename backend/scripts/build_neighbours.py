@@ -0,0 +1,165 @@
+# backend/scripts/build_neighbours.py
+"""
+Offline "more like this" job: top-K neighbours for every product on the
+`text` and `image` vectors, served by /api/similar/{product_id}.
+
+    python -m scripts.build_neighbours                  # full rebuild
+    python -m scripts.build_neighbours --update p1,p2   # re-read p1, p2 (new or changed) and patch the table
+"""
+import argparse
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.neighbours import NEIGHBOURS_DIR, NEIGHBOURS_K, save_table, topk_neighbours, update_neighbours
+from app.config import COLLECTION_NAME, SHARD_KEY, SHARD_SEPARATOR
+from app.qdrant_store import QdrantStore
+
+VECTOR_NAMES = ("text", "image")
+PAYLOAD_KEYS = ["product_id", "description", "image_path", "image_abs_path", "group_size"]
+
+
+def _product(pt: Any) -> Dict[str, Any]:
+    payload = pt.payload or {}
+    return {
+        "id": pt.id,
+        "product_id": payload.get("product_id") or str(pt.id),
+        "description": payload.get("description"),
+        "image_path": payload.get("image_path") or payload.get("image_abs_path"),
+        "group_size": payload.get("group_size", 1),
+    }
+
+
+def source_collections(qs: QdrantStore) -> List[str]:
+    """The single collection, or every shard of it when SHARD_KEY is set."""
+    if SHARD_KEY:
+        return qs.list_collections(prefix=f"{COLLECTION_NAME}{SHARD_SEPARATOR}")
+    return [COLLECTION_NAME]
+
+
+def scroll_points(qs: QdrantStore, flt: Optional[Any] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[int, np.ndarray]]]:
+    """All points (optionally filtered) with their named vectors."""
+    products: List[Dict[str, Any]] = []
+    vecs: Dict[str, Dict[int, np.ndarray]] = {name: {} for name in VECTOR_NAMES}
+    for collection in source_collections(qs):
+        offset = None
+        while True:
+            points, offset = qs.client.scroll(
+                collection_name=collection,
+                scroll_filter=flt,
+                limit=512,
+                offset=offset,
+                with_payload=PAYLOAD_KEYS,
+                with_vectors=list(VECTOR_NAMES),
+            )
+            for pt in points:
+                i = len(products)
+                products.append(_product(pt))
+                named = pt.vector if isinstance(pt.vector, dict) else {}
+                for name in VECTOR_NAMES:
+                    if named.get(name) is not None:
+                        vecs[name][i] = np.asarray(named[name], dtype=np.float32)
+            if offset is None:
+                break
+    return products, vecs
+
+
+def _unit_rows(X: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (X / norms).astype(np.float32)
+
+
+def _matrix(n: int, rows: Dict[int, np.ndarray], dim: Optional[int] = None) -> Optional[np.ndarray]:
+    if not rows and dim is None:
+        return None
+    dim = dim or len(next(iter(rows.values())))
+    X = np.zeros((n, dim), dtype=np.float32)
+    for i, v in rows.items():
+        X[i] = v
+    return _unit_rows(X)
+
+
+def full_build(qs: QdrantStore, k: int) -> None:
+    products, vecs = scroll_points(qs)
+    print(f"📦 Loaded {len(products)} points from '{COLLECTION_NAME}'")
+
+    tables = {}
+    for name in VECTOR_NAMES:
+        X = _matrix(len(products), vecs[name])
+        if X is None:
+            print(f"⏭️ No '{name}' vectors in the collection, skipping")
+            continue
+        ids, scores = topk_neighbours(X, k)
+        tables[name] = {"ids": ids, "scores": scores, "vectors": X}
+        print(f"✅ {name}: {len(vecs[name])} products x top-{k}")
+
+    save_table(NEIGHBOURS_DIR, products, tables, k)
+    print(f"🎉 Neighbour table written to {NEIGHBOURS_DIR}")
+
+
+def incremental_update(qs: QdrantStore, product_ids: List[str]) -> None:
+    from qdrant_client.http import models as qm
+
+    meta = json.loads((NEIGHBOURS_DIR / "meta.json").read_text(encoding="utf-8"))
+    k = int(meta["k"])
+    products = json.loads((NEIGHBOURS_DIR / "products.json").read_text(encoding="utf-8"))
+    row = {p["product_id"]: i for i, p in enumerate(products)}
+
+    flt = qm.Filter(must=[qm.FieldCondition(key="product_id", match=qm.MatchAny(any=product_ids))])
+    fresh, fresh_vecs = scroll_points(qs, flt)
+    if not fresh:
+        print("⚠️ None of the given product ids are in the collection")
+        return
+
+    changed: List[int] = []
+    remap: Dict[int, int] = {}
+    for j, p in enumerate(fresh):
+        i = row.get(p["product_id"])
+        if i is None:
+            i = len(products)
+            products.append(p)
+            row[p["product_id"]] = i
+        else:
+            products[i] = p
+        changed.append(i)
+        remap[j] = i
+
+    tables = {}
+    for name in VECTOR_NAMES:
+        path = NEIGHBOURS_DIR / f"{name}_vectors.npy"
+        if name not in meta.get("vectors", []) or not path.exists():
+            continue
+        X_old = np.load(path)
+        X = np.zeros((len(products), X_old.shape[1]), dtype=np.float32)
+        X[: len(X_old)] = X_old
+        X[changed] = 0.0
+        for j, v in fresh_vecs[name].items():
+            X[remap[j]] = v
+        X[changed] = _unit_rows(X[changed])
+        ids = np.load(NEIGHBOURS_DIR / f"{name}_ids.npy")
+        scores = np.load(NEIGHBOURS_DIR / f"{name}_scores.npy")
+        ids, scores = update_neighbours(X, ids, scores, np.asarray(changed), k)
+        tables[name] = {"ids": ids, "scores": scores, "vectors": X}
+        print(f"✅ {name}: patched {len(changed)} changed products")
+
+    save_table(NEIGHBOURS_DIR, products, tables, k)
+    print(f"🎉 Neighbour table updated in {NEIGHBOURS_DIR}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Precompute top-K similar products.")
+    ap.add_argument("--k", type=int, default=NEIGHBOURS_K)
+    ap.add_argument("--update", default="", help="comma-separated product_ids that were added or changed")
+    args = ap.parse_args()
+
+    qs = QdrantStore()
+    if args.update:
+        incremental_update(qs, [p.strip() for p in args.update.split(",") if p.strip()])
+    else:
+        full_build(qs, args.k)
+
+
+if __name__ == "__main__":
+    main()
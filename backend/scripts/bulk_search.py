@@ -0,0 +1,173 @@
+# backend/scripts/bulk_search.py
+"""
+Offline bulk search: runs a JSONL file of queries through the same embedder
+and index as /api/chat, minus the planner and HTTP.
+
+    python -m scripts.bulk_search queries.jsonl results.jsonl --top-k 20 --concurrency 4
+
+Each input line is a JSON object with the query text in --field (falls back
+to "query", "message" or "text") and optional "id" / "filters". Each output
+line is {"line", "id", "query", "hits"}, in input order.
+
+Queries are embedded --embed-batch at a time and searched through Qdrant's
+batch endpoint --search-batch at a time, with at most --concurrency batch
+requests in flight while the next chunk is embedded. After every chunk the
+output is flushed and <output>.ckpt records how far we got; --resume
+continues from there after a crash or Ctrl-C.
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+from app.config import SHARD_KEY
+from app.embed_service import EMBED_SERVICE_SOCKET, RemoteEmbedder
+from app.retreiver import Retriever
+from app.shard_router import ShardRouter
+
+QUERY_FIELDS = ("query", "message", "text")
+
+
+def _query_of(rec: Dict[str, Any], field: Optional[str]) -> str:
+    if field:
+        return str(rec.get(field) or "")
+    for k in QUERY_FIELDS:
+        if rec.get(k):
+            return str(rec[k])
+    return ""
+
+
+def read_chunks(path: Path, skip: int, size: int) -> Iterator[List[Tuple[int, Dict[str, Any]]]]:
+    """
+    (line number, record) chunks, streaming; blank lines are counted but
+    skipped, and so are malformed ones (logged with their line number).
+    """
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+    with open(path, "rb") as f:
+        for n, line in enumerate(f):
+            if n < skip:
+                continue
+            line = line.strip()
+            if line:
+                try:
+                    rec = orjson.loads(line)
+                except orjson.JSONDecodeError as e:
+                    print(f"⚠️ Skipping line {n + 1}: invalid JSON ({e})")
+                    rec = None
+                if isinstance(rec, dict):
+                    chunk.append((n, rec))
+                elif rec is not None:
+                    print(f"⚠️ Skipping line {n + 1}: not a JSON object")
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def _load_checkpoint(path: Path) -> Dict[str, int]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {"lines": 0, "bytes": 0, "queries": 0}
+
+
+def _save_checkpoint(path: Path, ckpt: Dict[str, int]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(ckpt), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Batch search a JSONL file of queries.")
+    ap.add_argument("input")
+    ap.add_argument("output")
+    ap.add_argument("--field", default=None, help="query field (default: query/message/text)")
+    ap.add_argument("--top-k", type=int, default=10)
+    ap.add_argument("--embed-batch", type=int, default=256)
+    ap.add_argument("--search-batch", type=int, default=64)
+    ap.add_argument("--concurrency", type=int, default=4, help="Qdrant batch requests in flight")
+    ap.add_argument("--resume", action="store_true")
+    args = ap.parse_args()
+
+    inp, out = Path(args.input), Path(args.output)
+    ckpt_path = out.with_name(out.name + ".ckpt")
+    ckpt = _load_checkpoint(ckpt_path) if args.resume else {"lines": 0, "bytes": 0, "queries": 0}
+    if args.resume and ckpt["lines"]:
+        size = out.stat().st_size if out.exists() else -1
+        if size < ckpt["bytes"]:
+            raise SystemExit(
+                f"❌ {out} is {'missing' if size < 0 else f'{size} bytes'} but {ckpt_path} expects "
+                f"{ckpt['bytes']}; can't resume. Restore the output or rerun without --resume."
+            )
+        print(f"↩️ Resuming after line {ckpt['lines']} ({ckpt['queries']} queries done)")
+
+    if EMBED_SERVICE_SOCKET:
+        embedder = RemoteEmbedder(EMBED_SERVICE_SOCKET)
+    else:
+        from app.embedder import CLIPEmbedder
+        embedder = CLIPEmbedder()
+    retriever = ShardRouter() if SHARD_KEY else Retriever()
+    pool = ThreadPoolExecutor(max_workers=max(1, args.concurrency), thread_name_prefix="bulk-search")
+
+    # output is truncated to the last checkpoint, so a crash mid-chunk can't leave duplicates
+    f_out = open(out, "r+b" if args.resume and out.exists() else "wb")
+    f_out.truncate(ckpt["bytes"])
+    f_out.seek(ckpt["bytes"])
+
+    t0 = time.perf_counter()
+    done = 0
+    pending: deque = deque()  # (chunk, [futures]) in input order
+
+    def drain(keep: int) -> None:
+        nonlocal done
+        while len(pending) > keep:
+            chunk, futures = pending.popleft()
+            hits = [h for f in futures for h in f.result()]
+            for (n, rec, q), hs in zip(chunk, hits):
+                f_out.write(orjson.dumps({"line": n, "id": rec.get("id"), "query": q, "hits": hs}))
+                f_out.write(b"\n")
+            f_out.flush()
+            done += len(chunk)
+            ckpt.update(lines=chunk[-1][0] + 1, bytes=f_out.tell(), queries=ckpt["queries"] + len(chunk))
+            _save_checkpoint(ckpt_path, ckpt)
+            dt = time.perf_counter() - t0
+            print(f"⬆️ {ckpt['queries']} queries ({done / max(dt, 1e-9):.1f} q/s)")
+
+    try:
+        for raw in read_chunks(inp, ckpt["lines"], args.embed_batch):
+            chunk = [(n, rec, _query_of(rec, args.field)) for n, rec in raw]
+            chunk = [c for c in chunk if c[2]]
+            if not chunk:
+                continue
+            # embedding this chunk overlaps with the previous chunk's searches
+            vecs = embedder.embed_texts([q for _, _, q in chunk])
+            filters = [rec.get("filters") for _, rec, _ in chunk]
+            futures = [
+                pool.submit(
+                    retriever.search_batch, "text", vecs[i:i + args.search_batch], top_k=args.top_k,
+                    filters=filters[i:i + args.search_batch],
+                )
+                for i in range(0, len(chunk), args.search_batch)
+            ]
+            pending.append((chunk, futures))
+            # bounded: never more than ~concurrency search batches queued behind the pool
+            while sum(len(fs) for _, fs in pending) > args.concurrency and len(pending) > 1:
+                drain(len(pending) - 1)
+        drain(0)
+    finally:
+        f_out.close()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    dt = time.perf_counter() - t0
+    print(f"🎉 {done} queries in {dt:.1f}s: {done / max(dt, 1e-9):.1f} queries/s → {out}")
+
+
+if __name__ == "__main__":
+    main()
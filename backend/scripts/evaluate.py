@@ -1,9 +1,15 @@
 import os
 import json
+import time
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+from app.config import QDRANT_HOST, QDRANT_PORT
+from app.dedup import DuplicateGroups
 from app.embedder import CLIPEmbedder
 from app.qdrant_client import QdrantService
+from app.retreiver import PREFETCH_FACTOR, PREFETCH_MIN, Retriever
 
 BENCH_PATH = Path("benchmark") / "benchmark.json"
 OUT_METRICS = Path("benchmark") / "metrics.json"
@@ -30,6 +36,14 @@ def rank_of_expected(results: List[Dict[str, Any]], expected_pid: str) -> int:
             return i
     return 0
 
+def rank_of_group(results: List[Dict[str, Any]], expected_pid: str, groups: DuplicateGroups) -> int:
+    # like rank_of_expected, but any near-duplicate of the expected product counts
+    gid = groups.group_id(expected_pid)
+    for i, r in enumerate(results, start=1):
+        if groups.group_id(r.get("product_id")) == gid:
+            return i
+    return 0
+
 def search_text(qs: QdrantService, vec: List[float], top_k: int) -> List[Dict[str, Any]]:
     return qs.search("text", vec, top_k)
 
@@ -50,6 +64,43 @@ def fuse(text_hits, image_hits, w_text=0.6, w_img=0.4):
     fused.sort(key=lambda x: x["score"], reverse=True)
     return fused
 
+def compare_two_stage(queries: List[Tuple[str, List[float], str]], top_k: int) -> Dict[str, Any]:
+    """
+    Exact full-vector search vs two-stage (low-dim prefetch + full rescore)
+    on the same query vectors: recall of the expected product, latency, and
+    how much of the exact top-k the two-stage search reproduces.
+    """
+    exact = Retriever(two_stage=False)
+    fast = Retriever(two_stage=True)
+    out: Dict[str, Any] = {
+        "prefetch_factor": PREFETCH_FACTOR,
+        "prefetch_min": PREFETCH_MIN,
+        # without a projection both sides run the exact search
+        "projected": {m: fast.target(m)[1] is not None for m in ("text", "image")},
+    }
+    ranks = {"exact": [], "two_stage": []}
+    lat = {"exact": [], "two_stage": []}
+    overlap = []
+    for mode, qv, expected in queries:
+        res = {}
+        for name, r in (("exact", exact), ("two_stage", fast)):
+            t0 = time.perf_counter()
+            hits = r.search(mode, qv, top_k=top_k)
+            lat[name].append((time.perf_counter() - t0) * 1000.0)
+            res[name] = [h.product_id for h in hits]
+            ranks[name].append(res[name].index(expected) + 1 if expected in res[name] else 0)
+        if res["exact"]:
+            overlap.append(len(set(res["exact"]) & set(res["two_stage"])) / len(res["exact"]))
+    for name in ranks:
+        out[name] = {
+            f"recall@{top_k}": recall_at_k(ranks[name], top_k),
+            "mrr@10": mrr_at_k(ranks[name], 10),
+            "p50_ms": float(np.percentile(lat[name], 50)) if lat[name] else 0.0,
+            "p95_ms": float(np.percentile(lat[name], 95)) if lat[name] else 0.0,
+        }
+    out[f"overlap@{top_k}"] = float(np.mean(overlap)) if overlap else 0.0
+    return out
+
 def main():
     if not BENCH_PATH.exists():
         raise FileNotFoundError(f"Missing benchmark: {BENCH_PATH}. Run make_benchmark.py first.")
@@ -58,16 +109,18 @@ def main():
     w_text = float(os.getenv("EVAL_W_TEXT", "0.6"))
     w_img = float(os.getenv("EVAL_W_IMG", "0.4"))
 
-    qdrant_host = os.getenv("QDRANT_HOST", "localhost")
-    qdrant_port = int(os.getenv("QDRANT_PORT", "6333"))
-
     embedder = CLIPEmbedder()
-    qs = QdrantService(host=qdrant_host, port=qdrant_port)
+    qs = QdrantService(host=QDRANT_HOST, port=QDRANT_PORT)
 
     bench = json.loads(BENCH_PATH.read_text(encoding="utf-8"))
 
+    # index-time dedup (app/dedup.py): collapsed products are only found via their group
+    groups = DuplicateGroups()
     ranks = []
+    grouped_ranks = []
     failures = []
+    # single-modality query vectors, replayed by the two-stage comparison
+    queries: List[Tuple[str, List[float], str]] = []
 
     for ex in bench:
         typ = ex["type"]
@@ -76,10 +129,12 @@ def main():
         if typ == "text":
             qv = embedder.embed_text(ex["query"]).tolist()
             res = search_text(qs, qv, top_k=top_k)
+            queries.append(("text", qv, expected))
 
         elif typ == "image":
             qv = embedder.embed_image(ex["image_path"]).tolist()
             res = search_image(qs, qv, top_k=top_k)
+            queries.append(("image", qv, expected))
 
         elif typ == "text_image":
             qv_t = embedder.embed_text(ex["query"]).tolist()
@@ -93,6 +148,7 @@ def main():
 
         r = rank_of_expected(res, expected)
         ranks.append(r)
+        grouped_ranks.append(rank_of_group(res, expected, groups))
 
         if r == 0:
             failures.append({
@@ -113,8 +169,16 @@ def main():
         "recall@10": recall_at_k(ranks, 10),
         "mrr@10": mrr_at_k(ranks, 10),
         "failures": len(failures),
+        # strict recall counts a near-duplicate of the expected product as a miss
+        "recall@5_grouped": recall_at_k(grouped_ranks, 5),
+        "recall@10_grouped": recall_at_k(grouped_ranks, 10),
+        "dedup": groups.stats(),
     }
 
+    # recall / latency trade-off of two-stage search (needs a fitted projection)
+    if os.getenv("EVAL_TWO_STAGE", "1") not in ("0", "false", "False", "") and queries:
+        metrics["two_stage"] = compare_two_stage(queries, top_k)
+
     OUT_METRICS.write_text(json.dumps(metrics, indent=2), encoding="utf-8")
     FAILURES.write_text(json.dumps(failures, indent=2), encoding="utf-8")
 
@@ -126,11 +190,24 @@ def main():
         base = json.loads(BASELINE.read_text(encoding="utf-8"))
         # Fail if recall@5 drops by more than 0.05 (tune as you like)
         allowed_drop = float(os.getenv("REGRESSION_ALLOWED_DROP", "0.05"))
+        # recall change from collapsing near-duplicates vs the (possibly undeduped) baseline
+        base_grouped = base.get("recall@5_grouped", base.get("recall@5", 0.0))
+        print(
+            f"🧬 recall@5 vs baseline: strict {metrics['recall@5'] - base.get('recall@5', 0.0):+.3f}, "
+            f"grouped {metrics['recall@5_grouped'] - base_grouped:+.3f}"
+        )
         if metrics["recall@5"] < base.get("recall@5", 0.0) - allowed_drop:
             raise SystemExit(
                 f"❌ Regression detected: recall@5 {metrics['recall@5']:.3f} "
                 f"< baseline {base.get('recall@5',0.0):.3f} - {allowed_drop}"
             )
+        # grouped recall too: a near-duplicate standing in for the expected product is fine,
+        # losing the whole group is not
+        if metrics["recall@5_grouped"] < base_grouped - allowed_drop:
+            raise SystemExit(
+                f"❌ Regression detected: recall@5 (grouped) {metrics['recall@5_grouped']:.3f} "
+                f"< baseline {base_grouped:.3f} - {allowed_drop}"
+            )
         print("✅ No regression vs baseline")
 
 if __name__ == "__main__":
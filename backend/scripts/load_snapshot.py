@@ -0,0 +1,215 @@
+# backend/scripts/load_snapshot.py
+"""
+Bulk-loads Qdrant from the embedding snapshot written by build_index_qdrant.py,
+without running CLIP. Use it to rebuild collections after changing the layout,
+sharding or Qdrant settings:
+
+    python -m scripts.load_snapshot [--batch 512]
+
+Blue/green by default: points go into new "<name>-v<timestamp>" collections
+created with HNSW deferred, the graph is built once after the upload (with at
+most INDEX_BUILD_THREADS threads, so serving keeps its CPU), counts and a
+probe search are verified, and only then are the aliases the API queries
+switched over in one atomic update. INDEX_VERSIONED=0 writes in place.
+
+With DEDUP on and a groups.npz computed on this snapshot, only one
+representative per near-duplicate group is loaded (payload "group_size" =
+members), and each collection gets the groups.json for its representatives.
+"""
+import argparse
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client.http import models as qm
+
+from app.config import COLLECTION_NAME, SHARD_KEY, SHARD_SEPARATOR, VERSION_SEPARATOR, shard_collection
+from app.dedup import DEDUP, group_entries, load_representatives, write_group_file
+from app.embedding_store import EMBEDDINGS_DIR, EmbeddingSnapshot
+from app.live_index import LIVE_INDEX_REFRESH_S, artifacts_dir
+from app.projection import PCA_SUFFIX, Projection, projection_path
+from app.qdrant_store import QdrantStore
+
+INDEX_VERSIONED = os.getenv("INDEX_VERSIONED", "1") not in ("0", "false", "False", "")
+KEEP_OLD_VERSIONS = int(os.getenv("KEEP_OLD_VERSIONS", "1"))  # previous builds kept for rollback
+INDEX_HNSW_M = int(os.getenv("INDEX_HNSW_M", "16"))
+INDEX_INDEXING_THRESHOLD = int(os.getenv("INDEX_INDEXING_THRESHOLD", "20000"))
+INDEX_BUILD_THREADS = int(os.getenv("INDEX_BUILD_THREADS", "2"))  # 0 = Qdrant picks
+INDEX_WAIT_S = float(os.getenv("INDEX_WAIT_S", "3600"))
+
+
+def _project_all(snap: EmbeddingSnapshot) -> Tuple[Dict[str, Any], Dict[str, Projection]]:
+    """
+    Projected (N, dim) matrix per "{name}_pca" vector, for every vector with a
+    fitted projection, plus the projections themselves (by vector name).
+    """
+    low: Dict[str, Any] = {}
+    projections: Dict[str, Projection] = {}
+    for name, X in snap.vectors.items():
+        path = projection_path(name, snap.root)
+        if not path.exists():
+            continue
+        proj = projections[name] = Projection.load(path)
+        Y = np.zeros((len(X), proj.dim), dtype=np.float32)
+        for i in range(0, len(X), 8192):
+            Y[i:i + 8192] = proj.project(X[i:i + 8192])
+        low[f"{name}{PCA_SUFFIX}"] = Y
+        print(f"✅ {name}{PCA_SUFFIX}: {proj.dim} dims ({proj.explained:.1%} of variance)")
+    return low, projections
+
+
+def _write_artifacts(collection: str, projections: Dict[str, Projection]) -> None:
+    """The files the API reads for `collection`, replacing any left from an earlier build."""
+    root = artifacts_dir(collection)
+    shutil.rmtree(root, ignore_errors=True)
+    root.mkdir(parents=True, exist_ok=True)
+    for name, proj in projections.items():
+        proj.save(projection_path(name, root))
+
+
+def _drop(qs: QdrantStore, collection: str) -> None:
+    qs.drop_collection(collection)
+    shutil.rmtree(artifacts_dir(collection), ignore_errors=True)
+
+
+def publish(qs: QdrantStore, targets: Dict[str, Any], expected: Dict[str, int], probe: Dict[str, Any]) -> None:
+    """Builds HNSW, verifies every new collection, then swaps all aliases at once."""
+    for alias, (store, _) in targets.items():
+        store.finish_bulk_load(INDEX_HNSW_M, INDEX_INDEXING_THRESHOLD, INDEX_BUILD_THREADS)
+    for alias, (store, _) in targets.items():
+        t0 = time.perf_counter()
+        if not store.wait_indexed(expected[alias], INDEX_WAIT_S):
+            raise SystemExit(f"❌ {store.collection} still optimizing after {INDEX_WAIT_S:.0f}s; aliases unchanged")
+        n = store.count()
+        if n != expected[alias]:
+            raise SystemExit(f"❌ {store.collection} has {n} points, expected {expected[alias]}; aliases unchanged")
+        name, vec = probe[alias]
+        if not store.search(name, vec, top_k=1):
+            raise SystemExit(f"❌ Probe search on {store.collection} returned nothing; aliases unchanged")
+        print(f"✅ {store.collection}: {n} points indexed in {time.perf_counter() - t0:.1f}s, probe ok")
+
+    stale: List[str] = []
+    if SHARD_KEY:
+        # shards that vanished from the catalogue stop being served with the swap
+        stale = [a for a in qs.aliases(prefix=f"{COLLECTION_NAME}{SHARD_SEPARATOR}") if a not in targets]
+    previous = qs.swap_aliases({alias: store.collection for alias, (store, _) in targets.items()}, remove=stale)
+    for alias, (store, _) in sorted(targets.items()):
+        print(f"🔀 {alias}: {previous.get(alias) or '-'} → {store.collection}")
+
+    drop: List[str] = []
+    for alias in list(targets) + stale:
+        versions = qs.physical_collections(prefix=f"{alias}{VERSION_SEPARATOR}")
+        live = targets[alias][0].collection if alias in targets else None
+        old = sorted((v for v in versions if v != live), reverse=True)
+        keep = KEEP_OLD_VERSIONS if alias in targets else 0
+        drop.extend(old[keep:])
+    if drop:
+        # the API queries the collection it last resolved the alias to; give it time to see the swap
+        time.sleep(2 * LIVE_INDEX_REFRESH_S)
+    for name in drop:
+        _drop(qs, name)
+        print(f"🗑️ Dropped old version {name}")
+
+
+def load_into_qdrant(
+    snap: EmbeddingSnapshot,
+    qs: QdrantStore,
+    batch_size: int = 256,
+    versioned: bool = INDEX_VERSIONED,
+) -> int:
+    """
+    Upserts every snapshot row into the target collection(s), one per shard.
+    Versioned (default): into fresh collections, then published via aliases.
+    Otherwise the live collections are recreated in place. Returns #collections.
+    """
+    low, projections = _project_all(snap)
+    rep = load_representatives(snap) if DEDUP else None
+    group_size = np.bincount(rep, minlength=len(snap)) if rep is not None else None
+    groups = group_entries(snap.rows, rep) if rep is not None else {}
+    # alias -> the groups whose representative it holds (members share its shard)
+    group_files: Dict[str, Dict[str, Any]] = {}
+    extra = {name: int(Y.shape[1]) for name, Y in low.items()}
+    version: Optional[str] = time.strftime("%Y%m%d%H%M%S") if versioned else None
+    # alias (logical name) -> (store, pending points); one entry unless SHARD_KEY is set
+    targets: Dict[str, Any] = {}
+    expected: Dict[str, int] = {}
+    probe: Dict[str, Any] = {}
+
+    def target_for(payload: Dict[str, Any]):
+        name = shard_collection(payload.get(SHARD_KEY)) if SHARD_KEY else COLLECTION_NAME
+        t = targets.get(name)
+        if t is None:
+            physical = f"{name}{VERSION_SEPARATOR}{version}" if version else name
+            store = qs.for_collection(physical)
+            store.ensure_collection(vector_size=snap.dim, extra_vectors=extra, bulk_load=bool(version))
+            # the API reads projections from the collection's own dir, so they switch with the alias
+            _write_artifacts(physical, projections)
+            print(f"✅ Qdrant collection ensured: {physical}")
+            t = targets[name] = (store, [])
+            expected[name] = 0
+        return name, t
+
+    # rows are materialised per batch; the mmapped matrices are read sequentially
+    loaded = 0
+    for i, row in enumerate(snap.rows):
+        if rep is not None and rep[i] != i:
+            continue  # collapsed into its group's representative
+        payload = row["payload"]
+        if group_size is not None:
+            payload = {**payload, "group_size": int(group_size[i])}
+        vectors = {}
+        for name in snap.vectors:
+            v = snap.vector(name, i)
+            if v is not None:
+                vectors[name] = v.tolist()
+                if f"{name}{PCA_SUFFIX}" in low:
+                    vectors[f"{name}{PCA_SUFFIX}"] = low[f"{name}{PCA_SUFFIX}"][i].tolist()
+        alias, (store, points) = target_for(payload)
+        points.append(qm.PointStruct(id=row["id"], vector=vectors, payload=payload))
+        expected[alias] += 1
+        if row["product_id"] in groups:
+            group_files.setdefault(alias, {})[row["product_id"]] = groups[row["product_id"]]
+        if alias not in probe and "text" in vectors:
+            probe[alias] = ("text", vectors["text"])
+
+        if len(points) >= batch_size:
+            store.upsert_points(points)
+            points.clear()
+
+        loaded += 1
+        if loaded % 1000 == 0:
+            print(f"⬆️ Upserted {loaded} points...")
+
+    for alias, (store, points) in targets.items():
+        if points:
+            store.upsert_points(points)
+        if alias in group_files:
+            write_group_file(artifacts_dir(store.collection), group_files[alias])
+    if rep is not None:
+        print(f"🧬 Near-duplicates collapsed: {loaded} of {len(snap)} rows loaded ({1 - loaded / max(len(snap), 1):.1%} smaller)")
+
+    if version:
+        publish(qs, targets, expected, probe)
+    return len(targets)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load Qdrant from the embedding snapshot.")
+    ap.add_argument("--batch", type=int, default=256)
+    args = ap.parse_args()
+
+    snap = EmbeddingSnapshot.load(EMBEDDINGS_DIR)
+    if snap is None:
+        raise SystemExit(f"❌ No embedding snapshot in {EMBEDDINGS_DIR}. Run build_index_qdrant first.")
+    print(f"📦 Snapshot: {len(snap)} rows, dim={snap.dim}, model={snap.meta.get('model')}")
+
+    t0 = time.perf_counter()
+    n = load_into_qdrant(snap, QdrantStore(), batch_size=args.batch)
+    dt = time.perf_counter() - t0
+    print(f"🎉 Loaded {len(snap)} rows into {n} collection(s) in {dt:.1f}s ({len(snap) / max(dt, 1e-9):.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# backend/tests/conftest.py
+import sys
+from pathlib import Path
+
+# `app` / `scripts` are imported as top-level packages, as when running from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,70 @@
+# backend/tests/test_conversation.py
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.conversation import (
+    CONV_MAX_TURNS,
+    ConversationStore,
+    is_refinement,
+    refine_vector,
+    refinement_text,
+)
+
+
+@pytest.mark.parametrize("msg", ["same but in red", "make it cheaper", "without sleeves", "show me more"])
+def test_short_edits_are_refinements(msg):
+    assert is_refinement(msg)
+
+
+@pytest.mark.parametrize("msg", ["", "now show me sneakers", "red summer dress with a floral print for a beach wedding"])
+def test_new_searches_are_not_refinements(msg):
+    assert not is_refinement(msg)
+
+
+def test_refinement_text_keeps_only_the_change():
+    assert refinement_text("same but in red") == "red"
+    assert refinement_text("make it cheaper please") == "cheaper"
+
+
+@pytest.mark.parametrize("msg", ["show me more", "more like this", "Show me more like these"])
+def test_refinement_text_is_empty_without_a_change(msg):
+    assert is_refinement(msg)
+    assert refinement_text(msg) == ""
+
+
+def test_refine_vector_is_unit_and_moves_towards_the_new_text():
+    prev = np.array([1.0, 0.0], dtype=np.float32)
+    new = np.array([0.0, 1.0], dtype=np.float32)
+    out = refine_vector(prev, None, new)
+    assert np.isclose(np.linalg.norm(out), 1.0)
+    assert 0 < out[1] < out[0]
+
+
+def _hits(*ids):
+    return [SimpleNamespace(id=i) for i in ids]
+
+
+def test_record_turn_replaces_the_session_instead_of_mutating_it():
+    store = ConversationStore()
+    store.record_turn("s", "red dress", {"filters": {"color": "red"}}, "red dress", [1.0, 0.0], _hits(1, 2))
+    first = store.get("s")
+    store.record_turn("s", "cheaper", {}, "red dress + cheaper", [0.0, 1.0], _hits(3))
+    second = store.get("s")
+
+    assert second is not first
+    assert [t["message"] for t in first["turns"]] == ["red dress"]
+    assert first["top_ids"] == [1, 2]
+    assert [t["message"] for t in second["turns"]] == ["red dress", "cheaper"]
+    assert second["filters"] == {}
+    assert second["top_ids"] == [3]
+
+
+def test_record_turn_keeps_a_bounded_history():
+    store = ConversationStore()
+    for i in range(CONV_MAX_TURNS + 3):
+        store.record_turn("s", f"m{i}", {}, f"q{i}", [1.0], [])
+    turns = store.get("s")["turns"]
+    assert len(turns) == CONV_MAX_TURNS
+    assert turns[-1]["message"] == f"m{CONV_MAX_TURNS + 2}"
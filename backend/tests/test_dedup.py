@@ -0,0 +1,71 @@
+# backend/tests/test_dedup.py
+import numpy as np
+
+from app import dedup
+from app.embedding_store import EmbeddingSnapshot, save_snapshot
+
+
+def _unit(*vs):
+    X = np.asarray(vs, dtype=np.float32)
+    return X / np.linalg.norm(X, axis=1, keepdims=True)
+
+
+def test_identical_products_collapse_into_the_first_row():
+    X = _unit([1, 0, 0], [1, 0, 0], [0, 1, 0])
+    assert dedup.near_duplicate_groups(X).tolist() == [0, 0, 2]
+
+
+def test_rows_in_different_blocks_never_collapse():
+    X = _unit([1, 0, 0], [1, 0, 0], [1, 0, 0])
+    blocks = [("dress", "red"), ("dress", "blue"), ("dress", "red")]
+    assert dedup.near_duplicate_groups(X, blocks=blocks).tolist() == [0, 1, 0]
+
+
+def test_group_cap_splits_a_large_group():
+    X = _unit(*[[1, 0, 0]] * 5)
+    rep = dedup.near_duplicate_groups(X, max_group=2)
+    assert np.bincount(rep).max() == 2
+    assert rep.tolist() == [0, 0, 2, 2, 4]
+
+
+def test_chained_members_are_split_off(monkeypatch):
+    # a~b and b~c at the threshold, a and c not: c may not join through b
+    monkeypatch.setattr(dedup, "DEDUP_TEXT_SIM", 0.99)
+    X = _unit([1, 0, 0], [1, 0.1, 0], [1, 0.2, 0])
+    assert dedup.near_duplicate_groups(X).tolist() == [0, 0, 2]
+
+
+def test_same_image_with_a_different_caption_is_kept():
+    image = _unit([1, 0], [1, 0])
+    text = _unit([1, 0, 0], [0, 1, 0])
+    assert dedup.near_duplicate_groups(text, image).tolist() == [0, 1]
+
+
+def _rows(n):
+    return [
+        {"id": i, "product_id": f"p{i}", "payload": {"description": f"d{i}"},
+         "versions": {"text": "m"}, "keys": {"text": str(i)}}
+        for i in range(n)
+    ]
+
+
+def test_representatives_only_load_for_the_snapshot_they_were_computed_on(tmp_path):
+    X = _unit([1, 0, 0], [1, 0, 0], [0, 1, 0])
+    rows = _rows(3)
+    save_snapshot(tmp_path, rows, {"text": X}, "m")
+    snap = EmbeddingSnapshot.load(tmp_path)
+    rep = dedup.near_duplicate_groups(X)
+    report = dedup.save_groups(tmp_path, snap.fingerprint, rep)
+    assert (report["indexed"], report["groups"], report["largest_group"]) == (2, 1, 2)
+    assert dedup.load_representatives(snap).tolist() == rep.tolist()
+
+    # same length, different rows: must not be applied
+    rows[2]["product_id"] = "other"
+    save_snapshot(tmp_path, rows, {"text": X}, "m")
+    assert dedup.load_representatives(EmbeddingSnapshot.load(tmp_path)) is None
+
+
+def test_group_entries_list_only_real_groups():
+    groups = dedup.group_entries(_rows(3), np.array([0, 0, 2]))
+    assert list(groups) == ["p0"]
+    assert [m["product_id"] for m in groups["p0"]] == ["p0", "p1"]
@@ -0,0 +1,34 @@
+# backend/tests/test_json_stream.py
+import pytest
+
+from app.json_stream import JSONObjectScanner, extract_json_object
+
+
+def test_object_is_returned_when_its_closing_brace_arrives():
+    scanner = JSONObjectScanner()
+    assert scanner.next_dict('{"top_k": 5, "filters": {') is None
+    assert scanner.next_dict('"color": "red"}') is None
+    assert scanner.next_dict("} and some trailing prose") == {"top_k": 5, "filters": {"color": "red"}}
+
+
+def test_truncated_stream_yields_nothing():
+    scanner = JSONObjectScanner()
+    for chunk in ['{"intermediate_queries": [{"query": "red dr', 'ess", "weight": 1.0}', "], "]:
+        assert scanner.next_dict(chunk) is None
+    with pytest.raises(ValueError):
+        extract_json_object('{"intermediate_queries": [{"query": "red dress"')
+
+
+def test_braces_and_escapes_inside_strings_are_ignored():
+    raw = '{"query": "a } brace and a \\" quote {", "weight": 1}'
+    assert extract_json_object(raw) == {"query": 'a } brace and a " quote {', "weight": 1}
+
+
+def test_fences_prose_and_unparseable_objects_are_skipped():
+    raw = 'Sure! {not json} here it is:\n```json\n{"top_k": 3}\n```'
+    assert extract_json_object(raw) == {"top_k": 3}
+
+
+def test_empty_input_raises():
+    with pytest.raises(ValueError):
+        extract_json_object("")
@@ -0,0 +1,63 @@
+# backend/tests/test_neighbours.py
+import numpy as np
+
+from app.neighbours import topk_neighbours, update_neighbours
+
+
+def _unit(X):
+    return (X / np.linalg.norm(X, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _brute(X, k):
+    S = X @ X.T
+    np.fill_diagonal(S, -np.inf)
+    S[:, ~X.any(axis=1)] = -np.inf
+    return np.argsort(-S, axis=1)[:, :k]
+
+
+def test_topk_matches_brute_force_and_excludes_self():
+    X = _unit(np.random.default_rng(0).normal(size=(50, 8)))
+    ids, scores = topk_neighbours(X, 5)
+    assert ids.shape == (50, 5) and scores.dtype == np.float16
+    assert (ids != np.arange(50)[:, None]).all()
+    np.testing.assert_array_equal(ids, _brute(X, 5))
+    assert (np.diff(scores.astype(np.float32), axis=1) <= 0).all()
+
+
+def test_missing_vectors_are_never_neighbours_and_have_none():
+    X = _unit(np.random.default_rng(1).normal(size=(10, 4)))
+    X[3] = 0
+    ids, scores = topk_neighbours(X, 4)
+    assert (ids[3] == -1).all() and np.isneginf(scores[3].astype(np.float32)).all()
+    assert not (ids == 3).any()
+
+
+def test_k_larger_than_the_catalogue_is_padded():
+    X = _unit(np.random.default_rng(2).normal(size=(3, 4)))
+    ids, _ = topk_neighbours(X, 5)
+    assert (ids[:, 2:] == -1).all()
+    assert (ids[:, :2] >= 0).all()
+
+
+def test_incremental_update_equals_a_full_rebuild():
+    rng = np.random.default_rng(3)
+    X = _unit(rng.normal(size=(40, 6)))
+    ids, scores = topk_neighbours(X, 5)
+
+    # replace two vectors and append three new rows
+    X2 = np.vstack([X, _unit(rng.normal(size=(3, 6)))])
+    X2[[4, 17]] = _unit(rng.normal(size=(2, 6)))
+    changed = np.array([4, 17, 40, 41, 42])
+    new_ids, new_scores = update_neighbours(X2, ids, scores, changed, 5)
+
+    full_ids, full_scores = topk_neighbours(X2, 5)
+    np.testing.assert_array_equal(new_ids, full_ids)
+    np.testing.assert_allclose(new_scores.astype(np.float32), full_scores.astype(np.float32), atol=1e-3)
+
+
+def test_update_without_changes_returns_the_table_unchanged():
+    X = _unit(np.random.default_rng(4).normal(size=(12, 4)))
+    ids, scores = topk_neighbours(X, 3)
+    new_ids, new_scores = update_neighbours(X, ids, scores, np.array([], dtype=np.int64), 3)
+    np.testing.assert_array_equal(new_ids, ids)
+    np.testing.assert_array_equal(new_scores, scores)
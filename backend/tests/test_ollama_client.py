@@ -0,0 +1,78 @@
+# backend/tests/test_ollama_client.py
+import threading
+import time
+
+import pytest
+
+from app import ollama_client
+
+
+@pytest.fixture
+def fake_post(monkeypatch):
+    """Replaces the HTTP call; each generation blocks until `release` is set."""
+    state = {"calls": 0, "release": threading.Event(), "error": None}
+
+    def post(payload, timeout_s):
+        state["calls"] += 1
+        state["release"].wait(5)
+        if state["error"] is not None:
+            raise state["error"]
+        return f"answer to {payload['prompt'].split()[-1]}"
+
+    monkeypatch.setattr(ollama_client, "_post", post)
+    return state
+
+
+def _generate_in_threads(n, user="q"):
+    results, errors = [None] * n, [None] * n
+
+    def run(i):
+        try:
+            results[i] = ollama_client.ollama_generate("sys", user, timeout_s=5)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    return threads, results, errors
+
+
+def _wait_for_followers(before, n):
+    t_end = time.monotonic() + 5
+    while ollama_client.ollama_stats()["deduplicated"] - before < n and time.monotonic() < t_end:
+        time.sleep(0.01)
+
+
+def test_identical_concurrent_prompts_share_one_generation(fake_post):
+    before = ollama_client.ollama_stats()["deduplicated"]
+    threads, results, errors = _generate_in_threads(3)
+    _wait_for_followers(before, 2)
+    fake_post["release"].set()
+    for t in threads:
+        t.join(5)
+
+    assert fake_post["calls"] == 1
+    assert errors == [None] * 3
+    assert len(set(results)) == 1
+    assert ollama_client.ollama_stats()["deduplicated"] - before == 2
+
+
+def test_followers_see_the_leaders_error(fake_post):
+    fake_post["error"] = RuntimeError("ollama down")
+    before = ollama_client.ollama_stats()["deduplicated"]
+    threads, _, errors = _generate_in_threads(2, user="failing")
+    _wait_for_followers(before, 1)
+    fake_post["release"].set()
+    for t in threads:
+        t.join(5)
+
+    assert fake_post["calls"] == 1
+    assert all(isinstance(e, RuntimeError) for e in errors)
+
+
+def test_finished_generations_are_not_reused(fake_post):
+    fake_post["release"].set()
+    ollama_client.ollama_generate("sys", "again", timeout_s=5)
+    ollama_client.ollama_generate("sys", "again", timeout_s=5)
+    assert fake_post["calls"] == 2
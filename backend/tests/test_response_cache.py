@@ -0,0 +1,98 @@
+# backend/tests/test_response_cache.py
+import time
+
+import pytest
+
+from app.response_cache import IndexVersion, ResponseCache, message_key, plan_key
+from app.session_store import TTLStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic, advanced by hand."""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_ttl_store_expires_and_evicts(clock):
+    store = TTLStore(max_entries=2, ttl_s=10)
+    store.put("a", 1)
+    store.put("b", 2)
+    store.put("c", 3)  # evicts the least recently used
+    assert store.get("a") is None and store.evictions == 1
+    clock[0] += 10
+    assert store.get("b") is None and store.expirations >= 1
+
+
+def test_entry_is_fresh_then_stale_then_gone(clock):
+    cache = ResponseCache(max_entries=8, ttl_s=10, swr_s=20)
+    cache.put("k", {"answer": 1})
+
+    assert cache.get("k") == ({"answer": 1}, False)
+    clock[0] += 10
+    assert cache.get("k") == ({"answer": 1}, True)
+    clock[0] += 19.9
+    assert cache.get("k") == ({"answer": 1}, True)
+    clock[0] += 0.1
+    assert cache.get("k") == (None, False)
+
+    stats = cache.stats()
+    assert (stats["fresh_hits"], stats["stale_hits"], stats["misses"]) == (1, 2, 1)
+
+
+def test_only_one_caller_revalidates_a_stale_entry():
+    cache = ResponseCache()
+    assert cache.begin_revalidate("k")
+    assert not cache.begin_revalidate("k")
+    cache.end_revalidate("k")
+    assert cache.begin_revalidate("k")
+    assert cache.stats()["revalidations"] == 2
+
+
+def test_a_request_counts_at_most_one_miss():
+    cache = ResponseCache()
+    # message lookup followed by the plan-key lookup, both missing
+    cache.get("remembered-plan", count_miss=False)
+    cache.get("plan")
+    assert cache.stats()["misses"] == 1
+
+
+def test_a_new_index_version_clears_everything():
+    cache = ResponseCache()
+    cache.check_version("v1")
+    cache.put("k", {})
+    cache.remember_plan("m", "k")
+    cache.check_version("v1")
+    assert cache.plan_for("m") == "k"
+
+    cache.check_version("v2")
+    assert cache.get("k") == (None, False)
+    assert cache.plan_for("m") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_keys_normalise_the_message_and_include_the_version():
+    assert message_key("v", "Red  Dress", "") == message_key("v", "red dress", "")
+    assert message_key("v", "red dress", "") != message_key("w", "red dress", "")
+    plan = {"top_k": 10, "filters": {"color": "red", "brand": "x"}}
+    reordered = {"filters": {"brand": "x", "color": "red"}, "top_k": 10}
+    assert plan_key("v", plan, "q", "", 50) == plan_key("v", reordered, "q", "", 50)
+    assert plan_key("v", plan, "q", "", 50) != plan_key("v", plan, "q", "", 100)
+
+
+class _Live:
+    def __init__(self, aliases):
+        self._aliases = aliases
+
+    def aliases(self):
+        return dict(self._aliases)
+
+
+def test_index_version_follows_the_aliases():
+    live = _Live({"products": "products-v1"})
+    version = IndexVersion(live=live)
+    v1 = version.current()
+    assert version.current() == v1
+    live._aliases["products"] = "products-v2"
+    assert version.current() != v1
@@ -7,6 +7,7 @@ export async function POST(req: Request) {
     const form = await req.formData();
     const message = (form.get("message") ?? "").toString();
     const image = form.get("image") as File | null;
+    const sessionId = form.get("session_id");
 
     if (!message && !image) {
       return NextResponse.json({ error: "Missing message or image" }, { status: 400 });
@@ -18,6 +19,7 @@ export async function POST(req: Request) {
     const fwd = new FormData();
     if (message) fwd.append("message", message);
     if (image) fwd.append("image", image);
+    if (sessionId) fwd.append("session_id", sessionId.toString());
 
     const r = await fetch(BACKEND_URL, {
       method: "POST",
@@ -23,6 +23,8 @@ type ChatResponse = {
   plan: Plan;
   query_used: string;
   results: ResultItem[];
+  session_id?: string;
+  refined?: boolean;
 };
 
 const BACKEND_URL =
@@ -65,6 +67,7 @@ export default function Chat() {
       const fd = new FormData();
       if (message.trim()) fd.append("message", message.trim());
       if (file) fd.append("image", file);
+      if (data?.session_id) fd.append("session_id", data.session_id);
 
       const res = await fetch(`${BACKEND_URL}/api/chat`, {
         method: "POST",